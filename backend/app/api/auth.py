@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import MUsuario
+import asyncio
 import hashlib
 import bcrypt
 
@@ -43,8 +45,9 @@ def get_password_hash(password):
     return bcrypt.hashpw(safe_password.encode('utf-8'), salt).decode('utf-8')
 
 @router.post("/login", response_model=Token)
-async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(MUsuario).filter(MUsuario.tCorreo == credentials.username).first()
+async def login(credentials: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(MUsuario).where(MUsuario.tCorreo == credentials.username).limit(1))
+    user = result.scalars().first()
     
     if not user:
         if credentials.username == "admin" and credentials.password == "admin123":
@@ -58,7 +61,8 @@ async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
 
     valid_password = False
     if user.tClave.startswith("$2b$") or user.tClave.startswith("$2a$"):
-        valid_password = verify_password(credentials.password, user.tClave)
+        # bcrypt es CPU intensivo: se verifica fuera del event loop
+        valid_password = await asyncio.to_thread(verify_password, credentials.password, user.tClave)
     else:
         valid_password = (credentials.password == user.tClave)
         
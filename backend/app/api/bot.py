@@ -3,6 +3,7 @@ from pydantic import BaseModel
 import subprocess
 import sys
 import os
+import json
 import asyncio
 import threading
 from datetime import datetime
@@ -33,12 +34,41 @@ class BotConfig(BaseModel):
     sap: SapConfig
     general: GeneralConfig
     execution_id: int | None = None
+    tipo: str = 'M'  # 'M' manual / 'A' programada (automática)
+
+# Prioridad en la cola del watcher SUNAT/SAP: las manuales pasan antes que las programadas
+PRIORIDAD_MANUAL = 0
+PRIORIDAD_PROGRAMADA = 1
 
 @router.post("/run")
 async def run_bot_endpoint(config: BotConfig):
     return await run_bot_logic(config)
 
+@router.get("/cola")
+def get_bot_queue():
+    # Estado que publica el watcher SUNAT/SAP: trabajos en cola por prioridad, sesiones por portal y tiempos de espera
+    status_file = os.path.join(os.path.dirname(get_exchange_pending_dir()), "estado_cola.json")
+    if not os.path.exists(status_file):
+        raise HTTPException(status_code=404, detail="El watcher SUNAT/SAP aún no publicó el estado de la cola")
+    with open(status_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 async def run_bot_logic(config: BotConfig):
+    # La escritura del trabajo es E/S de disco: en un hilo para no bloquear el event loop
+    # (execute_sociedad_logic envía varios trabajos en paralelo)
+    return await asyncio.to_thread(write_bot_job, config)
+
+def get_exchange_pending_dir():
+    current_dir = os.getcwd()
+    exchange_pending_dir = os.path.join(current_dir, "..", "..", "..", "dmz", "exchange", "pendientes")
+    exchange_pending_dir = os.path.abspath(exchange_pending_dir)
+
+    if not os.path.exists(exchange_pending_dir):
+        # Fallback: intentar ruta absoluta común si no funciona la relativa (ej. desarrollo)
+        exchange_pending_dir = r"c:\Users\Soporte\Documents\Proyectos\ocr-cosapi-full\dmz\exchange\pendientes"
+    return exchange_pending_dir
+
+def write_bot_job(config: BotConfig):
     try:
         current_dir = os.getcwd()
         base_output = os.path.join(current_dir, "output")
@@ -75,14 +105,9 @@ async def run_bot_logic(config: BotConfig):
         # Ajuste de ruta: estamos en backend/app/api, subimos 3 niveles para llegar a backend, uno mas para root
         # Mejor usamos ruta relativa segura
         
-        exchange_pending_dir = os.path.join(current_dir, "..", "..", "..", "dmz", "exchange", "pendientes")
-        exchange_pending_dir = os.path.abspath(exchange_pending_dir)
-        
+        exchange_pending_dir = get_exchange_pending_dir()
         if not os.path.exists(exchange_pending_dir):
-            # Fallback: intentar ruta absoluta común si no funciona la relativa (ej. desarrollo)
-             exchange_pending_dir = r"c:\Users\Soporte\Documents\Proyectos\ocr-cosapi-full\dmz\exchange\pendientes"
-             if not os.path.exists(exchange_pending_dir):
-                  raise Exception(f"No se encuentra la carpeta de intercambio: {exchange_pending_dir}")
+            raise Exception(f"No se encuentra la carpeta de intercambio: {exchange_pending_dir}")
 
         # 2. Preparar el payload JSON
         # Calculamos los argumentos como antes para mantener compatibilidad con la estructura que espera app.py
@@ -121,6 +146,9 @@ async def run_bot_logic(config: BotConfig):
                 'input_date': config.general.fecha
             },
             'socket_url': "http://localhost:8001", # El watcher debe saber a dónde reportar
+            'execution_id': config.execution_id, # Para asociar estado y logs del watcher a la ejecución
+            'tipo': config.tipo,
+            'priority': PRIORIDAD_PROGRAMADA if config.tipo == 'A' else PRIORIDAD_MANUAL,
             'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
 
@@ -128,9 +156,11 @@ async def run_bot_logic(config: BotConfig):
         job_id = f"job_{config.general.sociedad}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{config.execution_id or 0}.json"
         job_file_path = os.path.join(exchange_pending_dir, job_id)
         
-        import json
-        with open(job_file_path, 'w', encoding='utf-8') as f:
+        # Escritura atómica: el watcher solo ve el .json cuando ya está completo
+        tmp_file_path = job_file_path + ".tmp"
+        with open(tmp_file_path, 'w', encoding='utf-8') as f:
             json.dump(job_data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file_path, job_file_path)
             
         print(f"✅ Trabajo enviado al Watcher: {job_file_path}")
         
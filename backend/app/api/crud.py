@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query, Response
+from sqlalchemy import select, or_, func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from app.database import SessionLocal, get_db
-from app.models import MSociedad, MUsuario, MSap, MSapSociedad, MProgramacion, MProgramacionSociedad, DEjecucion, MListaBlanca, MListaBlancaSociedad, DSeguimiento
+from app.database import SessionLocal, get_db, get_async_db
+from app.models import MSociedad, MUsuario, MSap, MSapSociedad, MProgramacion, MProgramacionSociedad, DEjecucion, DEjecucionEstado, MListaBlanca, MListaBlancaSociedad, DSeguimiento
 from app.api.auth import get_password_hash
+from app.api.pagination import MAX_PAGE_SIZE, parse_fields, keyset_page, page_items
 from app.services.execution import execute_programacion_logic, execute_sociedad_logic
+from app.services.parameters_writer import parameters_writer
+from app.scheduler import schedule_queue
+from app.services.ejecucion_estado import ESTADO_LABELS, ESTADO_PENDIENTE, ESTADO_EN_PROCESO
+from app.services.proveedores import (
+    upsert_proveedores, fetch_existing_rucs, spool_upload, iter_excel_chunks,
+    find_columns, normalize_proveedores, to_upsert_rows
+)
+from app.socket_manager import sio, EmitEvent
 from pydantic import BaseModel
 from datetime import datetime
-import pandas as pd
-import io
+import asyncio
+import time
+import os
 
 router = APIRouter()
 
@@ -79,9 +91,23 @@ class SapResponse(SapBase):
     class Config:
         from_attributes = True
 
-@router.get("/sap-accounts", response_model=List[SapResponse])
-def get_all_sap_accounts(db: Session = Depends(get_db)):
-    return db.query(MSap).filter(MSap.lActivo == True).all()
+@router.get("/sap-accounts", response_model=List[SapResponse], response_model_exclude_unset=True)
+def get_all_sap_accounts(
+    response: Response,
+    after: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    all_rows: bool = Query(False, alias="all", description="Devuelve todas las filas sin paginar"),
+    q: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    columns = parse_fields(fields, SapResponse, always=("iMSAP",))
+    query = db.query(*[getattr(MSap, c) for c in columns]).filter(MSap.lActivo == True)
+    if q:
+        query = query.filter(MSap.tUsuario.ilike(f"%{q}%"))
+
+    rows, next_cursor = keyset_page(query, MSap.iMSAP, after, None if all_rows else limit)
+    return page_items(response, SapResponse, [dict(r._mapping) for r in rows], next_cursor)
 
 @router.get("/sociedades/{ruc}/sap-accounts", response_model=List[SapResponse])
 def get_sociedad_sap_accounts(ruc: str, db: Session = Depends(get_db)):
@@ -116,14 +142,37 @@ def associate_sap_to_sociedad(ruc: str, sap_id: int, db: Session = Depends(get_d
     db.add(new_relation)
     db.commit()
 
-    save_parameters_to_file(db)
+    parameters_writer.request()
     
     return {"message": "Cuenta SAP asociada exitosamente"}
 
-@router.get("/usuarios", response_model=List[UsuarioResponse])
-def read_usuarios(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    usuarios = db.query(MUsuario).offset(skip).limit(limit).all()
-    return usuarios
+@router.get("/usuarios", response_model=List[UsuarioResponse], response_model_exclude_unset=True)
+def read_usuarios(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    q: Optional[str] = None,
+    lActivo: Optional[bool] = None,
+    iMRol: Optional[int] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    columns = parse_fields(fields, UsuarioResponse, always=("iMusuario",))
+    query = db.query(*[getattr(MUsuario, c) for c in columns])
+    if q:
+        query = query.filter(or_(
+            MUsuario.tCorreo.ilike(f"%{q}%"),
+            MUsuario.tNombre.ilike(f"%{q}%"),
+            MUsuario.tApellidos.ilike(f"%{q}%")
+        ))
+    if lActivo is not None:
+        query = query.filter(MUsuario.lActivo == lActivo)
+    if iMRol is not None:
+        query = query.filter(MUsuario.iMRol == iMRol)
+
+    rows, next_cursor = keyset_page(query, MUsuario.iMusuario, after, limit, skip)
+    return page_items(response, UsuarioResponse, [dict(r._mapping) for r in rows], next_cursor)
 
 @router.post("/usuarios", response_model=UsuarioResponse)
 def create_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
@@ -187,49 +236,30 @@ def update_usuario(user_id: int, usuario: UsuarioUpdate, db: Session = Depends(g
     db.refresh(db_usuario)
     return db_usuario
 
-@router.get("/sociedades", response_model=List[SociedadResponse])
-def read_sociedades(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    sociedades = db.query(MSociedad).offset(skip).limit(limit).all()
-    return sociedades
-
-import os
-import json
+@router.get("/sociedades", response_model=List[SociedadResponse], response_model_exclude_unset=True)
+def read_sociedades(
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    q: Optional[str] = None,
+    lActivo: Optional[bool] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    columns = parse_fields(fields, SociedadResponse, always=("tRuc",))
+    query = db.query(*[getattr(MSociedad, c) for c in columns])
+    if q:
+        query = query.filter(or_(
+            MSociedad.tRuc.like(f"{q}%"),
+            MSociedad.tCodigoSap.ilike(f"{q}%"),
+            MSociedad.tRazonSocial.ilike(f"%{q}%")
+        ))
+    if lActivo is not None:
+        query = query.filter(MSociedad.lActivo == lActivo)
 
-def save_parameters_to_file(db: Session):
-    try:
-        results = db.query(MSociedad, MSap).\
-            outerjoin(MSapSociedad, MSociedad.tRuc == MSapSociedad.tRuc).\
-            outerjoin(MSap, MSapSociedad.iMSAP == MSap.iMSAP).\
-            all()
-        data = []
-        for sociedad, sap in results:
-            item = {
-                "code_sociedad": sociedad.tCodigoSap,
-                "ruc_sunat": sociedad.tRuc,
-                "razon_social": sociedad.tRazonSocial,
-                "user_sunat": sociedad.tUsuario,
-                "password_sunat": sociedad.tClave,
-                "active": sociedad.lActivo,
-                "sap_user": sap.tUsuario if sap else None,
-                "sap_password": sap.tClave if sap else None
-            }
-            data.append(item)
-
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        service_dir = os.path.join(base_dir, "sunat-sap-service")
-        
-        if not os.path.exists(service_dir):
-            return
-            
-        params_file = os.path.join(service_dir, "parameters.json")
-        
-        with open(params_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-            
-        print(f"Parámetros actualizados guardados en {params_file}")
-        
-    except Exception as e:
-        print(f"Error guardando parámetros: {e}")
+    rows, next_cursor = keyset_page(query, MSociedad.tRuc, after, limit, skip)
+    return page_items(response, SociedadResponse, [dict(r._mapping) for r in rows], next_cursor)
 
 @router.post("/sociedades", response_model=SociedadResponse)
 def create_sociedad(sociedad: SociedadCreate, db: Session = Depends(get_db)):
@@ -244,7 +274,7 @@ def create_sociedad(sociedad: SociedadCreate, db: Session = Depends(get_db)):
     db.add(new_sociedad)
     db.commit()
     db.refresh(new_sociedad)
-    save_parameters_to_file(db)
+    parameters_writer.request()
     
     return new_sociedad
 
@@ -260,7 +290,7 @@ def update_sociedad(ruc: str, sociedad: SociedadUpdate, db: Session = Depends(ge
     
     db.commit()
     db.refresh(db_sociedad)
-    save_parameters_to_file(db)
+    parameters_writer.request()
     
     return db_sociedad
 
@@ -312,10 +342,32 @@ def map_programacion_response(p: MProgramacion):
         lActivo=p.lActivo
     )
 
-@router.get("/programacion", response_model=List[ProgramacionResponse])
-def get_programaciones(db: Session = Depends(get_db)):
-    programaciones = db.query(MProgramacion).all()
-    return [map_programacion_response(p) for p in programaciones]
+@router.get("/programacion", response_model=List[ProgramacionResponse], response_model_exclude_unset=True)
+def get_programaciones(
+    response: Response,
+    after: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    all_rows: bool = Query(False, alias="all", description="Devuelve todas las filas sin paginar"),
+    q: Optional[str] = None,
+    lActivo: Optional[bool] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    columns = parse_fields(fields, ProgramacionResponse, always=("iMProgramacion",))
+    query = db.query(*[getattr(MProgramacion, c) for c in columns])
+    if q:
+        query = query.filter(MProgramacion.tNombre.ilike(f"%{q}%"))
+    if lActivo is not None:
+        query = query.filter(MProgramacion.lActivo == lActivo)
+
+    rows, next_cursor = keyset_page(query, MProgramacion.iMProgramacion, after, None if all_rows else limit)
+    items = []
+    for r in rows:
+        item = dict(r._mapping)
+        if "tDias" in item:
+            item["tDias"] = item["tDias"].split(',') if item["tDias"] else []
+        items.append(item)
+    return page_items(response, ProgramacionResponse, items, next_cursor)
 
 @router.post("/programacion", response_model=ProgramacionResponse)
 def create_programacion(programacion: ProgramacionCreate, db: Session = Depends(get_db)):
@@ -339,7 +391,8 @@ def create_programacion(programacion: ProgramacionCreate, db: Session = Depends(
         )
         db.add(rel)
     db.commit()
-    
+
+    schedule_queue.update(new_prog.iMProgramacion, new_prog.tHora, new_prog.tDias, new_prog.lActivo)
     return map_programacion_response(new_prog)
 
 @router.delete("/programacion/{id}")
@@ -350,6 +403,7 @@ def delete_programacion(id: int, db: Session = Depends(get_db)):
     
     db.delete(prog)
     db.commit()
+    schedule_queue.remove(id)
     return {"message": "Programación eliminada exitosamente"}
 
 @router.put("/programacion/{id}/toggle")
@@ -361,7 +415,8 @@ def toggle_programacion(id: int, db: Session = Depends(get_db)):
     prog.lActivo = not prog.lActivo
     db.commit()
     db.refresh(prog)
-    
+
+    schedule_queue.update(prog.iMProgramacion, prog.tHora, prog.tDias, prog.lActivo)
     return {"message": "Estado actualizado", "lActivo": prog.lActivo}
 
 # Execution Dashboard Endpoints
@@ -373,6 +428,13 @@ class ExecutionHistoryItem(BaseModel):
     tipo: str
     detalle: str
     estado: str
+    progreso: int = 0
+    paso: str | None = None
+    mensaje: str | None = None
+    inicio: str | None = None
+    fin: str | None = None
+    archivos_sap: int = 0
+    archivos_sunat: int = 0
 
 class ExecutionActiveItem(BaseModel):
     id: int
@@ -402,6 +464,43 @@ def get_execution_logs(execution_id: int, db: Session = Depends(get_db)):
         ))
     return result
 
+def format_dashboard_date(value: datetime | None) -> str | None:
+    return value.strftime("%d/%m/%Y • %H:%M") if value else None
+
+def map_execution_history(e: DEjecucionEstado) -> ExecutionHistoryItem:
+    return ExecutionHistoryItem(
+        iMEjecucion=e.iMEjecucion,
+        fecha=format_dashboard_date(e.fRegistro) or "",
+        nombre=f"Ejecución #{e.iMEjecucion}",
+        tipo="Manual" if e.tTipo == 'M' else "Automático",
+        detalle=f"Usuario ID: {e.iUsuarioEjecucion}" if e.iUsuarioEjecucion else "Sistema",
+        estado=ESTADO_LABELS.get(e.tEstado, e.tEstado or ""),
+        progreso=e.iProgreso or 0,
+        paso=e.tPaso,
+        mensaje=e.tUltimoMensaje,
+        inicio=format_dashboard_date(e.fInicio),
+        fin=format_dashboard_date(e.fFin),
+        archivos_sap=e.iArchivosSap or 0,
+        archivos_sunat=e.iArchivosSunat or 0
+    )
+
+class SociedadEstadoItem(ExecutionHistoryItem):
+    ruc: str
+
+@router.get("/ejecuciones/estado", response_model=List[SociedadEstadoItem])
+def get_ejecuciones_estado(rucs: Optional[str] = Query(None, description="RUCs separados por coma (vacío = todas)"), db: Session = Depends(get_db)):
+    # Estado de la última ejecución de varias sociedades en una sola consulta (evita una petición por sociedad)
+    latest = db.query(
+        DEjecucionEstado.tRuc,
+        func.max(DEjecucionEstado.iMEjecucion).label("iMEjecucion")
+    ).group_by(DEjecucionEstado.tRuc)
+    if rucs:
+        latest = latest.filter(DEjecucionEstado.tRuc.in_([r.strip() for r in rucs.split(",") if r.strip()]))
+    latest = latest.subquery()
+
+    estados = db.query(DEjecucionEstado).join(latest, DEjecucionEstado.iMEjecucion == latest.c.iMEjecucion).all()
+    return [SociedadEstadoItem(ruc=e.tRuc, **map_execution_history(e).model_dump()) for e in estados]
+
 @router.get("/sociedades/{ruc}/ejecuciones", response_model=ExecutionDashboardResponse)
 def get_sociedad_ejecuciones(ruc: str, db: Session = Depends(get_db)):
     programaciones = db.query(MProgramacion).join(MProgramacionSociedad).filter(
@@ -420,18 +519,15 @@ def get_sociedad_ejecuciones(ruc: str, db: Session = Depends(get_db)):
             logs=[]
         ))
         
-    ejecuciones = db.query(DEjecucion).filter(DEjecucion.tRuc == ruc).order_by(DEjecucion.fRegistro.desc()).limit(10).all()
-    
-    history_items = []
-    for e in ejecuciones:
-        history_items.append(ExecutionHistoryItem(
-            iMEjecucion=e.iMEjecucion,
-            fecha=e.fRegistro.strftime("%d/%m/%Y • %H:%M") if e.fRegistro else "",
-            nombre=f"Ejecución #{e.iMEjecucion}",
-            tipo="Manual" if e.tTipo == 'M' else "Automático",
-            detalle=f"Usuario ID: {e.iUsuarioEjecucion}" if e.iUsuarioEjecucion else "Sistema",
-            estado="Completado"
-        ))
+    # Una lectura indexada del modelo de estado (DEJECUCION_ESTADO), sin tocar DEJECUCION
+    estados = db.query(DEjecucionEstado).filter(DEjecucionEstado.tRuc == ruc).order_by(DEjecucionEstado.iMEjecucion.desc()).limit(10).all()
+    history_items = [map_execution_history(e) for e in estados]
+
+    # Progreso real de la ejecución en curso (si la hay) en las programaciones activas
+    running = next((e for e in estados if e.tEstado in (ESTADO_PENDIENTE, ESTADO_EN_PROCESO)), None)
+    if running:
+        for item in active_items:
+            item.progreso = running.iProgreso or 0
         
     return ExecutionDashboardResponse(active=active_items, history=history_items)
 
@@ -439,9 +535,9 @@ class ExecuteProgramacionRequest(BaseModel):
     date: Optional[str] = None
 
 @router.post("/programacion/{id}/execute")
-async def execute_programacion_manual(id: int, request: ExecuteProgramacionRequest = None, ruc: Optional[str] = None, db: Session = Depends(get_db)):
+async def execute_programacion_manual(id: int, request: ExecuteProgramacionRequest = None, ruc: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
     # Verify existence first
-    prog = db.query(MProgramacion).filter(MProgramacion.iMProgramacion == id).first()
+    prog = await db.get(MProgramacion, id)
     if not prog:
         raise HTTPException(status_code=404, detail=f"Programación {id} no encontrada")
 
@@ -458,9 +554,9 @@ class ExecuteManualRequest(BaseModel):
     date: str
 
 @router.post("/sociedades/{ruc}/execute")
-async def execute_sociedad_manual(ruc: str, request: ExecuteManualRequest, db: Session = Depends(get_db)):
+async def execute_sociedad_manual(ruc: str, request: ExecuteManualRequest, db: AsyncSession = Depends(get_async_db)):
     # Verify society exists
-    sociedad = db.query(MSociedad).filter(MSociedad.tRuc == ruc).first()
+    sociedad = await db.get(MSociedad, ruc)
     if not sociedad:
          raise HTTPException(status_code=404, detail=f"Sociedad {ruc} no encontrada")
 
@@ -487,25 +583,59 @@ class ListaBlancaResponse(ListaBlancaBase):
     class Config:
         from_attributes = True
 
-@router.get("/proveedores", response_model=List[ListaBlancaResponse])
-def get_proveedores(db: Session = Depends(get_db)):
-    proveedores = db.query(MListaBlanca).options(
-        joinedload(MListaBlanca.sociedades).joinedload(MListaBlancaSociedad.sociedad)
-    ).all()
-    result = []
-    for p in proveedores:
-        sociedades = [s.tRucSociedad for s in p.sociedades]
-        sociedades_nombres = [s.sociedad.tRazonSocial for s in p.sociedades if s.sociedad]
-        p_dict = {
-            "tRucListaBlanca": p.tRucListaBlanca,
-            "tRazonSocial": p.tRazonSocial,
-            "lActivo": p.lActivo,
-            "fRegistro": p.fRegistro,
-            "sociedades_rucs": sociedades,
-            "sociedades_nombres": sociedades_nombres
-        }
-        result.append(p_dict)
-    return result
+@router.get("/proveedores", response_model=List[ListaBlancaResponse], response_model_exclude_unset=True)
+def get_proveedores(
+    response: Response,
+    after: Optional[str] = None,
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    all_rows: bool = Query(False, alias="all", description="Devuelve todas las filas sin paginar"),
+    q: Optional[str] = None,
+    lActivo: Optional[bool] = None,
+    sociedad: Optional[str] = Query(None, description="RUC de sociedad asociada"),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    selected = parse_fields(fields, ListaBlancaResponse, always=("tRucListaBlanca",))
+    relation_fields = [f for f in selected if f.startswith("sociedades_")]
+    columns = [getattr(MListaBlanca, f) for f in selected if f not in relation_fields]
+
+    query = db.query(*columns)
+    if q:
+        query = query.filter(or_(
+            MListaBlanca.tRucListaBlanca.like(f"{q}%"),
+            MListaBlanca.tRazonSocial.ilike(f"%{q}%")
+        ))
+    if lActivo is not None:
+        query = query.filter(MListaBlanca.lActivo == lActivo)
+    if sociedad:
+        query = query.filter(MListaBlanca.tRucListaBlanca.in_(
+            select(MListaBlancaSociedad.tRucListaBlanca).where(MListaBlancaSociedad.tRucSociedad == sociedad)
+        ))
+
+    rows, next_cursor = keyset_page(query, MListaBlanca.tRucListaBlanca, after, None if all_rows else limit)
+    items = [dict(r._mapping) for r in rows]
+
+    if relation_fields and items:
+        # Relaciones de la página en una sola consulta de columnas (sin cargar objetos ORM)
+        rel_query = db.query(
+            MListaBlancaSociedad.tRucListaBlanca, MListaBlancaSociedad.tRucSociedad, MSociedad.tRazonSocial
+        ).outerjoin(MSociedad, MSociedad.tRuc == MListaBlancaSociedad.tRucSociedad)
+        if not all_rows:
+            rel_query = rel_query.filter(MListaBlancaSociedad.tRucListaBlanca.in_([i["tRucListaBlanca"] for i in items]))
+
+        rucs, nombres = {}, {}
+        for ruc, ruc_sociedad, razon_sociedad in rel_query.all():
+            rucs.setdefault(ruc, []).append(ruc_sociedad)
+            if razon_sociedad is not None:
+                nombres.setdefault(ruc, []).append(razon_sociedad)
+
+        for item in items:
+            if "sociedades_rucs" in relation_fields:
+                item["sociedades_rucs"] = rucs.get(item["tRucListaBlanca"], [])
+            if "sociedades_nombres" in relation_fields:
+                item["sociedades_nombres"] = nombres.get(item["tRucListaBlanca"], [])
+
+    return page_items(response, ListaBlancaResponse, items, next_cursor)
 
 class ListaBlancaSociedadesUpdate(BaseModel):
     sociedades: List[str]
@@ -530,54 +660,20 @@ async def preview_proveedores_excel(file: UploadFile = File(...)):
     if not file.filename.endswith('.xlsx') and not file.filename.endswith('.xls'):
         raise HTTPException(status_code=400, detail="Formato de archivo inválido. Solo se permiten archivos Excel (.xlsx, .xls)")
     
+    path = await spool_upload(file)
+    chunks = iter_excel_chunks(path)
     try:
-        contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        import unicodedata
-        def normalize_str(s):
-            return ''.join(c for c in unicodedata.normalize('NFD', str(s)) if unicodedata.category(c) != 'Mn').upper().strip()
-
-        df.columns = [normalize_str(col) for col in df.columns]
-        
-        col_ruc = None
-        col_razon = None
-        
-        for col in df.columns:
-            if "RUC" in col:
-                col_ruc = col
-                break
-        
-        for col in df.columns:
-            if "RAZON" in col or "SOCIAL" in col or "NOMBRE" in col:
-                col_razon = col
-                break
-        
-        if not col_ruc or not col_razon:
-             raise HTTPException(status_code=400, detail=f"No se encontraron las columnas requeridas 'RUC' y 'RAZON SOCIAL' en el Excel.")
-        
         preview_data = []
-        df = df.fillna('')
-        
-        for i, row in df.iterrows():
-            ruc = str(row[col_ruc]).strip()
-            razon_social = str(row[col_razon]).strip()
-
-            if ruc.endswith('.0'):
-                ruc = ruc[:-2]
-
-            import re
-            ruc = re.sub(r'\D', '', ruc)
-
-            if not ruc:
-                continue
-            
-            preview_data.append({
-                "id": i, 
-                "ruc": ruc,
-                "razonSocial": razon_social,
-                "estado": True 
-            })
+        while (df := await asyncio.to_thread(next, chunks, None)) is not None:
+            col_ruc, col_razon = find_columns(df.columns)
+            if not col_ruc or not col_razon:
+                 raise HTTPException(status_code=400, detail=f"No se encontraron las columnas requeridas 'RUC' y 'RAZON SOCIAL' en el Excel.")
             
+            normalized = normalize_proveedores(df, col_ruc, col_razon, digits_only=True)
+            preview_data.extend(
+                {"id": i, "ruc": ruc, "razonSocial": razon, "estado": True}
+                for i, ruc, razon in zip(normalized.index.tolist(), normalized["ruc"].tolist(), normalized["razonSocial"].tolist())
+            )
         return preview_data
         
     except HTTPException as he:
@@ -585,6 +681,9 @@ async def preview_proveedores_excel(file: UploadFile = File(...)):
     except Exception as e:
         print(f"Error procesando excel: {e}")
         raise HTTPException(status_code=500, detail=f"Error al procesar el archivo: {str(e)}")
+    finally:
+        chunks.close()
+        os.remove(path)
 
 @router.delete("/proveedores/{ruc}")
 def delete_proveedor(ruc: str, db: Session = Depends(get_db)):
@@ -601,110 +700,69 @@ def delete_proveedor(ruc: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error al eliminar proveedor: {str(e)}")
 
 @router.post("/proveedores/batch")
-async def create_proveedores_batch(proveedores: List[ListaBlancaBase], db: Session = Depends(get_db)):
+async def create_proveedores_batch(proveedores: List[ListaBlancaBase], db: AsyncSession = Depends(get_async_db)):
     try:
-        count_created = 0
-        count_updated = 0
-        
-        for prov in proveedores:
-            existing = db.query(MListaBlanca).filter(MListaBlanca.tRucListaBlanca == prov.tRucListaBlanca).first()
-            if existing:
-                existing.tRazonSocial = prov.tRazonSocial
-                existing.lActivo = prov.lActivo               
-                existing.fModificacion = datetime.now()
-                existing.iUsuarioModificacion = 1
-                count_updated += 1
-            else:
-                new_prov = MListaBlanca(
-                    tRucListaBlanca=prov.tRucListaBlanca,
-                    tRazonSocial=prov.tRazonSocial,
-                    lActivo=prov.lActivo,
-                    fRegistro=datetime.now(),
-                    iUsuarioRegistro=1
-                )
-                db.add(new_prov)
-                count_created += 1
-        
-        db.commit()
+        summary = await upsert_proveedores(
+            db,
+            [prov.dict() for prov in proveedores],
+            update_columns=("tRazonSocial", "lActivo")
+        )
+        await db.commit()
         
-        return {
-            "message": "Proceso completado exitosamente",
-            "created": count_created,
-            "updated": count_updated
-        }
+        return {"message": "Proceso completado exitosamente", **summary}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Error guardando datos: {str(e)}")
 
 @router.post("/proveedores/upload")
-async def upload_proveedores_excel(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def upload_proveedores_excel(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
     if not file.filename.endswith('.xlsx') and not file.filename.endswith('.xls'):
         raise HTTPException(status_code=400, detail="Formato de archivo inválido. Solo se permiten archivos Excel (.xlsx, .xls)")
     
+    # El archivo se copia a disco y se procesa por bloques: parseo en un hilo, upsert y commit por bloque
+    path = await spool_upload(file)
+    chunks = iter_excel_chunks(path)
     try:
-        contents = await file.read()
-        df = pd.read_excel(io.BytesIO(contents))
-        
-        df.columns = [str(col).upper().strip() for col in df.columns]
-        
-        col_ruc = None
-        col_razon = None
-        
-        for col in df.columns:
-            if "RUC" in col:
-                col_ruc = col
-                break
+        existing = await fetch_existing_rucs(db)
+        # RUC ya escritos por bloques anteriores de este archivo
+        seen = set()
+        summary = {"created": 0, "updated": 0, "repeated": 0, "rows": 0, "chunks": []}
+        started = time.perf_counter()
         
-        for col in df.columns:
-            if "RAZON" in col or "SOCIAL" in col or "NOMBRE" in col:
-                col_razon = col
-                break
-        
-        if not col_ruc or not col_razon:
-             raise HTTPException(status_code=400, detail=f"No se encontraron las columnas requeridas 'RUC' y 'RAZON SOCIAL' en el Excel.")
-        
-        count_created = 0
-        count_updated = 0
-        
-        df = df.fillna('')
-        
-        for _, row in df.iterrows():
-            ruc = str(row[col_ruc]).strip()
-            razon_social = str(row[col_razon]).strip()
+        while (df := await asyncio.to_thread(next, chunks, None)) is not None:
+            col_ruc, col_razon = find_columns(df.columns)
+            if not col_ruc or not col_razon:
+                 raise HTTPException(status_code=400, detail=f"No se encontraron las columnas requeridas 'RUC' y 'RAZON SOCIAL' en el Excel.")
             
-            if ruc.endswith('.0'):
-                ruc = ruc[:-2]
+            rows = to_upsert_rows(normalize_proveedores(df, col_ruc, col_razon))
+            # Los existentes solo actualizan la razón social (se respeta su estado activo/inactivo)
+            chunk = await upsert_proveedores(db, rows, update_columns=("tRazonSocial",), existing=existing, seen=seen)
+            await db.commit()
             
-            if not ruc or len(ruc) != 11 or not ruc.isdigit():
-                continue
+            summary["created"] += chunk["created"]
+            summary["updated"] += chunk["updated"]
+            summary["repeated"] += chunk["repeated"]
+            summary["rows"] += len(df)
+            summary["chunks"].append({"rows": len(df), "ms": chunk["elapsed_ms"]})
             
-            existing = db.query(MListaBlanca).filter(MListaBlanca.tRucListaBlanca == ruc).first()
-            if existing:
-                existing.tRazonSocial = razon_social
-                existing.fModificacion = datetime.now()
-                existing.iUsuarioModificacion = 1
-                count_updated += 1
-            else:
-                new_prov = MListaBlanca(
-                    tRucListaBlanca=ruc,
-                    tRazonSocial=razon_social,
-                    lActivo=True,
-                    fRegistro=datetime.now(),
-                    iUsuarioRegistro=1
-                )
-                db.add(new_prov)
-                count_created += 1
-        
-        db.commit()
+            await sio.emit(EmitEvent.LOG, {
+                "type": "proveedores_progress",
+                "file": file.filename,
+                "rows": summary["rows"],
+                "created": summary["created"],
+                "updated": summary["updated"],
+                "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "message": f"📥 Proveedores: {summary['rows']} filas procesadas ({summary['created']} nuevos, {summary['updated']} actualizados)"
+            })
         
-        return {
-            "message": "Proceso completado exitosamente",
-            "created": count_created,
-            "updated": count_updated
-        }
+        summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return {"message": "Proceso completado exitosamente", **summary}
         
     except HTTPException as he:
         raise he
     except Exception as e:
         print(f"Error procesando excel: {e}")
         raise HTTPException(status_code=500, detail=f"Error al procesar el archivo: {str(e)}")
+    finally:
+        chunks.close()
+        os.remove(path)
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body
-from app.services.gemini_ocr import analyze_document_content, analyze_first_page_oc, validate_ocr_requirements
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body, Depends
+from fastapi.responses import StreamingResponse
+from app.services.gemini_ocr import analyze_document_content, analyze_first_page_oc, validate_ocr_requirements, analyze_and_validate
 from typing import Optional, List
 import shutil
 import os
+import json
 import uuid
 import asyncio
+import hashlib
 from datetime import datetime
 from pydantic import BaseModel
 from app.socket_manager import sio, EmitEvent
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal, get_async_db
+from app.models import MOcrBatch, DOcrBatchArchivo
 
 router = APIRouter()
 
@@ -15,179 +22,465 @@ router = APIRouter()
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 PDF_DIR = os.path.join(BASE_DIR, "app", "pdf")
 
+# Resultados de cada batch (una línea JSON por archivo procesado)
+BATCH_DIR = os.path.join(BASE_DIR, "app", "batches")
+
 class BatchProcessRequest(BaseModel):
-    folders: List[str] # Lista de rutas de carpetas a procesar
+    folders: List[str] = [] # Lista de rutas de carpetas a procesar
     concurrency: int = 5 # Nivel de concurrencia (default 5)
+    include_details: bool = True # Incluir el detalle por archivo en la respuesta (desactivar en batches grandes)
+    batch_id: Optional[str] = None # Reanudar un batch existente (si no se envían carpetas, se usan las del batch)
+    match_by_hash: bool = False # Además de ruta+tamaño+fecha, reconocer archivos ya procesados por su SHA-256
+    reprocess: bool = False # Ignorar los checkpoints y volver a enviar todos los archivos a Gemini
+    single_pass: bool = True # Extraer O/C y validar requisitos en una sola llamada a Gemini
 
-@router.post("/scan-batch", summary="Procesar múltiples carpetas de PDFs en paralelo")
-async def scan_batch_folders(payload: BatchProcessRequest):
+def _now_str():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+async def iter_pdf_files(folders: List[str]):
     """
-    Escanea recursivamente las carpetas dadas en busca de archivos .pdf
-    y los procesa en paralelo usando asyncio y un semáforo.
-    Reporta progreso vía Socket.IO.
+    Genera las rutas de los PDFs a medida que avanza el recorrido de carpetas,
+    sin construir la lista completa. Cada paso de os.walk se ejecuta en un hilo.
     """
-    all_pdf_files = []
-    
-    # 1. Recolectar todos los PDFs
-    for folder in payload.folders:
+    for folder in folders:
         if not os.path.exists(folder):
             print(f"⚠️ Carpeta no encontrada: {folder}")
             continue
-            
-        for root, dirs, files in os.walk(folder):
+
+        walker = os.walk(folder)
+        while True:
+            entry = await asyncio.to_thread(next, walker, None)
+            if entry is None:
+                break
+            root, dirs, files = entry
             for file in files:
                 if file.lower().endswith(".pdf"):
                     # Normalizar ruta para usar siempre '/' y evitar mezclas en Windows
-                    full_path = os.path.join(root, file).replace("\\", "/")
-                    all_pdf_files.append(full_path)
-    
-    total_files = len(all_pdf_files)
-    if total_files == 0:
-        return {"message": "No se encontraron archivos PDF en las rutas proporcionadas", "total": 0}
-
-    print(f"🚀 Iniciando procesamiento batch de {total_files} archivos con concurrencia {payload.concurrency}")
-    
-    # Notificar inicio
-    await sio.emit(EmitEvent.LOG, {
-        "type": "batch_start",
-        "total": total_files,
-        "message": f"Iniciando procesamiento de {total_files} archivos..."
-    })
+                    yield os.path.join(root, file).replace("\\", "/")
 
-    # 2. Configurar Semáforo para controlar concurrencia
-    semaphore = asyncio.Semaphore(payload.concurrency)
-    results = []
-    processed_count = 0
-
-    async def process_single_pdf(file_path):
-        nonlocal processed_count
-        async with semaphore:
+async def process_single_pdf(file_path: str, single_pass: bool = True) -> dict:
+    """
+    Extrae el O/C de la primera página y, si lo hay, valida los requisitos documentarios.
+    Con single_pass ambas cosas se resuelven en un solo trabajo DMZ (analyze_and_validate).
+    """
+    try:
+        # Procesar archivo
+        if single_pass:
+            ocr_result = await analyze_and_validate(file_path)
+        else:
+            ocr_result = await analyze_first_page_oc(file_path)
+        
+        status = "success"
+        oc_value = ocr_result.get("O/C")
+        clase_doc = ocr_result.get("clase_documento")
+        denominacion = ocr_result.get("denominacion")
+        error = ocr_result.get("error")
+        
+        if error:
+            status = "error"
+        
+        # Validación de requisitos documentarios si hay O/C
+        validation_result = None
+        if oc_value and status == "success":
             try:
-                # Procesar archivo
-                ocr_result = await analyze_first_page_oc(file_path)
-                
-                status = "success"
-                oc_value = ocr_result.get("O/C")
-                clase_doc = ocr_result.get("clase_documento")
-                denominacion = ocr_result.get("denominacion")
-                error = ocr_result.get("error")
-                
-                if error:
-                    status = "error"
-                
-                # Validación de requisitos documentarios si hay O/C
-                validation_result = None
-                if oc_value and status == "success":
+                if single_pass:
+                    validation_result = ocr_result.get("validation") or {}
+                else:
                     # Emitir log de inicio de validación
                     await sio.emit(EmitEvent.LOG, {
-                        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "date": _now_str(),
                         "message": f"🔍 Validando requisitos para {os.path.basename(file_path)} (O/C: {oc_value})..."
                     })
-
-                    try:
-                        validation_result = await validate_ocr_requirements(file_path, oc_value)
+                    validation_result = await validate_ocr_requirements(file_path, oc_value)
+                
+                # Preparar mensaje de resultado para log
+                if validation_result.get("validation_status") == "performed":
+                    res = validation_result.get("result", {})
+                    is_compliant = res.get("is_compliant", False)
+                    missing = res.get("missing_documents", [])
+                    obs = res.get("observations", "")
+                    
+                    status_icon = "✅" if is_compliant else "❌"
+                    msg_parts = [f"Validación {status_icon}"]
+                    
+                    if not is_compliant:
+                        msg_parts.append("No cumple requisitos")
+                        if missing:
+                            msg_parts.append(f"Faltan: {', '.join(missing)}")
+                    else:
+                        msg_parts.append("Cumple requisitos")
                         
-                        # Preparar mensaje de resultado para log
-                        if validation_result.get("validation_status") == "performed":
-                            res = validation_result.get("result", {})
-                            is_compliant = res.get("is_compliant", False)
-                            missing = res.get("missing_documents", [])
-                            obs = res.get("observations", "")
-                            
-                            status_icon = "✅" if is_compliant else "❌"
-                            msg_parts = [f"Validación {status_icon}"]
-                            
-                            if not is_compliant:
-                                msg_parts.append("No cumple requisitos")
-                                if missing:
-                                    msg_parts.append(f"Faltan: {', '.join(missing)}")
-                            else:
-                                msg_parts.append("Cumple requisitos")
-                                
-                            if obs:
-                                msg_parts.append(f"Obs: {obs}")
-                                
-                            log_message = " - ".join(msg_parts)
-                        elif validation_result.get("validation_status") == "skipped":
-                            log_message = f"Validación omitida: {validation_result.get('reason')}"
-                        else:
-                            log_message = "Resultado de validación desconocido"
-
-                        await sio.emit(EmitEvent.LOG, {
-                            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "message": f"📄 {os.path.basename(file_path)}: {log_message}"
-                        })
-
-                    except Exception as val_e:
-                        print(f"Error en validación para {file_path}: {val_e}")
-                        validation_result = {"validation_status": "error", "error": str(val_e)}
+                    if obs:
+                        msg_parts.append(f"Obs: {obs}")
                         
-                        await sio.emit(EmitEvent.LOG, {
-                            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            "message": f"⚠️ Error validando {os.path.basename(file_path)}: {val_e}"
-                        })
-
-                result_data = {
-                    "file_path": file_path,
-                    "file_name": os.path.basename(file_path),
-                    "status": status,
-                    "oc": oc_value,
-                    "clase_documento": clase_doc,
-                    "denominacion": denominacion,
-                    "validation": validation_result,
-                    "error": error
-                }
-                
-                # Actualizar contador
-                processed_count += 1
-                
-                # Emitir progreso individual
-                icon = "✅" if status == "success" else "❌"
+                    log_message = " - ".join(msg_parts)
+                elif validation_result.get("validation_status") == "skipped":
+                    log_message = f"Validación omitida: {validation_result.get('reason')}"
+                else:
+                    log_message = "Resultado de validación desconocido"
+
                 await sio.emit(EmitEvent.LOG, {
-                    "type": "batch_progress",
-                    "current": processed_count,
-                    "total": total_files,
-                    "file": os.path.basename(file_path),
-                    "result": result_data,
-                    # Compatibilidad con visor de logs genérico
-                    "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "message": f"{icon} Procesado {os.path.basename(file_path)}: {status}"
+                    "date": _now_str(),
+                    "message": f"📄 {os.path.basename(file_path)}: {log_message}"
                 })
+
+            except Exception as val_e:
+                print(f"Error en validación para {file_path}: {val_e}")
+                validation_result = {"validation_status": "error", "error": str(val_e)}
                 
-                return result_data
-                
-            except Exception as e:
-                print(f"Error procesando {file_path}: {e}")
-                processed_count += 1
-                return {
-                    "file_path": file_path, 
-                    "status": "error", 
-                    "error": str(e)
-                }
-
-    # 3. Crear tareas y ejecutar
-    tasks = [process_single_pdf(pdf) for pdf in all_pdf_files]
-    results = await asyncio.gather(*tasks)
-    
-    # 4. Resumen final
-    success_count = sum(1 for r in results if r["status"] == "success")
-    error_count = total_files - success_count
-    
-    summary = {
-        "total": total_files,
-        "success": success_count,
-        "errors": error_count,
-        "details": results
-    }
-    
+                await sio.emit(EmitEvent.LOG, {
+                    "date": _now_str(),
+                    "message": f"⚠️ Error validando {os.path.basename(file_path)}: {val_e}"
+                })
+
+        return {
+            "file_path": file_path,
+            "file_name": os.path.basename(file_path),
+            "status": status,
+            "oc": oc_value,
+            "clase_documento": clase_doc,
+            "denominacion": denominacion,
+            "validation": validation_result,
+            "error": error
+        }
+        
+    except Exception as e:
+        print(f"Error procesando {file_path}: {e}")
+        return {
+            "file_path": file_path, 
+            "status": "error", 
+            "error": str(e)
+        }
+
+def _hash_file(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BatchRun:
+    """
+    Estado de un batch en curso. Solo guarda contadores en memoria: cada resultado
+    se escribe en disco (NDJSON), se registra en DOCR_BATCH_ARCHIVO como checkpoint
+    y se emite por Socket.IO a medida que termina.
+    Los accesos a BD son async y cada uno usa su propia sesión corta: los workers corren
+    en paralelo y una AsyncSession no admite operaciones concurrentes.
+    """
+
+    def __init__(self, payload: "BatchProcessRequest", batch_id: str):
+        self.match_by_hash = payload.match_by_hash
+        self.reprocess = payload.reprocess
+        self.batch_id = batch_id
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        self.results_path = os.path.join(BATCH_DIR, f"{self.batch_id}.ndjson")
+        self.discovered = 0
+        self.processed = 0
+        self.success = 0
+        self.errors = 0
+        self.skipped = 0
+        self.walk_complete = False
+        self.details = [] if payload.include_details else None
+
+    @classmethod
+    async def start(cls, payload: "BatchProcessRequest") -> "BatchRun":
+        async with AsyncSessionLocal() as db:
+            batch = await db.get(MOcrBatch, payload.batch_id) if payload.batch_id else None
+            if batch:
+                # Reanudación: mismas carpetas si no se enviaron otras
+                if not payload.folders:
+                    payload.folders = json.loads(batch.tCarpetas or "[]")
+                batch.tEstado = "EN_PROCESO"
+                batch.fFin = None
+            else:
+                batch = MOcrBatch(
+                    tBatch=payload.batch_id or str(uuid.uuid4()),
+                    tCarpetas=json.dumps(payload.folders, ensure_ascii=False),
+                    iConcurrencia=payload.concurrency,
+                    tEstado="EN_PROCESO",
+                    fRegistro=datetime.utcnow()
+                )
+                db.add(batch)
+            await db.commit()
+            return cls(payload, batch.tBatch)
+
+    async def fingerprint(self, file_path: str) -> dict:
+        stat = os.stat(file_path)
+        file_hash = await asyncio.to_thread(_hash_file, file_path) if self.match_by_hash else None
+        return {"iTamano": stat.st_size, "nMtime": stat.st_mtime, "tHash": file_hash}
+
+    async def find_completed(self, file_path: str, fingerprint: dict) -> str | None:
+        """
+        Busca un resultado ya completado para este archivo (en este batch o en uno anterior),
+        por ruta + tamaño + fecha de modificación o, si se pidió, por hash de contenido.
+        Devuelve el JSON del resultado (tResultado).
+        """
+        if self.reprocess:
+            return None
+
+        query = (
+            select(DOcrBatchArchivo.tResultado)
+            .where(DOcrBatchArchivo.tEstado == "COMPLETADO")
+            .order_by(DOcrBatchArchivo.fRegistro.desc())
+            .limit(1)
+        )
+        async with AsyncSessionLocal() as db:
+            previous = (await db.execute(query.where(
+                DOcrBatchArchivo.tRutaArchivo == file_path,
+                DOcrBatchArchivo.iTamano == fingerprint["iTamano"],
+                DOcrBatchArchivo.nMtime == fingerprint["nMtime"]
+            ))).scalar()
+
+            if previous is None and fingerprint["tHash"]:
+                previous = (await db.execute(query.where(DOcrBatchArchivo.tHash == fingerprint["tHash"]))).scalar()
+        return previous
+
+    async def checkpoint(self, file_path: str, fingerprint: dict, result_data: dict):
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(DOcrBatchArchivo).where(
+                    DOcrBatchArchivo.tBatch == self.batch_id,
+                    DOcrBatchArchivo.tRutaArchivo == file_path
+                ).limit(1)
+            )).scalar()
+            if not row:
+                row = DOcrBatchArchivo(tBatch=self.batch_id, tRutaArchivo=file_path)
+                db.add(row)
+
+            row.iTamano = fingerprint["iTamano"]
+            row.nMtime = fingerprint["nMtime"]
+            row.tHash = fingerprint["tHash"] or row.tHash
+            row.tEstado = "COMPLETADO" if result_data["status"] == "success" else "ERROR"
+            row.tResultado = json.dumps(result_data, ensure_ascii=False)
+            row.fRegistro = datetime.utcnow()
+
+            await db.execute(self._update_batch(
+                iTotal=self.processed, iExitos=self.success, iErrores=self.errors, iOmitidos=self.skipped
+            ))
+            await db.commit()
+
+    def _update_batch(self, **values):
+        return update(MOcrBatch).where(MOcrBatch.tBatch == self.batch_id).values(**values)
+
+    async def record(self, result_data: dict):
+        self.processed += 1
+        if result_data["status"] == "success":
+            self.success += 1
+        else:
+            self.errors += 1
+        if result_data.get("skipped"):
+            self.skipped += 1
+
+        with open(self.results_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result_data, ensure_ascii=False) + "\n")
+        if self.details is not None:
+            self.details.append(result_data)
+
+        # Emitir progreso individual
+        icon = "✅" if result_data["status"] == "success" else "❌"
+        file_name = os.path.basename(result_data["file_path"])
+        await sio.emit(EmitEvent.LOG, {
+            "type": "batch_progress",
+            "batch_id": self.batch_id,
+            "current": self.processed,
+            # Mientras el recorrido no termina, el total es lo descubierto hasta ahora
+            "total": self.discovered,
+            "walk_complete": self.walk_complete,
+            "file": file_name,
+            "result": result_data,
+            # Compatibilidad con visor de logs genérico
+            "date": _now_str(),
+            "message": f"{icon} Procesado {file_name}: {result_data['status']}" + (" (ya procesado)" if result_data.get("skipped") else "")
+        })
+
+    async def finish(self, estado: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(self._update_batch(tEstado=estado, fFin=datetime.utcnow()))
+            await db.commit()
+
+    def summary(self) -> dict:
+        summary = {
+            "batch_id": self.batch_id,
+            "total": self.processed,
+            "success": self.success,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "results_file": self.results_path
+        }
+        if self.details is not None:
+            summary["details"] = self.details
+        return summary
+
+async def run_batch(payload: BatchProcessRequest, on_result=None) -> BatchRun:
+    """
+    Procesa las carpetas con una cola acotada: el recorrido de carpetas alimenta la cola
+    y `concurrency` workers la consumen, así la memoria no crece con el número de PDFs.
+    Los archivos ya completados (checkpoint en BD) se omiten reutilizando su resultado.
+    """
+    concurrency = max(1, payload.concurrency)
+    batch = await BatchRun.start(payload)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def producer():
+        try:
+            async for pdf_path in iter_pdf_files(payload.folders):
+                if batch.discovered == 0:
+                    print(f"🚀 Iniciando procesamiento batch {batch.batch_id} con concurrencia {concurrency}")
+                    # Notificar inicio
+                    await sio.emit(EmitEvent.LOG, {
+                        "type": "batch_start",
+                        "batch_id": batch.batch_id,
+                        "date": _now_str(),
+                        "message": "Iniciando procesamiento de archivos PDF..."
+                    })
+                batch.discovered += 1
+                await queue.put(pdf_path)
+        finally:
+            batch.walk_complete = True
+            for _ in range(concurrency):
+                await queue.put(None)
+
+    async def worker():
+        while True:
+            pdf_path = await queue.get()
+            if pdf_path is None:
+                return
+
+            try:
+                fingerprint = await batch.fingerprint(pdf_path)
+            except OSError as e:
+                result_data = {"file_path": pdf_path, "status": "error", "error": str(e)}
+                await batch.record(result_data)
+                if on_result:
+                    await on_result(result_data)
+                continue
+
+            previous = await batch.find_completed(pdf_path, fingerprint)
+            if previous:
+                result_data = json.loads(previous)
+                result_data["file_path"] = pdf_path
+                result_data["skipped"] = True
+            else:
+                result_data = await process_single_pdf(pdf_path, single_pass=payload.single_pass)
+
+            await batch.record(result_data)
+            await batch.checkpoint(pdf_path, fingerprint, result_data)
+            if on_result:
+                await on_result(result_data)
+
+    estado = "INTERRUMPIDO"
+    try:
+        await asyncio.gather(producer(), *[worker() for _ in range(concurrency)])
+        estado = "COMPLETADO"
+    finally:
+        # Si el batch se cancela (cliente desconectado) igual se marca como interrumpido
+        await asyncio.shield(batch.finish(estado))
+    return batch
+
+async def resume_interrupted_batches():
+    """
+    Reanuda en segundo plano los batches que quedaron EN_PROCESO por un reinicio del backend
+    (los INTERRUMPIDO por cancelación del cliente solo se reanudan a pedido, enviando su batch_id).
+    Solo se procesan los archivos que no tienen checkpoint completado.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(MOcrBatch.tBatch, MOcrBatch.iConcurrencia).where(MOcrBatch.tEstado == "EN_PROCESO")
+        )
+        payloads = [
+            BatchProcessRequest(folders=[], concurrency=concurrencia or 5, include_details=False, batch_id=batch_id)
+            for batch_id, concurrencia in result.all()
+        ]
+
+    for payload in payloads:
+        print(f"♻️ Reanudando batch OCR interrumpido: {payload.batch_id}")
+        try:
+            batch = await run_batch(payload)
+            await _emit_batch_complete(batch)
+        except Exception as e:
+            print(f"Error reanudando batch {payload.batch_id}: {e}")
+
+async def _emit_batch_complete(batch: BatchRun):
     await sio.emit(EmitEvent.LOG, {
         "type": "batch_complete",
-        "summary": summary,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "message": f"Proceso batch completado. Éxitos: {success_count}, Errores: {error_count}"
+        "summary": {k: v for k, v in batch.summary().items() if k != "details"},
+        "date": _now_str(),
+        "message": f"Proceso batch completado. Éxitos: {batch.success}, Errores: {batch.errors}, Omitidos (ya procesados): {batch.skipped}"
     })
-    
-    return summary
+
+@router.post("/scan-batch", summary="Procesar múltiples carpetas de PDFs en paralelo")
+async def scan_batch_folders(payload: BatchProcessRequest):
+    """
+    Escanea recursivamente las carpetas dadas en busca de archivos .pdf
+    y los procesa en paralelo con una cola acotada de workers.
+    Reporta progreso vía Socket.IO y guarda cada resultado en disco a medida que termina.
+    """
+    if not payload.folders and not payload.batch_id:
+        raise HTTPException(status_code=400, detail="Debe indicar carpetas o un batch_id a reanudar")
+
+    batch = await run_batch(payload)
+
+    if batch.discovered == 0:
+        return {"message": "No se encontraron archivos PDF en las rutas proporcionadas", "total": 0}
+
+    await _emit_batch_complete(batch)
+    return batch.summary()
+
+@router.post("/scan-batch/stream", summary="Procesar carpetas de PDFs devolviendo resultados en streaming (NDJSON)")
+async def scan_batch_folders_stream(payload: BatchProcessRequest):
+    """
+    Igual que /scan-batch, pero devuelve una línea JSON por archivo en cuanto termina
+    y una línea final con el resumen ("type": "summary").
+    Si el cliente se desconecta, el batch se cancela.
+    """
+    if not payload.folders and not payload.batch_id:
+        raise HTTPException(status_code=400, detail="Debe indicar carpetas o un batch_id a reanudar")
+
+    payload.include_details = False
+    output = asyncio.Queue(maxsize=max(1, payload.concurrency) * 2)
+
+    async def runner():
+        try:
+            batch = await run_batch(payload, on_result=output.put)
+            if batch.discovered:
+                await _emit_batch_complete(batch)
+            await output.put({"type": "summary", **batch.summary()})
+        except Exception as e:
+            print(f"Error en batch streaming: {e}")
+            await output.put({"type": "error", "error": str(e)})
+        await output.put(None)
+
+    task = asyncio.create_task(runner())
+
+    async def body():
+        try:
+            while True:
+                item = await output.get()
+                if item is None:
+                    break
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.get("/scan-batch/{batch_id}", summary="Estado de un batch OCR")
+async def get_batch_status(batch_id: str, db: AsyncSession = Depends(get_async_db)):
+    batch = await db.get(MOcrBatch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch no encontrado")
+    return {
+        "batch_id": batch.tBatch,
+        "folders": json.loads(batch.tCarpetas or "[]"),
+        "estado": batch.tEstado,
+        "total": batch.iTotal,
+        "success": batch.iExitos,
+        "errors": batch.iErrores,
+        "skipped": batch.iOmitidos,
+        "started_at": batch.fRegistro,
+        "finished_at": batch.fFin
+    }
 
 @router.post("/scan", summary="Analizar documento con Gemini OCR")
 async def scan_document(
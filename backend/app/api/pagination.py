@@ -0,0 +1,61 @@
+from fastapi import HTTPException, Response
+
+# Paginación por cursor (keyset) para los listados del CRUD.
+# El cuerpo sigue siendo una lista JSON; el cursor de la página siguiente viaja en este header
+# (?after=<cursor>). Sin header = última página.
+# Sin `limit` se devuelve una página de MAX_PAGE_SIZE; la tabla completa solo se pide explícitamente con ?all=true.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(fields: str | None, response_model, always: tuple[str, ...] = ()) -> list[str]:
+    """
+    Proyección: '?fields=tRuc,tRazonSocial' -> lista de campos válidos del modelo de respuesta.
+    Sin `fields` se devuelven todos. Los campos de `always` (la clave del cursor) siempre se incluyen.
+    """
+    allowed = list(response_model.model_fields)
+    if not fields:
+        return allowed
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(unknown)}. Permitidos: {', '.join(allowed)}")
+    return list(dict.fromkeys([*always, *requested]))
+
+
+def keyset_page(query, key_column, after: str | None, limit: int | None, skip: int = 0):
+    """
+    Aplica orden por `key_column` y el cursor `after` (clave de la última fila recibida).
+    Devuelve (filas, cursor_siguiente). `skip` (offset) solo se respeta sin cursor, por compatibilidad.
+    """
+    # order_by debe ir antes de offset/limit (SQLAlchemy no permite ordenar una consulta ya recortada)
+    if after is not None:
+        try:
+            after_value = key_column.type.python_type(after)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Cursor inválido: {after}")
+        query = query.filter(key_column > after_value).order_by(key_column)
+    else:
+        query = query.order_by(key_column)
+        if skip:
+            query = query.offset(skip)
+    if limit is None:
+        return query.all(), None
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, str(rows[-1]._mapping[key_column.key])
+
+
+def page_items(response: Response, response_model, items: list[dict], next_cursor: str | None) -> list:
+    """
+    Fija el header del cursor y arma las filas para el `response_model` del endpoint.
+    model_construct deja como "set" solo los campos proyectados; con response_model_exclude_unset=True
+    FastAPI serializa únicamente esos (las columnas vienen de la BD, no hace falta revalidar).
+    """
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return [response_model.model_construct(**item) for item in items]
@@ -5,8 +5,9 @@ import sys
 import json
 from pydantic import BaseModel
 from dotenv import dotenv_values
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import MSap
 from datetime import datetime
 
@@ -140,7 +141,7 @@ async def get_sap_config():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/config/sap")
-async def save_sap_config(config: SapConfig, db: Session = Depends(get_db)):
+async def save_sap_config(config: SapConfig, db: AsyncSession = Depends(get_async_db)):
     try:
         params_dir = get_service_params_dir()
         file_path = os.path.join(params_dir, "sap_config.json")
@@ -148,7 +149,8 @@ async def save_sap_config(config: SapConfig, db: Session = Depends(get_db)):
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump(config.dict(), f, indent=4)
 
-        db_sap = db.query(MSap).filter(MSap.tUsuario == config.usuario).first()
+        result = await db.execute(select(MSap).where(MSap.tUsuario == config.usuario).limit(1))
+        db_sap = result.scalars().first()
         
         if db_sap:
             db_sap.tClave = config.password
@@ -163,7 +165,7 @@ async def save_sap_config(config: SapConfig, db: Session = Depends(get_db)):
             )
             db.add(new_sap)
             
-        db.commit()
+        await db.commit()
             
         return {"status": "success", "message": "Configuración SAP guardada en archivo y base de datos"}
     except Exception as e:
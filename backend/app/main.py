@@ -1,15 +1,27 @@
+import asyncio
 import socketio
 from app.socket_manager import sio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import auth, utils, bot, crud, ocr
-from app.database import engine, Base, SessionLocal
+from app.database import engine, Base, SessionLocal, ensure_indexes
+from app.services.ejecucion_estado import backfill_estados
 from app import models 
 from app.models import MRol
 
 # Crear tablas si no existen
 Base.metadata.create_all(bind=engine)
 
+# Índices nuevos en bases existentes (create_all no los agrega a tablas ya creadas)
+created_indexes = ensure_indexes(engine)
+if created_indexes:
+    print(f"Índices creados: {', '.join(created_indexes)}")
+
+# Estado de ejecuciones registradas antes de DEJECUCION_ESTADO
+backfilled = backfill_estados(engine)
+if backfilled:
+    print(f"Estados de ejecución creados para {backfilled} ejecuciones previas.")
+
 def seed_roles():
     db = SessionLocal()
     try:
@@ -36,6 +48,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor de paginación de los listados (app/api/pagination.py)
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
@@ -53,5 +67,20 @@ async def startup_event():
     from app.scheduler import start_scheduler
     start_scheduler()
 
+    # Reanudar batches OCR cortados por un reinicio (solo procesa lo que falta)
+    from app.api.ocr import resume_interrupted_batches
+    asyncio.create_task(resume_interrupted_batches())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # No perder cambios de sociedades que aún estaban en la ventana de agrupación
+    from app.services.parameters_writer import parameters_writer
+    if parameters_writer.pending:
+        await asyncio.to_thread(parameters_writer.flush)
+
+    # Logs del bot aún en memoria
+    from app.services.log_buffer import log_buffer
+    await log_buffer.close()
+
 # Mount Socket.IO at /api/socket.io to reuse Nginx /api proxy
 app = socketio.ASGIApp(sio, other_asgi_app=app, socketio_path='/api/socket.io')
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Date, DECIMAL, BigInteger
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Date, DECIMAL, BigInteger, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -73,6 +73,34 @@ class DEjecucion(Base):
     seguimientos = relationship("DSeguimiento", back_populates="ejecucion")
     consumos_gemini = relationship("MConsumoGemini", back_populates="ejecucion")
     descargas = relationship("MDescarga", back_populates="ejecucion")
+    estado = relationship("DEjecucionEstado", back_populates="ejecucion", uselist=False)
+
+    # Historial por sociedad (dashboard): WHERE tRuc = ? ORDER BY fRegistro DESC
+    __table_args__ = (Index("IX_DEJECUCION_tRuc_fRegistro", "tRuc", "fRegistro"),)
+
+# Estado actual de cada ejecución (modelo de lectura del dashboard), actualizado con los eventos del watcher
+class DEjecucionEstado(Base):
+    __tablename__ = "DEJECUCION_ESTADO"
+
+    iMEjecucion = Column(Integer, ForeignKey("DEJECUCION.iMEjecucion"), primary_key=True)
+    tRuc = Column(String(11))
+    tTipo = Column(String(1))
+    iUsuarioEjecucion = Column(Integer)
+    tEstado = Column(String(20), default="PENDIENTE")
+    iProgreso = Column(Integer, default=0)
+    tPaso = Column(String(50))
+    tUltimoMensaje = Column(String(250))
+    iArchivosSap = Column(Integer, default=0)
+    iArchivosSunat = Column(Integer, default=0)
+    fRegistro = Column(DateTime, default=datetime.utcnow)
+    fInicio = Column(DateTime)
+    fFin = Column(DateTime)
+    fActualizacion = Column(DateTime, default=datetime.utcnow)
+
+    ejecucion = relationship("DEjecucion", back_populates="estado")
+
+    # Últimas ejecuciones de una o varias sociedades: WHERE tRuc IN (...) ORDER BY iMEjecucion DESC
+    __table_args__ = (Index("IX_DEJECUCION_ESTADO_tRuc_iMEjecucion", "tRuc", "iMEjecucion"),)
 
 class DEjecucionListaBlanca(Base):
     __tablename__ = "DEJECUCION_LISTA_BLANCA"
@@ -96,6 +124,9 @@ class DSeguimiento(Base):
     ejecucion = relationship("DEjecucion", back_populates="seguimientos")
     evento = relationship("MEvento", back_populates="seguimientos")
 
+    # Logs de una ejecución: WHERE iMEjecucion = ? ORDER BY fRegistro
+    __table_args__ = (Index("IX_DSEGUIMIENTO_iMEjecucion_fRegistro", "iMEjecucion", "fRegistro"),)
+
 class MClaseDocumentoCompra(Base):
     __tablename__ = "MCLASE_DOCUMENTO_COMPRA"
 
@@ -162,6 +193,8 @@ class MListaBlancaSociedad(Base):
     lista_blanca = relationship("MListaBlanca", back_populates="sociedades")
     sociedad = relationship("MSociedad")
 
+    __table_args__ = (Index("IX_MLISTA_BLANCA_SOCIEDAD_tRucListaBlanca", "tRucListaBlanca"),)
+
 class MRol(Base):
     __tablename__ = "MROL"
 
@@ -201,6 +234,9 @@ class MSapSociedad(Base):
     msap = relationship("MSap", back_populates="sap_sociedades")
     sociedad = relationship("MSociedad", back_populates="sap_sociedades")
 
+    # Cuenta SAP activa de una sociedad: WHERE tRuc = ? AND lActivo = 1
+    __table_args__ = (Index("IX_MSAP_SOCIEDAD_tRuc_lActivo", "tRuc", "lActivo"),)
+
 class MSociedad(Base):
     __tablename__ = "MSOCIEDAD"
 
@@ -220,6 +256,8 @@ class MSociedad(Base):
     ejecuciones = relationship("DEjecucion", back_populates="sociedad", cascade="all, delete")
     sap_sociedades = relationship("MSapSociedad", back_populates="sociedad", cascade="all, delete")
 
+    __table_args__ = (Index("IX_MSOCIEDAD_tCodigoSap", "tCodigoSap"),)
+
 class MUsuario(Base):
     __tablename__ = "MUSUARIO"
 
@@ -241,6 +279,9 @@ class MUsuario(Base):
     rol = relationship("MRol", back_populates="usuarios")
     ejecuciones = relationship("DEjecucion", back_populates="usuario")
 
+    # Login: WHERE tCorreo = ?
+    __table_args__ = (Index("IX_MUSUARIO_tCorreo", "tCorreo"),)
+
 class MProgramacion(Base):
     __tablename__ = "MPROGRAMACION"
 
@@ -254,6 +295,9 @@ class MProgramacion(Base):
     
     sociedades = relationship("MProgramacionSociedad", back_populates="programacion", cascade="all, delete-orphan")
 
+    # Scheduler: WHERE lActivo = 1
+    __table_args__ = (Index("IX_MPROGRAMACION_lActivo", "lActivo"),)
+
 class MProgramacionSociedad(Base):
     __tablename__ = "MPROGRAMACION_SOCIEDAD"
 
@@ -263,3 +307,57 @@ class MProgramacionSociedad(Base):
     
     programacion = relationship("MProgramacion", back_populates="sociedades")
     sociedad = relationship("MSociedad")
+
+    __table_args__ = (
+        Index("IX_MPROGRAMACION_SOCIEDAD_iMProgramacion", "iMProgramacion"),
+        # Programaciones activas de una sociedad (dashboard): JOIN por tRuc
+        Index("IX_MPROGRAMACION_SOCIEDAD_tRuc_iMProgramacion", "tRuc", "iMProgramacion"),
+    )
+
+# Disparos del scheduler: un worker reclama (iMProgramacion, fProgramada) con el INSERT; si ya existe, otro lo ejecutó.
+# Sin FK a MPROGRAMACION para conservar el historial al eliminar la programación.
+class DProgramacionDisparo(Base):
+    __tablename__ = "DPROGRAMACION_DISPARO"
+
+    iMDisparo = Column(Integer, primary_key=True, index=True)
+    iMProgramacion = Column(Integer, nullable=False)
+    fProgramada = Column(DateTime, nullable=False)
+    tInstancia = Column(String(100))
+    tEstado = Column(String(20), default="EN_PROCESO")
+    iEjecuciones = Column(Integer, default=0)
+    lRecuperado = Column(Boolean, default=False)
+    fRegistro = Column(DateTime, default=datetime.utcnow)
+    fFin = Column(DateTime)
+
+    __table_args__ = (UniqueConstraint("iMProgramacion", "fProgramada", name="UQ_DPROGRAMACION_DISPARO"),)
+
+class MOcrBatch(Base):
+    __tablename__ = "MOCR_BATCH"
+
+    tBatch = Column(String(36), primary_key=True, index=True)
+    tCarpetas = Column(String)
+    iConcurrencia = Column(Integer, default=5)
+    tEstado = Column(String(20), default="EN_PROCESO")
+    iTotal = Column(Integer, default=0)
+    iExitos = Column(Integer, default=0)
+    iErrores = Column(Integer, default=0)
+    iOmitidos = Column(Integer, default=0)
+    fRegistro = Column(DateTime, default=datetime.utcnow)
+    fFin = Column(DateTime)
+
+    archivos = relationship("DOcrBatchArchivo", back_populates="batch", cascade="all, delete-orphan")
+
+class DOcrBatchArchivo(Base):
+    __tablename__ = "DOCR_BATCH_ARCHIVO"
+
+    iMDetalle = Column(Integer, primary_key=True, index=True)
+    tBatch = Column(String(36), ForeignKey("MOCR_BATCH.tBatch"), index=True)
+    tRutaArchivo = Column(String, index=True)
+    iTamano = Column(BigInteger)
+    nMtime = Column(Float)
+    tHash = Column(String(64), index=True)
+    tEstado = Column(String(20))
+    tResultado = Column(String)
+    fRegistro = Column(DateTime, default=datetime.utcnow)
+
+    batch = relationship("MOcrBatch", back_populates="archivos")
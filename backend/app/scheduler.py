@@ -1,73 +1,321 @@
+import os
+import heapq
+import socket
 import asyncio
 import logging
-from datetime import datetime
-from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app.models import MProgramacion
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app.database import AsyncSessionLocal
+from app.models import MProgramacion, DProgramacionDisparo
 from app.services.execution import execute_programacion_logic
 
 logger = logging.getLogger(__name__)
 
-executed_schedules = set()
+# Tope de espera del loop: se recalcula aunque no haya cambios (ajustes del reloj del servidor)
+SCHEDULER_MAX_SLEEP_SECONDS = float(os.getenv("SCHEDULER_MAX_SLEEP_SECONDS", "3600"))
+# Al arrancar se recuperan los disparos perdidos en esta ventana (backend caído); 0 = no recuperar.
+# Si se perdieron varios de la misma programación solo se ejecuta el último.
+SCHEDULER_CATCHUP_MINUTES = float(os.getenv("SCHEDULER_CATCHUP_MINUTES", "5"))
+# Con varios workers cada uno tiene su cola y el CRUD solo avisa al que atendió el request:
+# cada N segundos se recarga la cola desde la base (0 = solo al arrancar, un único worker)
+SCHEDULER_RELOAD_SECONDS = float(os.getenv("SCHEDULER_RELOAD_SECONDS", "0"))
+
+# Identifica al worker que reclamó cada disparo en DPROGRAMACION_DISPARO
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Nombres de día aceptados en tDias -> datetime.weekday()
+DAY_ALIASES = {
+    0: ["Lun", "Lunes", "Mo"],
+    1: ["Mar", "Martes", "Tu"],
+    2: ["Mie", "Mié", "Miercoles", "Miércoles", "We"],
+    3: ["Jue", "Jueves", "Th"],
+    4: ["Vie", "Viernes", "Fr"],
+    5: ["Sab", "Sábado", "Sa"],
+    6: ["Dom", "Domingo", "Su"],
+}
+
+
+def _normalize_day(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name.strip()).encode("ascii", "ignore").decode()
+    return name.lower()
+
+
+WEEKDAYS = {_normalize_day(alias): weekday for weekday, aliases in DAY_ALIASES.items() for alias in aliases}
+
+
+def parse_days(dias: str | None) -> set[int]:
+    if not dias:
+        return set()
+    return {WEEKDAYS[d] for d in map(_normalize_day, dias.split(",")) if d in WEEKDAYS}
+
+
+def parse_hour(hora: str | None) -> tuple[int, int] | None:
+    try:
+        hour, minute = (int(part) for part in hora.strip().split(":"))
+    except (AttributeError, ValueError):
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return hour, minute
+
+
+def next_fire_time(hora: str | None, dias: str | None, after: datetime) -> datetime | None:
+    """Próxima fecha/hora (estrictamente posterior a `after`) en que corresponde ejecutar la programación."""
+    parsed = parse_hour(hora)
+    weekdays = parse_days(dias)
+    if parsed is None or not weekdays:
+        return None
+
+    hour, minute = parsed
+    for offset in range(8):
+        candidate = (after + timedelta(days=offset)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate > after and candidate.weekday() in weekdays:
+            return candidate
+    return None
+
+
+def missed_fire_time(hora: str | None, dias: str | None, since: datetime, now: datetime) -> datetime | None:
+    """Último disparo que correspondía en (since, now], o None."""
+    last = None
+    fire_at = next_fire_time(hora, dias, since)
+    while fire_at is not None and fire_at <= now:
+        last = fire_at
+        fire_at = next_fire_time(hora, dias, fire_at)
+    return last
+
+
+class ScheduleQueue:
+    """
+    Cola de prioridad con la próxima ejecución de cada programación activa.
+    El loop duerme hasta la más próxima; crud.py avisa con update()/remove() al crear,
+    editar, activar/desactivar o eliminar (los endpoints síncronos corren en otros hilos).
+    Las entradas reemplazadas quedan en el heap y se descartan al salir (versión distinta).
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[datetime, int, int]] = []
+        self._entries: dict[int, tuple[int, str, str]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+
+    def _push(self, programacion_id: int, hora: str, dias: str, after: datetime) -> datetime | None:
+        fire_at = next_fire_time(hora, dias, after)
+        if fire_at is None:
+            self._entries.pop(programacion_id, None)
+            return None
+        self._version += 1
+        self._entries[programacion_id] = (self._version, hora, dias)
+        heapq.heappush(self._heap, (fire_at, programacion_id, self._version))
+        return fire_at
+
+    def load(self, programaciones, now: datetime | None = None):
+        now = now or datetime.now()
+        with self._lock:
+            self._heap.clear()
+            self._entries.clear()
+            for prog in programaciones:
+                self._push(prog.iMProgramacion, prog.tHora, prog.tDias, now)
+
+    def update(self, programacion_id: int, hora: str | None, dias: str | None, activo: bool = True):
+        with self._lock:
+            if activo:
+                fire_at = self._push(programacion_id, hora, dias, datetime.now())
+            else:
+                fire_at = None
+                self._entries.pop(programacion_id, None)
+        logger.info(f"Programación {programacion_id}: próxima ejecución {fire_at}")
+        self._notify()
+
+    def remove(self, programacion_id: int):
+        self.update(programacion_id, None, None, activo=False)
+
+    def _notify(self):
+        if self._loop and self._wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def next_fire(self) -> datetime | None:
+        with self._lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _discard_stale(self):
+        while self._heap:
+            _, programacion_id, version = self._heap[0]
+            entry = self._entries.get(programacion_id)
+            if entry and entry[0] == version:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: datetime) -> list[tuple[int, datetime]]:
+        """
+        Saca las programaciones vencidas y encola su siguiente ejecución desde `now`.
+        Si el loop estuvo detenido (suspensión, pausa larga) y se saltaron varios horarios,
+        solo se devuelve el último vencido de cada programación, igual que catch_up().
+        """
+        due = []
+        with self._lock:
+            while True:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                fire_at, programacion_id, _ = heapq.heappop(self._heap)
+                _, hora, dias = self._entries[programacion_id]
+                due.append((programacion_id, missed_fire_time(hora, dias, fire_at, now) or fire_at))
+                self._push(programacion_id, hora, dias, now)
+        return due
+
+    async def wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._wake = asyncio.Event()
+
+
+schedule_queue = ScheduleQueue()
+
+
+# Disparos en curso: el loop no los espera (asyncio solo guarda referencias débiles a las tareas)
+running_fires: set[asyncio.Task] = set()
+
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    running_fires.add(task)
+    task.add_done_callback(running_fires.discard)
+    return task
+
+
+async def claim_fire(programacion_id: int, fire_at: datetime, recovered: bool = False) -> int | None:
+    """
+    Reclama el disparo en el ledger. La restricción única (iMProgramacion, fProgramada) garantiza que
+    solo un worker (o un solo arranque) lo ejecute. Devuelve el id del disparo, o None si ya estaba reclamado.
+    """
+    async with AsyncSessionLocal() as db:
+        disparo = DProgramacionDisparo(
+            iMProgramacion=programacion_id,
+            fProgramada=fire_at,
+            tInstancia=INSTANCE_ID,
+            lRecuperado=recovered,
+        )
+        db.add(disparo)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            return None
+        return disparo.iMDisparo
+
+
+async def finish_fire(disparo_id: int, estado: str, ejecuciones: int = 0):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(DProgramacionDisparo)
+            .where(DProgramacionDisparo.iMDisparo == disparo_id)
+            .values(tEstado=estado, iEjecuciones=ejecuciones, fFin=datetime.utcnow())
+        )
+        await db.commit()
+
+
+async def is_still_scheduled(programacion_id: int, fire_at: datetime) -> bool:
+    """La cola de este worker puede estar desactualizada (cambios hechos en otro worker): se confirma con la base."""
+    async with AsyncSessionLocal() as db:
+        prog = await db.get(MProgramacion, programacion_id)
+    if not prog or not prog.lActivo:
+        return False
+    return next_fire_time(prog.tHora, prog.tDias, fire_at - timedelta(seconds=1)) == fire_at
+
+
+async def run_programacion(programacion_id: int, fire_at: datetime, recovered: bool = False):
+    try:
+        if not await is_still_scheduled(programacion_id, fire_at):
+            logger.info(f"Schedule {programacion_id} ({fire_at:%Y-%m-%d %H:%M}) ya no está vigente, se omite")
+            return
+        disparo_id = await claim_fire(programacion_id, fire_at, recovered)
+        if disparo_id is None:
+            logger.info(f"Schedule {programacion_id} ({fire_at:%Y-%m-%d %H:%M}) ya fue ejecutado por otra instancia")
+            return
+    except Exception as e:
+        logger.error(f"Error reclamando programación {programacion_id}: {e}")
+        return
+
+    try:
+        async with AsyncSessionLocal() as db:
+            logger.info(f"Executing schedule {programacion_id} (programada {fire_at:%Y-%m-%d %H:%M})")
+            execution_ids = await execute_programacion_logic(db, programacion_id)
+        await finish_fire(disparo_id, "COMPLETADO", len(execution_ids))
+    except Exception as e:
+        logger.error(f"Error ejecutando programación {programacion_id}: {e}")
+        await finish_fire(disparo_id, "ERROR")
+
+
+def catch_up(programaciones, now: datetime) -> list[tuple[int, datetime]]:
+    if SCHEDULER_CATCHUP_MINUTES <= 0:
+        return []
+    since = now - timedelta(minutes=SCHEDULER_CATCHUP_MINUTES)
+    missed = []
+    for prog in programaciones:
+        fire_at = missed_fire_time(prog.tHora, prog.tDias, since, now)
+        if fire_at is not None:
+            missed.append((prog.iMProgramacion, fire_at))
+    return missed
+
+
+async def load_programaciones():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(MProgramacion).where(MProgramacion.lActivo == True))
+        return result.scalars().all()
+
 
 async def check_schedules():
     """
-    Periodically checks for schedules to run.
+    Duerme hasta la próxima ejecución programada y lanza las que vencen.
     """
     logger.info("Scheduler started.")
+    schedule_queue.bind(asyncio.get_running_loop())
+
+    programaciones = await load_programaciones()
+    now = datetime.now()
+    schedule_queue.load(programaciones, now)
+    last_reload = now
+    # Disparos perdidos mientras el backend estaba abajo; los ya registrados en el ledger se omiten al reclamar
+    for programacion_id, fire_at in catch_up(programaciones, now):
+        logger.info(f"Recuperando schedule {programacion_id} (programada {fire_at:%Y-%m-%d %H:%M})")
+        spawn(run_programacion(programacion_id, fire_at, recovered=True))
+
     while True:
         try:
             now = datetime.now()
-            current_time = now.strftime("%H:%M")
-            current_day_name = now.strftime("%A")
-            days_map = {
-                "Monday": ["Lun", "Lunes", "Mo"],
-                "Tuesday": ["Mar", "Martes", "Tu"],
-                "Wednesday": ["Mie", "Mié", "Miercoles", "Miércoles", "We"],
-                "Thursday": ["Jue", "Jueves", "Th"],
-                "Friday": ["Vie", "Viernes", "Fr"],
-                "Saturday": ["Sab", "Sábado", "Sa"],
-                "Sunday": ["Dom", "Domingo", "Su"]
-            }
-            
-            possible_day_names = days_map.get(current_day_name, [])
-            
-            db = SessionLocal()
-            try:
-                programaciones = db.query(MProgramacion).filter(MProgramacion.lActivo == True).all()
-                for prog in programaciones:
-                    if prog.tHora != current_time:
-                        continue
-                    match_day = False
-                    if not prog.tDias:
-                        continue
-                        
-                    prog_days = [d.strip() for d in prog.tDias.split(',')]
-                    for pd in prog_days:
-                        if pd in possible_day_names:
-                            match_day = True
-                            break
-                    
-                    if not match_day:
-                        continue
-
-                    today_str = now.strftime("%Y-%m-%d")
-                    cache_key = (prog.iMProgramacion, today_str)
-                    
-                    if cache_key in executed_schedules:
-                        continue
-
-                    logger.info(f"Executing schedule {prog.iMProgramacion} - {prog.tNombre}")
-                    await execute_programacion_logic(db, prog.iMProgramacion)              
-                    executed_schedules.add(cache_key)
-                    
-            finally:
-                db.close()
-                
+            due = schedule_queue.pop_due(now)
+            if SCHEDULER_RELOAD_SECONDS > 0 and (now - last_reload).total_seconds() >= SCHEDULER_RELOAD_SECONDS:
+                # La recarga calcula hacia adelante desde `now`; lo ya vencido se sacó antes
+                schedule_queue.load(await load_programaciones(), now)
+                last_reload = now
+
+            for programacion_id, fire_at in due:
+                # Cada disparo corre aparte: una ejecución lenta no retrasa las siguientes
+                spawn(run_programacion(programacion_id, fire_at))
+
+            next_fire = schedule_queue.next_fire()
+            timeout = SCHEDULER_MAX_SLEEP_SECONDS
+            if SCHEDULER_RELOAD_SECONDS > 0:
+                timeout = min(timeout, SCHEDULER_RELOAD_SECONDS)
+            if next_fire is not None:
+                timeout = min(timeout, max(0.0, (next_fire - datetime.now()).total_seconds()))
         except Exception as e:
             logger.error(f"Error in scheduler loop: {e}")
+            timeout = 60
 
-        await asyncio.sleep(60)
+        await schedule_queue.wait(timeout)
 
 def start_scheduler():
     asyncio.create_task(check_schedules())
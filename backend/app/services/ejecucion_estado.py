@@ -0,0 +1,105 @@
+import logging
+from datetime import datetime
+from sqlalchemy import update, insert, select, literal
+from app.database import engine, AsyncSessionLocal
+from app.models import DEjecucion, DEjecucionEstado
+
+logger = logging.getLogger(__name__)
+
+ESTADO_PENDIENTE = "PENDIENTE"
+ESTADO_EN_PROCESO = "EN_PROCESO"
+ESTADO_COMPLETADO = "COMPLETADO"
+ESTADO_ERROR = "ERROR"
+
+# Texto que muestra el dashboard para cada estado
+ESTADO_LABELS = {
+    ESTADO_PENDIENTE: "Pendiente",
+    ESTADO_EN_PROCESO: "En proceso",
+    ESTADO_COMPLETADO: "Completado",
+    ESTADO_ERROR: "Error",
+}
+
+# Campos del evento status:bot -> columnas de DEJECUCION_ESTADO
+STATUS_FIELDS = {
+    "estado": "tEstado",
+    "progreso": "iProgreso",
+    "paso": "tPaso",
+    "message": "tUltimoMensaje",
+    "archivos_sap": "iArchivosSap",
+    "archivos_sunat": "iArchivosSunat",
+}
+
+
+def new_estado(ejecucion: dict) -> dict:
+    """Valores de DEJECUCION_ESTADO para una ejecución recién creada (`ejecucion`: columnas de DEJECUCION)."""
+    return {
+        "iMEjecucion": ejecucion["iMEjecucion"],
+        "tRuc": ejecucion["tRuc"],
+        "tTipo": ejecucion["tTipo"],
+        "iUsuarioEjecucion": ejecucion.get("iUsuarioEjecucion"),
+        "tEstado": ESTADO_PENDIENTE,
+        "iProgreso": 0,
+        "tPaso": "En cola",
+        "fRegistro": ejecucion["fRegistro"],
+        "fActualizacion": datetime.utcnow(),
+    }
+
+
+def status_values(data: dict) -> dict:
+    """Traduce un evento status:bot a los valores a actualizar (solo los campos presentes)."""
+    values = {column: data[field] for field, column in STATUS_FIELDS.items() if data.get(field) is not None}
+    if "tUltimoMensaje" in values:
+        values["tUltimoMensaje"] = str(values["tUltimoMensaje"])[:250]
+    if "iProgreso" in values:
+        values["iProgreso"] = max(0, min(100, int(values["iProgreso"])))
+
+    now = datetime.utcnow()
+    estado = values.get("tEstado")
+    if estado == ESTADO_EN_PROCESO and data.get("paso") == "Inicio":
+        values["fInicio"] = now
+    if estado in (ESTADO_COMPLETADO, ESTADO_ERROR):
+        values["fFin"] = now
+    values["fActualizacion"] = now
+    return values
+
+
+async def apply_status_event(data: dict) -> bool:
+    """Aplica un evento status:bot del watcher SUNAT/SAP. Un UPDATE por evento (pocos por ejecución)."""
+    execution_id = data.get("execution_id") if isinstance(data, dict) else None
+    if not execution_id:
+        return False
+
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(DEjecucionEstado)
+                .where(DEjecucionEstado.iMEjecucion == int(execution_id))
+                .values(**status_values(data))
+            )
+            await db.commit()
+            return result.rowcount > 0
+    except Exception as e:
+        logger.error(f"Error actualizando estado de la ejecución {execution_id}: {e}")
+        return False
+
+
+def backfill_estados(bind=None) -> int:
+    """
+    Crea el estado de las ejecuciones anteriores a DEJECUCION_ESTADO con un solo INSERT ... SELECT.
+    Se asumen terminadas, que es como las mostraba el dashboard.
+    """
+    bind = bind or engine
+    missing = (
+        select(
+            DEjecucion.iMEjecucion, DEjecucion.tRuc, DEjecucion.tTipo, DEjecucion.iUsuarioEjecucion,
+            literal(ESTADO_COMPLETADO), literal(100), DEjecucion.fRegistro, DEjecucion.fRegistro
+        )
+        .outerjoin(DEjecucionEstado, DEjecucionEstado.iMEjecucion == DEjecucion.iMEjecucion)
+        .where(DEjecucionEstado.iMEjecucion == None)
+    )
+    stmt = insert(DEjecucionEstado).from_select(
+        ["iMEjecucion", "tRuc", "tTipo", "iUsuarioEjecucion", "tEstado", "iProgreso", "fRegistro", "fActualizacion"],
+        missing
+    )
+    with bind.begin() as conn:
+        return conn.execute(stmt).rowcount
@@ -1,13 +1,20 @@
-from sqlalchemy.orm import Session
+import os
+import asyncio
+from sqlalchemy import select, insert, and_
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from app.models import MProgramacion, MProgramacionSociedad, MSociedad, MSap, MSapSociedad, DEjecucion
+from app.models import MProgramacion, MProgramacionSociedad, MSociedad, MSap, MSapSociedad, DEjecucion, DEjecucionEstado
 from app.api.bot import run_bot_logic, BotConfig, SunatConfig, SapConfig, GeneralConfig
+from app.services.ejecucion_estado import new_estado, apply_status_event, ESTADO_ERROR
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def execute_programacion_logic(db: Session, programacion_id: int, ruc: str | None = None, manual_user_id: int | None = None, date_str: str | None = None):
-    prog = db.query(MProgramacion).filter(MProgramacion.iMProgramacion == programacion_id).first()
+# Trabajos escritos en paralelo en la carpeta de intercambio del watcher
+ENQUEUE_CONCURRENCY = int(os.getenv("EXECUTION_ENQUEUE_CONCURRENCY", "8"))
+
+async def execute_programacion_logic(db: AsyncSession, programacion_id: int, ruc: str | None = None, manual_user_id: int | None = None, date_str: str | None = None):
+    prog = await db.get(MProgramacion, programacion_id)
     if not prog:
         logger.error(f"Programación {programacion_id} no encontrada")
         return []
@@ -16,87 +23,128 @@ async def execute_programacion_logic(db: Session, programacion_id: int, ruc: str
     if ruc:
         target_rucs = [ruc]
     else:
-        rels = db.query(MProgramacionSociedad).filter(MProgramacionSociedad.iMProgramacion == programacion_id).all()
-        target_rucs = [r.tRuc for r in rels]
+        result = await db.execute(
+            select(MProgramacionSociedad.tRuc).where(MProgramacionSociedad.iMProgramacion == programacion_id)
+        )
+        target_rucs = list(result.scalars().all())
         
     return await execute_sociedad_logic(db, target_rucs, manual_user_id, date_str, time_str=prog.tHora, days_str=prog.tDias)
 
-async def execute_sociedad_logic(db: Session, target_rucs: list[str], manual_user_id: int | None = None, date_str: str | None = None, time_str: str | None = None, days_str: str | None = None):
-    created_executions = []
+async def load_targets(db: AsyncSession, target_rucs: list[str]) -> dict[str, tuple[MSociedad, MSap | None]]:
+    """Sociedades y su cuenta SAP activa en una sola consulta (antes: tres consultas por RUC)."""
+    result = await db.execute(
+        select(MSociedad, MSap)
+        .outerjoin(MSapSociedad, and_(MSapSociedad.tRuc == MSociedad.tRuc, MSapSociedad.lActivo == True))
+        .outerjoin(MSap, MSap.iMSAP == MSapSociedad.iMSAP)
+        .where(MSociedad.tRuc.in_(target_rucs))
+        .order_by(MSociedad.tRuc, MSapSociedad.iMDetalle)
+    )
+    targets = {}
+    for sociedad, sap_account in result.all():
+        current = targets.get(sociedad.tRuc)
+        # Primera relación SAP activa de cada sociedad
+        if current is None or (current[1] is None and sap_account is not None):
+            targets[sociedad.tRuc] = (sociedad, sap_account)
+    return targets
 
-    if not date_str:
-        date_str = datetime.now().strftime("%d/%m/%Y")
+def build_bot_config(sociedad: MSociedad, sap_account: MSap, execution_id: int, tipo: str, date_str: str, time_str: str | None, days_str: str | None) -> BotConfig:
+    soc_code = sociedad.tCodigoSap or sociedad.tRazonSocial
 
-    for target_ruc in target_rucs:
+    try:
+        dt_obj = datetime.strptime(date_str, "%d/%m/%Y")
+        date_suffix = dt_obj.strftime("%d%m%y")
+    except:
+        date_suffix = datetime.now().strftime("%d%m%y")
+
+    folder_name = f"{soc_code}_{date_suffix}"
+    base_download_dir = "/home/sertech/sunat-sap"
+    full_folder_path = f"{base_download_dir}/{folder_name}"
+
+    return BotConfig(
+        sunat=SunatConfig(
+            ruc=sociedad.tRuc,
+            usuario=sociedad.tUsuario or "",
+            claveSol=sociedad.tClave or ""
+        ),
+        sap=SapConfig(
+            usuario=sap_account.tUsuario or "",
+            password=sap_account.tClave or ""
+        ),
+        general=GeneralConfig(
+            sociedad=soc_code,
+            fecha=date_str,
+            folder=full_folder_path,
+            hora=time_str,
+            dias=days_str
+        ),
+        execution_id=execution_id,
+        tipo=tipo
+    )
+
+async def enqueue_job(config: BotConfig, semaphore: asyncio.Semaphore):
+    async with semaphore:
         try:
-            sociedad = db.query(MSociedad).filter(MSociedad.tRuc == target_ruc).first()
-            if not sociedad:
-                logger.warning(f"Sociedad {target_ruc} no encontrada, saltando...")
-                continue
-
-            sap_rel = db.query(MSapSociedad).filter(
-                MSapSociedad.tRuc == target_ruc, 
-                MSapSociedad.lActivo == True
-            ).first()
-            
-            sap_account = None
-            if sap_rel:
-                sap_account = db.query(MSap).filter(MSap.iMSAP == sap_rel.iMSAP).first()
-                
-            if not sap_account:
-                logger.warning(f"No hay cuenta SAP activa asociada a {target_ruc}, saltando...")
-                continue
-
-            new_exec = DEjecucion(
-                tTipo='M' if manual_user_id else 'A',
-                tRuc=target_ruc,
-                iMSAP=sap_account.iMSAP,
-                fRegistro=datetime.utcnow(),
-                iUsuarioEjecucion=manual_user_id,
-            )
-            db.add(new_exec)
-            db.commit()
-            db.refresh(new_exec)
-            created_executions.append(new_exec.iMEjecucion)
-
-            sunat_user = sociedad.tUsuario or ""
-            sunat_pass = sociedad.tClave or ""
-            sap_user = sap_account.tUsuario or ""
-            sap_pass = sap_account.tClave or ""
-            soc_code = sociedad.tCodigoSap or sociedad.tRazonSocial 
-
-            try:
-                dt_obj = datetime.strptime(date_str, "%d/%m/%Y")
-                date_suffix = dt_obj.strftime("%d%m%y")
-            except:
-                date_suffix = datetime.now().strftime("%d%m%y")
-                
-            folder_name = f"{soc_code}_{date_suffix}"
-            base_download_dir = "/home/sertech/sunat-sap" 
-            full_folder_path = f"{base_download_dir}/{folder_name}"
-
-            config = BotConfig(
-                sunat=SunatConfig(
-                    ruc=target_ruc,
-                    usuario=sunat_user,
-                    claveSol=sunat_pass
-                ),
-                sap=SapConfig(
-                    usuario=sap_user,
-                    password=sap_pass
-                ),
-                general=GeneralConfig(
-                    sociedad=soc_code,
-                    fecha=date_str,
-                    folder=full_folder_path,
-                    hora=time_str,
-                    dias=days_str
-                ),
-                execution_id=new_exec.iMEjecucion
-            )
             await run_bot_logic(config)
-            
         except Exception as e:
-            logger.error(f"Error executing for RUC {target_ruc}: {e}")
-            
+            detail = getattr(e, "detail", None) or str(e)
+            logger.error(f"Error executing for RUC {config.sunat.ruc}: {detail}")
+            await apply_status_event({
+                "execution_id": config.execution_id,
+                "estado": ESTADO_ERROR,
+                "paso": "Envío",
+                "message": f"No se pudo enviar el trabajo: {detail}"[:250]
+            })
+
+async def execute_sociedad_logic(db: AsyncSession, target_rucs: list[str], manual_user_id: int | None = None, date_str: str | None = None, time_str: str | None = None, days_str: str | None = None):
+    if not date_str:
+        date_str = datetime.now().strftime("%d/%m/%Y")
+
+    target_rucs = list(dict.fromkeys(target_rucs))
+    targets = await load_targets(db, target_rucs)
+
+    ready = []
+    for target_ruc in target_rucs:
+        if target_ruc not in targets:
+            logger.warning(f"Sociedad {target_ruc} no encontrada, saltando...")
+            continue
+        sociedad, sap_account = targets[target_ruc]
+        if not sap_account:
+            logger.warning(f"No hay cuenta SAP activa asociada a {target_ruc}, saltando...")
+            continue
+        ready.append((sociedad, sap_account))
+
+    if not ready:
+        return []
+
+    # Todas las ejecuciones y su estado en una sola transacción: un INSERT ... RETURNING por lotes.
+    # El orden de RETURNING no está garantizado en todos los motores; se asocia por RUC (únicos en el lote).
+    tipo = 'M' if manual_user_id else 'A'
+    now = datetime.utcnow()
+    rows = [
+        {"tTipo": tipo, "tRuc": sociedad.tRuc, "iMSAP": sap_account.iMSAP, "fRegistro": now, "iUsuarioEjecucion": manual_user_id}
+        for sociedad, sap_account in ready
+    ]
+    try:
+        result = await db.execute(insert(DEjecucion).returning(DEjecucion.iMEjecucion, DEjecucion.tRuc), rows)
+        execution_by_ruc = {ruc: execution_id for execution_id, ruc in result.all()}
+        await db.execute(insert(DEjecucionEstado), [
+            new_estado({**row, "iMEjecucion": execution_by_ruc[row["tRuc"]]})
+            for row in rows
+        ])
+        await db.commit()
+    except Exception as e:
+        logger.error(f"Error registrando ejecuciones para {len(ready)} sociedades: {e}")
+        await db.rollback()
+        return []
+
+    created_executions = [execution_by_ruc[sociedad.tRuc] for sociedad, _ in ready]
+    configs = [
+        build_bot_config(sociedad, sap_account, execution_id, tipo, date_str, time_str, days_str)
+        for (sociedad, sap_account), execution_id in zip(ready, created_executions)
+    ]
+
+    # Envío al watcher en paralelo; un fallo solo marca en ERROR su propia ejecución
+    semaphore = asyncio.Semaphore(ENQUEUE_CONCURRENCY)
+    await asyncio.gather(*(enqueue_job(config, semaphore) for config in configs))
+
     return created_executions
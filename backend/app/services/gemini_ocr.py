@@ -4,6 +4,7 @@ import json
 import shutil
 import uuid
 import asyncio
+from app.services.result_dispatcher import ResultDispatcher
 
 # Configuración de carpetas DMZ
 # backend/app/services/gemini_ocr.py -> backend/app/services -> backend/app -> backend -> root
@@ -22,29 +23,121 @@ os.makedirs(PROCESSED_DIR, exist_ok=True)
 os.makedirs(ERROR_DIR, exist_ok=True)
 os.makedirs(FILES_DIR, exist_ok=True)
 
+# Modo de entrega de archivos a la DMZ:
+# - auto (por defecto): hardlink o reflink si origen y exchange están en el mismo filesystem, si no copia.
+# - copy: siempre copia.
+OCR_HANDOFF_MODE = os.getenv("OCR_HANDOFF_MODE", "auto").lower()
+
+# Archivos en files/ más antiguos que esto se consideran huérfanos (p. ej. trabajos con timeout)
+OCR_FILES_MAX_AGE_HOURS = float(os.getenv("OCR_FILES_MAX_AGE_HOURS", "24"))
+_GC_INTERVAL_SECONDS = 600
+_last_gc = 0.0
+# Momento en que este proceso dejó cada archivo en files/ (nombre -> time.time()).
+# El mtime no sirve: un hardlink conserva el del archivo original, que puede tener meses.
+_handoff_times: dict[str, float] = {}
+
+# ioctl FICLONE de Linux (reflink en btrfs/xfs)
+_FICLONE = 0x40049409
+
+# Un único despachador de resultados para todos los trabajos OCR del proceso
+result_dispatcher = ResultDispatcher(PROCESSED_DIR)
+
 def _generate_job_id():
     return str(uuid.uuid4())
 
+def _reflink(src: str, dst: str):
+    import fcntl
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+def _handoff_file(src: str, dst: str) -> str:
+    """
+    Deja el archivo en la carpeta de intercambio sin duplicar datos cuando es posible.
+    Devuelve el método usado: 'hardlink', 'reflink' o 'copy'.
+    """
+    if OCR_HANDOFF_MODE != "copy":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+        try:
+            _reflink(src, dst)
+            return "reflink"
+        except (OSError, ImportError):
+            pass
+    shutil.copy(src, dst)
+    return "copy"
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _release_file(path: str):
+    _handoff_times.pop(os.path.basename(path), None)
+    _remove_quietly(path)
+
+def _handoff_time(entry: os.DirEntry) -> float:
+    handed_off = _handoff_times.get(entry.name)
+    if handed_off is not None:
+        return handed_off
+    # Archivos de una ejecución anterior del backend: crear un hardlink actualiza el ctime del inodo
+    # (no el mtime), y una copia o reflink es un inodo nuevo, así que el mayor de ambos es la entrega.
+    st = entry.stat()
+    return max(st.st_mtime, st.st_ctime)
+
+def _gc_stale_files(force: bool = False):
+    """Elimina de files/ los archivos huérfanos cuyo resultado nunca se consumió (como mucho cada 10 min)."""
+    global _last_gc
+    now = time.time()
+    if not force and now - _last_gc < _GC_INTERVAL_SECONDS:
+        return
+    _last_gc = now
+
+    cutoff = now - OCR_FILES_MAX_AGE_HOURS * 3600
+    try:
+        with os.scandir(FILES_DIR) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                # Trabajo todavía esperando resultado: la DMZ puede no haberlo leído aún
+                job_id = os.path.splitext(entry.name)[0]
+                if result_dispatcher.is_pending(job_id):
+                    continue
+                if _handoff_time(entry) < cutoff:
+                    _release_file(entry.path)
+    except OSError as e:
+        print(f"⚠️ Error limpiando archivos de DMZ: {e}")
+
 async def _submit_and_wait(action: str, file_path: str = None, file_content: bytes = None, file_ext: str = ".pdf", **kwargs):
     """
     Envía un trabajo a la DMZ y espera el resultado.
     """
     job_id = _generate_job_id()
     job_filename = f"{job_id}.json"
-    result_filename = f"{job_id}.result.json"
     
     # 1. Preparar archivo
     target_file_name = f"{job_id}{file_ext}"
     target_file_path = os.path.join(FILES_DIR, target_file_name)
     
+    _gc_stale_files()
+
     try:
         if file_path:
-            shutil.copy(file_path, target_file_path)
+            _handoff_file(file_path, target_file_path)
         elif file_content:
             with open(target_file_path, "wb") as f:
                 f.write(file_content)
         else:
             raise ValueError("Se requiere file_path o file_content")
+        _handoff_times[target_file_name] = time.time()
     except Exception as e:
         return {"error": f"Error copiando archivo a DMZ: {str(e)}"}
         
@@ -57,41 +150,34 @@ async def _submit_and_wait(action: str, file_path: str = None, file_content: byt
         **kwargs
     }
     
+    # 3. Registrar el trabajo en el despachador antes de publicarlo para no perder el resultado
+    result_future = result_dispatcher.register(job_id)
+
     job_path = os.path.join(PENDING_DIR, job_filename)
-    with open(job_path, "w", encoding="utf-8") as f:
-        json.dump(job_data, f, indent=4, ensure_ascii=False)
+    # Escritura atómica (tmp + rename) para que el watcher no lea un JSON a medias
+    tmp_job_path = job_path + ".tmp"
+    try:
+        with open(tmp_job_path, "w", encoding="utf-8") as f:
+            json.dump(job_data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_job_path, job_path)
+    except Exception as e:
+        result_dispatcher.discard(job_id)
+        _release_file(target_file_path)
+        return {"error": f"Error escribiendo trabajo en DMZ: {str(e)}"}
         
-    # 3. Esperar resultado (Polling)
-    # Timeout de 60 segundos por defecto (Gemini puede tardar)
+    # 4. Esperar resultado (push desde el despachador)
+    # Timeout de 120 segundos por defecto (Gemini puede tardar)
     timeout = 120 
-    start_time = time.time()
-    
-    result_path = os.path.join(PROCESSED_DIR, result_filename)
     
-    while time.time() - start_time < timeout:
-        if os.path.exists(result_path):
-            # Leer resultado
-            try:
-                # Pequeña espera para asegurar escritura completa
-                await asyncio.sleep(0.1) 
-                with open(result_path, "r", encoding="utf-8") as f:
-                    result = json.load(f)
-                
-                # Limpieza opcional (el watcher ya mueve el job, pero el result queda)
-                # Podríamos borrar el result y el archivo de files para ahorrar espacio
-                try:
-                    os.remove(result_path)
-                    # os.remove(target_file_path) # Dejar archivo por si acaso se necesita depurar
-                except:
-                    pass
-                    
-                return result
-            except Exception as e:
-                return {"error": f"Error leyendo resultado de DMZ: {str(e)}"}
-        
-        await asyncio.sleep(0.5)
-        
-    return {"error": "Timeout esperando respuesta de DMZ Gemini Service"}
+    try:
+        result = await asyncio.wait_for(result_future, timeout=timeout)
+        # Resultado consumido: el archivo en files/ ya no se necesita
+        _release_file(target_file_path)
+        return result
+    except asyncio.TimeoutError:
+        return {"error": "Timeout esperando respuesta de DMZ Gemini Service"}
+    finally:
+        result_dispatcher.discard(job_id)
 
 # Funciones públicas que imitan la interfaz original
 
@@ -107,6 +193,12 @@ async def validate_ocr_requirements(file_path: str, oc_number: str) -> dict:
     """
     return await _submit_and_wait("validate_ocr_requirements", file_path=file_path, oc_number=oc_number)
 
+async def analyze_and_validate(file_path: str) -> dict:
+    """
+    Proxy para analyze_and_validate en DMZ: O/C, clasificación y validación de requisitos en una sola llamada.
+    """
+    return await _submit_and_wait("analyze_and_validate", file_path=file_path)
+
 async def analyze_document_content(file_content: bytes, mime_type: str, prompt: str = None) -> dict:
     """
     Proxy para analyze_document_content en DMZ.
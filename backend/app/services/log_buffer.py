@@ -0,0 +1,161 @@
+import os
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import insert, update, bindparam
+from app.database import AsyncSessionLocal
+from app.models import DSeguimiento, DEjecucionEstado
+
+logger = logging.getLogger(__name__)
+
+# Se escribe un lote cuando se juntan LOG_FLUSH_BATCH eventos o pasan LOG_FLUSH_SECONDS desde el primero
+LOG_FLUSH_BATCH = int(os.getenv("LOG_FLUSH_BATCH", "500"))
+LOG_FLUSH_SECONDS = float(os.getenv("LOG_FLUSH_SECONDS", "2.0"))
+# Tope en memoria si la base no responde: se descartan los más antiguos
+LOG_BUFFER_MAX = int(os.getenv("LOG_BUFFER_MAX", "50000"))
+
+
+# UPDATE ejecutado con executemany: una fila por ejecución presente en el lote
+LAST_MESSAGE_UPDATE = (
+    update(DEjecucionEstado.__table__)
+    .where(DEjecucionEstado.__table__.c.iMEjecucion == bindparam("b_id"))
+    .values(tUltimoMensaje=bindparam("b_message"), fActualizacion=bindparam("b_now"))
+)
+
+
+def parse_event_date(value) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return datetime.now()
+
+
+class LogBuffer:
+    """
+    Persiste en DSEGUIMIENTO los eventos de log del bot (log:bot / sap:bot / sunat:bot).
+    El handler de Socket.IO solo agrega a memoria; una tarea de fondo escribe por lotes
+    (un INSERT por lote con executemany) y actualiza el último mensaje en DEJECUCION_ESTADO.
+    """
+
+    def __init__(self, batch_size: int = LOG_FLUSH_BATCH, interval: float = LOG_FLUSH_SECONDS,
+                 max_buffer: int = LOG_BUFFER_MAX):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.flushed = 0
+        self.dropped = 0
+        self._rows: list[dict] = []
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+
+    def add(self, data) -> bool:
+        """Encola un evento. Los que no traen execution_id no se pueden asociar y se ignoran."""
+        if not isinstance(data, dict) or not data.get("execution_id") or not data.get("message"):
+            return False
+        try:
+            execution_id = int(data["execution_id"])
+        except (TypeError, ValueError):
+            return False
+
+        self._rows.append({
+            "iMEjecucion": execution_id,
+            "fRegistro": parse_event_date(data.get("date")),
+            "tDescripcion": str(data["message"])[:250],
+        })
+        self._trim()
+
+        self._ensure_task()
+        if len(self._rows) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def _trim(self):
+        """Aplica el tope de memoria descartando los eventos más antiguos."""
+        overflow = len(self._rows) - self.max_buffer
+        if overflow > 0:
+            del self._rows[:overflow]
+            self.dropped += overflow
+
+    def _ensure_task(self):
+        if self._closing:
+            # Apagando: close() escribe lo que quede
+            return
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            pending = len(self._rows)
+            await self.flush()
+            if not self._rows:
+                # Sin actividad: la tarea termina y se vuelve a crear con el próximo evento
+                return
+            if self._closing and len(self._rows) >= pending:
+                # Apagando y la base no responde: no se sigue reintentando
+                return
+
+    async def flush(self):
+        if not self._rows:
+            return
+        rows, self._rows = self._rows[:self.batch_size], self._rows[self.batch_size:]
+
+        # Último mensaje de cada ejecución del lote
+        last_messages = {}
+        for row in rows:
+            last_messages[row["iMEjecucion"]] = row["tDescripcion"]
+
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(DSeguimiento), rows)
+                now = datetime.utcnow()
+                await db.execute(LAST_MESSAGE_UPDATE, [
+                    {"b_id": execution_id, "b_message": message, "b_now": now}
+                    for execution_id, message in last_messages.items()
+                ])
+                await db.commit()
+            self.flushed += len(rows)
+        except asyncio.CancelledError:
+            # El lote ya salió de la cola: se devuelve antes de propagar la cancelación
+            self._requeue(rows)
+            raise
+        except Exception as e:
+            logger.error(f"Error guardando {len(rows)} logs en DSEGUIMIENTO: {e}")
+            # Se reintentan en el próximo ciclo (respetando el tope de memoria)
+            self._requeue(rows)
+            if not self._closing:
+                await asyncio.sleep(self.interval)
+
+    def _requeue(self, rows: list[dict]):
+        self._rows = rows + self._rows
+        self._trim()
+
+    async def close(self):
+        """Vacía todo lo pendiente (al apagar el servidor)."""
+        self._closing = True
+        if self._task and not self._task.done():
+            # La tarea de fondo termina sola al vaciar la cola (o si la base deja de avanzar)
+            self._wake.set()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while self._rows:
+            pending = len(self._rows)
+            await self.flush()
+            if len(self._rows) >= pending:
+                break
+        if self._rows:
+            logger.error(f"Se descartan {len(self._rows)} logs pendientes al apagar")
+            self.dropped += len(self._rows)
+            self._rows = []
+
+
+log_buffer = LogBuffer()
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from app.database import SessionLocal
+from app.models import MSociedad, MSap, MSapSociedad
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SERVICE_DIR = os.path.join(BASE_DIR, "sunat-sap-service")
+PARAMETERS_FILE = os.path.join(SERVICE_DIR, "parameters.json")
+
+# Ventana de agrupación: se escribe cuando pasan N segundos sin cambios nuevos,
+# y como máximo cada PARAMETERS_MAX_DELAY segundos si los cambios no paran.
+PARAMETERS_DEBOUNCE_SECONDS = float(os.getenv("PARAMETERS_DEBOUNCE_SECONDS", "1.0"))
+PARAMETERS_MAX_DELAY_SECONDS = float(os.getenv("PARAMETERS_MAX_DELAY_SECONDS", "10.0"))
+
+
+def build_parameters(db) -> list[dict]:
+    results = db.query(MSociedad, MSap).\
+        outerjoin(MSapSociedad, MSociedad.tRuc == MSapSociedad.tRuc).\
+        outerjoin(MSap, MSapSociedad.iMSAP == MSap.iMSAP).\
+        all()
+    return [
+        {
+            "code_sociedad": sociedad.tCodigoSap,
+            "ruc_sunat": sociedad.tRuc,
+            "razon_social": sociedad.tRazonSocial,
+            "user_sunat": sociedad.tUsuario,
+            "password_sunat": sociedad.tClave,
+            "active": sociedad.lActivo,
+            "sap_user": sap.tUsuario if sap else None,
+            "sap_password": sap.tClave if sap else None
+        }
+        for sociedad, sap in results
+    ]
+
+
+class ParametersWriter:
+    """
+    Regenera parameters.json en un hilo de fondo.
+    Los endpoints solo llaman a request(); los cambios seguidos se agrupan en una sola escritura,
+    que es atómica (temporal + rename) y se omite si el contenido no cambió.
+    """
+
+    def __init__(self, path: str = PARAMETERS_FILE, debounce: float = PARAMETERS_DEBOUNCE_SECONDS,
+                 max_delay: float = PARAMETERS_MAX_DELAY_SECONDS):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.writes = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        # Serializa flush() del hilo de fondo con un flush() explícito (p. ej. al apagar)
+        self._write_lock = threading.Lock()
+        self._first_request = None
+        self._last_request = None
+        self._last_hash = None
+        self._thread = None
+
+    def request(self):
+        """Marca parameters.json como desactualizado. No bloquea."""
+        with self._lock:
+            now = time.monotonic()
+            if self._first_request is None:
+                self._first_request = now
+            self._last_request = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="parameters-writer", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    @property
+    def pending(self) -> bool:
+        with self._lock:
+            return self._last_request is not None
+
+    def _due_in(self) -> float | None:
+        """Segundos que faltan para escribir (0 = ya), o None si no hay cambios pendientes."""
+        with self._lock:
+            if self._last_request is None:
+                return None
+            now = time.monotonic()
+            quiet = self._last_request + self.debounce - now
+            capped = self._first_request + self.max_delay - now
+            return max(0.0, min(quiet, capped))
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while (delay := self._due_in()) is not None:
+                if delay > 0:
+                    # Un request() nuevo despierta el hilo y se recalcula la espera
+                    self._wake.wait(delay)
+                    self._wake.clear()
+                    continue
+                with self._lock:
+                    self._first_request = None
+                    self._last_request = None
+                self.flush()
+
+    def flush(self):
+        """Escribe parameters.json ahora mismo (si cambió)."""
+        if not os.path.isdir(os.path.dirname(self.path)):
+            return
+        with self._write_lock:
+            self._write()
+
+    def _write(self):
+        db = SessionLocal()
+        try:
+            data = build_parameters(db)
+        except Exception as e:
+            print(f"Error guardando parámetros: {e}")
+            return
+        finally:
+            db.close()
+
+        content = json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        if self._last_hash is None and os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                self._last_hash = hashlib.sha256(f.read()).hexdigest()
+        if digest == self._last_hash:
+            self.skipped += 1
+            return
+
+        try:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+            self._last_hash = digest
+            self.writes += 1
+            print(f"Parámetros actualizados guardados en {self.path}")
+        except Exception as e:
+            print(f"Error guardando parámetros: {e}")
+
+
+parameters_writer = ParametersWriter()
@@ -0,0 +1,225 @@
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import unicodedata
+import importlib.util
+from datetime import datetime
+import pandas as pd
+from sqlalchemy import select, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import MListaBlanca
+
+# Filas por lote de INSERT ... ON CONFLICT (cada lote se ejecuta y se cronometra por separado)
+UPSERT_CHUNK_SIZE = int(os.getenv("PROVEEDORES_UPSERT_CHUNK", "2000"))
+
+ON_CONFLICT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Filas por bloque al leer el Excel en streaming (cada bloque se normaliza y se confirma por separado)
+EXCEL_CHUNK_ROWS = int(os.getenv("PROVEEDORES_EXCEL_CHUNK", "5000"))
+UPLOAD_SPOOL_BYTES = 1024 * 1024
+
+# Motor de lectura de Excel: auto usa calamine (python-calamine) si está instalado, si no el de pandas
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE", "auto").lower()
+
+
+def excel_engine():
+    if EXCEL_ENGINE == "auto":
+        return "calamine" if importlib.util.find_spec("python_calamine") else None
+    return None if EXCEL_ENGINE == "default" else EXCEL_ENGINE
+
+
+def normalize_header(value) -> str:
+    return ''.join(c for c in unicodedata.normalize('NFD', str(value)) if unicodedata.category(c) != 'Mn').upper().strip()
+
+
+def is_ruc_column(name) -> bool:
+    return "RUC" in normalize_header(name)
+
+
+def is_razon_column(name) -> bool:
+    header = normalize_header(name)
+    return "RAZON" in header or "SOCIAL" in header or "NOMBRE" in header
+
+
+def find_columns(columns):
+    """Primera columna de RUC y primera de razón social (None si falta alguna)."""
+    col_ruc = next((col for col in columns if is_ruc_column(col)), None)
+    col_razon = next((col for col in columns if is_razon_column(col)), None)
+    return col_ruc, col_razon
+
+
+async def spool_upload(file) -> str:
+    """
+    Copia el UploadFile a un archivo temporal en bloques de 1 MB, sin cargarlo entero en memoria.
+    El llamador debe borrar el archivo.
+    """
+    suffix = os.path.splitext(file.filename or "")[1] or ".xlsx"
+    fd, path = tempfile.mkstemp(prefix="proveedores_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_SPOOL_BYTES):
+                await asyncio.to_thread(out.write, chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def _iter_sheet_rows(path):
+    """Filas (tuplas de valores) de la primera hoja, leídas de forma incremental."""
+    if excel_engine() == "calamine":
+        from python_calamine import CalamineWorkbook
+        yield from CalamineWorkbook.from_path(path).get_sheet_by_index(0).iter_rows()
+    elif path.lower().endswith(".xlsx"):
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        # .xls (xlrd) no permite lectura incremental: se lee completo, igual por bloques
+        df = pd.read_excel(path, header=None, dtype=str)
+        yield from df.itertuples(index=False, name=None)
+
+
+def iter_excel_chunks(path, chunk_rows: int = EXCEL_CHUNK_ROWS):
+    """
+    Lee el Excel por bloques de `chunk_rows` filas y devuelve DataFrames solo con las columnas
+    de RUC / razón social. El primer bloque siempre se entrega (aunque esté vacío) para poder
+    validar las columnas. El índice de cada bloque continúa la numeración de filas del archivo.
+    Pensado para consumirse con asyncio.to_thread(next, chunks, None).
+    """
+    rows = _iter_sheet_rows(path)
+    header = next(rows, ())
+    wanted = [i for i, col in enumerate(header) if col is not None and (is_ruc_column(col) or is_razon_column(col))]
+    columns = [str(header[i]).strip() for i in wanted]
+
+    offset = 0
+    buffer = []
+    for row in rows:
+        buffer.append([row[i] if i < len(row) else None for i in wanted])
+        if len(buffer) >= chunk_rows:
+            yield pd.DataFrame(buffer, columns=columns, index=range(offset, offset + len(buffer)))
+            offset += len(buffer)
+            buffer = []
+    if buffer or offset == 0:
+        yield pd.DataFrame(buffer, columns=columns, index=range(offset, offset + len(buffer)))
+
+
+def normalize_proveedores(df: pd.DataFrame, col_ruc, col_razon, digits_only: bool = False) -> pd.DataFrame:
+    """
+    Normaliza en bloque (operaciones de columna): RUC recortado y sin sufijo '.0',
+    razón social recortada. Devuelve columnas ruc, razonSocial y valido (exactamente 11 dígitos),
+    conservando el índice original de cada fila.
+    Con `digits_only` además se quitan del RUC los caracteres que no son dígitos (vista previa);
+    la carga no lo hace: un RUC con guiones, espacios u otros caracteres se rechaza.
+    """
+    ruc = (
+        df[col_ruc].fillna('').astype(str).str.strip()
+        .str.replace(r'\.0$', '', regex=True)
+    )
+    if digits_only:
+        ruc = ruc.str.replace(r'\D', '', regex=True)
+    razon = df[col_razon].fillna('').astype(str).str.strip()
+    result = pd.DataFrame({"ruc": ruc, "razonSocial": razon})
+    result = result[result["ruc"] != '']
+    result["valido"] = result["ruc"].str.fullmatch(r'\d{11}')
+    return result
+
+
+def to_upsert_rows(normalized: pd.DataFrame) -> list[dict]:
+    """Filas válidas para upsert_proveedores, sin RUC repetidos (gana la última aparición)."""
+    valid = normalized[normalized["valido"]].drop_duplicates(subset="ruc", keep="last")
+    return [
+        {"tRucListaBlanca": ruc, "tRazonSocial": razon, "lActivo": True}
+        for ruc, razon in zip(valid["ruc"].tolist(), valid["razonSocial"].tolist())
+    ]
+
+
+async def fetch_existing_rucs(db: AsyncSession) -> set[str]:
+    """Una sola consulta con todos los RUC de la lista blanca (solo la columna clave)."""
+    result = await db.execute(select(MListaBlanca.tRucListaBlanca))
+    return set(result.scalars().all())
+
+
+async def upsert_proveedores(db: AsyncSession, rows: list[dict], update_columns: tuple[str, ...],
+                             user_id: int = 1, existing: set[str] | None = None,
+                             seen: set[str] | None = None,
+                             chunk_size: int = UPSERT_CHUNK_SIZE) -> dict:
+    """
+    Inserta o actualiza proveedores de la lista blanca por lotes.
+    `rows` son dicts con tRucListaBlanca, tRazonSocial y lActivo; si un RUC se repite gana la última fila.
+    `update_columns` indica qué columnas se sobrescriben cuando el RUC ya existe.
+    `seen` (opcional) son los RUC ya escritos por bloques anteriores de la misma carga: se vuelven a
+    escribir (gana la última fila) pero se cuentan como repetidos, no como creados ni actualizados.
+    No hace commit: el llamador decide cuándo confirmar.
+    """
+    started = time.perf_counter()
+    unique = {row["tRucListaBlanca"]: row for row in rows}
+    if existing is None:
+        existing = await fetch_existing_rucs(db)
+
+    now = datetime.now()
+    values = [
+        {
+            "tRucListaBlanca": ruc,
+            "tRazonSocial": row["tRazonSocial"],
+            "lActivo": row.get("lActivo", True),
+            "fRegistro": now,
+            "iUsuarioRegistro": user_id,
+            "fModificacion": now if ruc in existing else None,
+            "iUsuarioModificacion": user_id if ruc in existing else None,
+        }
+        for ruc, row in unique.items()
+    ]
+    seen = seen if seen is not None else set()
+    repeated = sum(1 for ruc in unique if ruc in seen)
+    updated = sum(1 for ruc in unique if ruc in existing and ruc not in seen)
+    created = len(values) - updated - repeated
+
+    make_insert = ON_CONFLICT_INSERTS.get(db.bind.dialect.name)
+    chunks = []
+    for offset in range(0, len(values), chunk_size):
+        chunk = values[offset:offset + chunk_size]
+        chunk_started = time.perf_counter()
+        if make_insert:
+            # Una sola sentencia compilada ejecutada con executemany sobre el lote
+            stmt = make_insert(MListaBlanca)
+            # La auditoría de modificación se fija aquí y no desde `excluded`: un RUC que no estaba en el
+            # prefetch (p. ej. insertado en paralelo) trae None en esas columnas y las dejaría en NULL
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[MListaBlanca.tRucListaBlanca],
+                set_={
+                    **{col: stmt.excluded[col] for col in update_columns},
+                    "fModificacion": now,
+                    "iUsuarioModificacion": user_id,
+                }
+            )
+            await db.execute(stmt, chunk)
+        else:
+            # Motores sin ON CONFLICT: insert masivo de los nuevos y update masivo por clave de los existentes
+            new_rows = [v for v in chunk if v["tRucListaBlanca"] not in existing]
+            old_rows = [
+                {"tRucListaBlanca": v["tRucListaBlanca"], "fModificacion": now, "iUsuarioModificacion": user_id,
+                 **{col: v[col] for col in update_columns}}
+                for v in chunk if v["tRucListaBlanca"] in existing
+            ]
+            if new_rows:
+                await db.execute(insert(MListaBlanca), new_rows)
+            if old_rows:
+                await db.execute(update(MListaBlanca), old_rows)
+        chunks.append({"rows": len(chunk), "ms": round((time.perf_counter() - chunk_started) * 1000, 2)})
+
+    existing.update(unique)
+    seen.update(unique)
+    return {
+        "created": created,
+        "updated": updated,
+        "repeated": repeated,
+        "chunks": chunks,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
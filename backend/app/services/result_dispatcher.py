@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import asyncio
+from app.services.dir_watcher import DirWatcher
+
+RESULT_SUFFIX = ".result.json"
+# Resultados sin trabajo esperando (llegaron después del timeout, o de una ejecución anterior del backend):
+# se borran al verlos si el trabajo fue abandonado por este proceso, o cuando superan esta antigüedad.
+ORPHAN_RESULT_MAX_AGE_SECONDS = 600
+# Cuántos trabajos abandonados (timeout) se recuerdan para borrar su resultado tardío
+ABANDONED_MAX = 1000
+
+
+class ResultDispatcher:
+    """
+    Canal de resultados compartido para los trabajos enviados a la DMZ.
+    Un único bucle vigila la carpeta de resultados (inotify o un solo escaneo periódico)
+    y resuelve el futuro de cada trabajo pendiente, en lugar de que cada petición
+    haga polling de su propio archivo.
+    """
+
+    def __init__(self, results_dir: str, poll_interval: float = 0.5):
+        self.results_dir = results_dir
+        self.poll_interval = poll_interval
+        self._futures: dict[str, asyncio.Future] = {}
+        self._abandoned: dict[str, None] = {}
+        self._task: asyncio.Task | None = None
+
+    def register(self, job_id: str) -> asyncio.Future:
+        """
+        Registra un trabajo y devuelve el futuro que recibirá su resultado.
+        Debe llamarse ANTES de escribir el trabajo en pendientes.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[job_id] = future
+
+        # El bucle solo corre mientras hay trabajos esperando
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        return future
+
+    def discard(self, job_id: str):
+        future = self._futures.pop(job_id, None)
+        if future is None:
+            return
+        if not future.done():
+            future.cancel()
+        # El resultado todavía no llegó: si llega tarde nadie lo va a consumir
+        self._abandoned[job_id] = None
+        if len(self._abandoned) > ABANDONED_MAX:
+            del self._abandoned[next(iter(self._abandoned))]
+
+    def pending(self) -> int:
+        return len(self._futures)
+
+    def is_pending(self, job_id: str) -> bool:
+        return job_id in self._futures
+
+    async def _run(self):
+        watcher = DirWatcher(self.results_dir, suffix=RESULT_SUFFIX, poll_interval=self.poll_interval, rescan_interval=5)
+        try:
+            names = [None]
+            while self._futures:
+                if watcher.mode == "inotify" and names and None not in names:
+                    # inotify ya nos dice qué resultados llegaron
+                    self._resolve(name for name in names if name)
+                else:
+                    # Polling, timeout de seguridad o desbordamiento de eventos: un solo listdir para todos
+                    self._resolve((name for name in os.listdir(self.results_dir) if name.endswith(RESULT_SUFFIX)))
+
+                if not self._futures:
+                    break
+                names = await watcher.wait_async()
+        finally:
+            watcher.close()
+
+    def _resolve(self, result_filenames):
+        orphan_cutoff = time.time() - ORPHAN_RESULT_MAX_AGE_SECONDS
+        for result_filename in result_filenames:
+            job_id = result_filename[:-len(RESULT_SUFFIX)]
+            result_path = os.path.join(self.results_dir, result_filename)
+            future = self._futures.pop(job_id, None)
+            if future is None:
+                self._remove_orphan(job_id, result_path, orphan_cutoff)
+                continue
+
+            try:
+                with open(result_path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+            except Exception as e:
+                result = {"error": f"Error leyendo resultado de DMZ: {str(e)}"}
+
+            # Limpieza: el resultado ya fue consumido
+            try:
+                os.remove(result_path)
+            except OSError:
+                pass
+
+            if not future.done():
+                future.set_result(result)
+
+    def _remove_orphan(self, job_id: str, result_path: str, cutoff: float):
+        try:
+            if job_id in self._abandoned:
+                self._abandoned.pop(job_id, None)
+            elif os.path.getmtime(result_path) >= cutoff:
+                # Puede ser de un trabajo que otro proceso del backend todavía espera
+                return
+            os.remove(result_path)
+        except OSError:
+            pass
@@ -1,6 +1,7 @@
 import socketio
 from typing import Any
 from enum import Enum
+from app.services.log_buffer import log_buffer
 
 
 sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
@@ -9,6 +10,7 @@ class EmitEvent(str, Enum):
     SAP = 'sap:bot'
     SUNAT = 'sunat:bot'
     LOG = 'log:bot'
+    STATUS = 'status:bot'
 
 @sio.event
 async def connect(sid, environ):
@@ -25,14 +27,26 @@ async def handle_log(sid, data: Any):
          print(f"[BOT LOG] {data['message']}")
     else:
          print(f"[BOT LOG] {data}")
+    # Historial en DSEGUIMIENTO: solo se encola, la escritura es por lotes
+    log_buffer.add(data)
     await sio.emit(EmitEvent.LOG, data, skip_sid=sid)
 
+@sio.on(EmitEvent.STATUS)
+async def handle_status(sid, data: Any):
+    # Estado/progreso de una ejecución: se materializa en DEJECUCION_ESTADO y se reenvía al frontend
+    from app.services.ejecucion_estado import apply_status_event
+    if isinstance(data, dict):
+         print(f"[BOT STATUS] #{data.get('execution_id')} {data.get('estado')} {data.get('progreso')}% {data.get('paso')}")
+    await apply_status_event(data)
+    await sio.emit(EmitEvent.STATUS, data, skip_sid=sid)
+
 @sio.on(EmitEvent.SAP)
 async def handle_sap(sid, data: Any):
     if isinstance(data, dict) and 'message' in data:
          print(f"[BOT SAP] {data['message']}")
     else:
          print(f"[BOT SAP] {data}")
+    log_buffer.add(data)
     await sio.emit(EmitEvent.SAP, data, skip_sid=sid)
     # Also emit to log:bot so frontend can see it
     await sio.emit(EmitEvent.LOG, data, skip_sid=sid)
@@ -43,6 +57,7 @@ async def handle_sunat(sid, data: Any):
          print(f"[BOT SUNAT] {data['message']}")
     else:
          print(f"[BOT SUNAT] {data}")
+    log_buffer.add(data)
     await sio.emit(EmitEvent.SUNAT, data, skip_sid=sid)
     # Also emit to log:bot so frontend can see it
     await sio.emit(EmitEvent.LOG, data, skip_sid=sid)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del backend se importan como `app.*` (igual que con uvicorn desde backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
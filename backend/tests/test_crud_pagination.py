@@ -0,0 +1,50 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, get_db
+from app.models import MUsuario, MSociedad
+from app.api import crud
+
+
+@pytest.fixture
+def client(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[MUsuario.__table__, MSociedad.__table__])
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    for i in range(150):
+        db.add(MUsuario(tNombre=f"N{i}", tApellidos="A", tCorreo=f"u{i:03d}@x.pe", tClave="x", lActivo=True))
+        db.add(MSociedad(tRuc=f"20{i:09d}", tRazonSocial=f"S{i}", lActivo=True))
+    db.commit()
+    db.close()
+
+    def override_get_db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(crud.router, prefix="/api/crud")
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    engine.dispose()
+
+
+def test_usuarios_skip_pages_in_key_order(client):
+    response = client.get("/api/crud/usuarios", params={"skip": 100})
+
+    assert response.status_code == 200
+    assert [u["tCorreo"] for u in response.json()] == [f"u{i:03d}@x.pe" for i in range(100, 150)]
+
+
+def test_sociedades_skip_pages_in_key_order(client):
+    response = client.get("/api/crud/sociedades", params={"skip": 100, "limit": 20})
+
+    assert response.status_code == 200
+    assert [s["tRuc"] for s in response.json()] == [f"20{i:09d}" for i in range(100, 120)]
+    assert response.headers["X-Next-Cursor"] == f"20{119:09d}"
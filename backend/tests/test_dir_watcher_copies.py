@@ -0,0 +1,16 @@
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COPIES = (
+    "backend/app/services/dir_watcher.py",
+    "dmz/gemini-service/src/utils/dir_watcher.py",
+    "dmz/sunat-sap-service/src/utils/dir_watcher.py",
+)
+
+
+def test_vendored_dir_watcher_copies_are_identical():
+    contents = {}
+    for path in COPIES:
+        with open(os.path.join(ROOT_DIR, path), encoding="utf-8") as f:
+            contents[path] = f.read()
+    assert len(set(contents.values())) == 1, "Las copias de dir_watcher.py difieren: aplicar el cambio en las tres"
@@ -0,0 +1,61 @@
+import os
+import time
+import pytest
+from app.services import gemini_ocr
+
+
+@pytest.fixture
+def files_dir(tmp_path, monkeypatch):
+    files = tmp_path / "files"
+    files.mkdir()
+    monkeypatch.setattr(gemini_ocr, "FILES_DIR", str(files))
+    monkeypatch.setattr(gemini_ocr, "_handoff_times", {})
+    return files
+
+
+def test_hardlinked_file_with_old_mtime_is_not_stale(tmp_path, files_dir):
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    old = time.time() - (gemini_ocr.OCR_FILES_MAX_AGE_HOURS + 48) * 3600
+    os.utime(source, (old, old))
+
+    target = files_dir / "job-1.pdf"
+    gemini_ocr._handoff_file(str(source), str(target))
+    gemini_ocr._handoff_times[target.name] = time.time()
+    assert os.stat(target).st_mtime < time.time() - gemini_ocr.OCR_FILES_MAX_AGE_HOURS * 3600
+
+    gemini_ocr._gc_stale_files(force=True)
+
+    assert target.exists()
+    assert source.exists()
+
+
+def test_unregistered_hardlink_uses_ctime(tmp_path, files_dir):
+    # Archivo entregado por una ejecución anterior del backend (sin registro en memoria)
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    old = time.time() - (gemini_ocr.OCR_FILES_MAX_AGE_HOURS + 48) * 3600
+    os.utime(source, (old, old))
+
+    target = files_dir / "job-2.pdf"
+    os.link(source, target)
+
+    gemini_ocr._gc_stale_files(force=True)
+
+    assert target.exists()
+
+
+def test_pending_job_is_kept_and_expired_file_removed(files_dir, monkeypatch):
+    expired = time.time() - (gemini_ocr.OCR_FILES_MAX_AGE_HOURS + 1) * 3600
+    pending = files_dir / "job-pending.pdf"
+    orphan = files_dir / "job-orphan.pdf"
+    for path in (pending, orphan):
+        path.write_bytes(b"%PDF-1.4")
+        gemini_ocr._handoff_times[path.name] = expired
+    monkeypatch.setattr(gemini_ocr.result_dispatcher, "_futures", {"job-pending": object()})
+
+    gemini_ocr._gc_stale_files(force=True)
+
+    assert pending.exists()
+    assert not orphan.exists()
+    assert orphan.name not in gemini_ocr._handoff_times
@@ -0,0 +1,109 @@
+import asyncio
+from app.services import log_buffer as log_buffer_module
+from app.services.log_buffer import LogBuffer
+
+
+class FakeSession:
+    """Sesión async mínima: registra los lotes insertados o falla según `mode`."""
+
+    def __init__(self, store: dict):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, params=None):
+        if self.store["mode"] == "hang":
+            await asyncio.Event().wait()
+        if self.store["mode"] == "fail":
+            if self.store.get("on_fail"):
+                self.store["on_fail"]()
+            raise RuntimeError("base no disponible")
+        if statement is not log_buffer_module.LAST_MESSAGE_UPDATE:
+            self.store["inserted"].extend(params)
+
+    async def commit(self):
+        pass
+
+
+def fake_session(monkeypatch, mode="ok"):
+    store = {"mode": mode, "inserted": []}
+    monkeypatch.setattr(log_buffer_module, "AsyncSessionLocal", lambda: FakeSession(store))
+    return store
+
+
+def event(execution_id, message):
+    return {"execution_id": execution_id, "message": message, "date": "2026-01-01 10:00:00"}
+
+
+def test_flush_cancelled_mid_write_requeues_batch(monkeypatch):
+    store = fake_session(monkeypatch, mode="hang")
+
+    async def scenario():
+        buffer = LogBuffer(batch_size=10, interval=60)
+        for i in range(3):
+            buffer.add(event(1, f"m{i}"))
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+        flush.cancel()
+        try:
+            await flush
+        except asyncio.CancelledError:
+            pass
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert [row["tDescripcion"] for row in buffer._rows] == ["m0", "m1", "m2"]
+    assert store["inserted"] == []
+
+
+def test_close_waits_for_background_task_and_drains(monkeypatch):
+    store = fake_session(monkeypatch)
+
+    async def scenario():
+        buffer = LogBuffer(batch_size=2, interval=60)
+        for i in range(5):
+            buffer.add(event(i + 1, f"m{i}"))
+        await buffer.close()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert [row["tDescripcion"] for row in store["inserted"]] == [f"m{i}" for i in range(5)]
+    assert buffer.flushed == 5
+    assert buffer._task.done()
+
+
+def test_failed_flush_counts_rows_trimmed_on_requeue(monkeypatch):
+    store = fake_session(monkeypatch, mode="fail")
+
+    async def scenario():
+        buffer = LogBuffer(batch_size=3, interval=0, max_buffer=4)
+        for i in range(4):
+            buffer.add(event(1, f"m{i}"))
+        # Llegan eventos nuevos mientras el lote está fuera de la cola
+        store["on_fail"] = lambda: [buffer.add(event(1, f"n{i}")) for i in range(2)]
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert [row["tDescripcion"] for row in buffer._rows] == ["m2", "m3", "n0", "n1"]
+    assert buffer.dropped == 2
+
+
+def test_close_counts_rows_it_cannot_write(monkeypatch):
+    fake_session(monkeypatch, mode="fail")
+
+    async def scenario():
+        buffer = LogBuffer(batch_size=10, interval=60)
+        for i in range(3):
+            buffer.add(event(1, f"m{i}"))
+        await buffer.close()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert buffer._rows == []
+    assert buffer.dropped == 3
+
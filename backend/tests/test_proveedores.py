@@ -0,0 +1,82 @@
+import asyncio
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.database import Base
+from app.models import MListaBlanca
+from app.services.proveedores import normalize_proveedores, to_upsert_rows, upsert_proveedores
+
+
+def test_upload_normalization_rejects_non_digit_rucs():
+    df = pd.DataFrame({
+        "RUC": ["20123456789", " 20123456790 ", "20123456791.0", "20-123456792", "2012345679A", "123", None],
+        "RAZON SOCIAL": ["A", "B", "C", "D", "E", "F", "G"],
+    })
+
+    normalized = normalize_proveedores(df, "RUC", "RAZON SOCIAL")
+
+    assert [r["tRucListaBlanca"] for r in to_upsert_rows(normalized)] == ["20123456789", "20123456790", "20123456791"]
+
+
+def test_preview_normalization_strips_non_digits():
+    df = pd.DataFrame({"RUC": ["20-123456792"], "RAZON SOCIAL": ["D"]})
+
+    normalized = normalize_proveedores(df, "RUC", "RAZON SOCIAL", digits_only=True)
+
+    assert normalized["ruc"].tolist() == ["20123456792"]
+    assert normalized["valido"].tolist() == [True]
+
+
+def test_ruc_repeated_in_later_chunk_is_not_counted_as_updated(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[MListaBlanca.__table__])
+        session = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with session() as db:
+            db.add(MListaBlanca(tRucListaBlanca="20000000001", tRazonSocial="Antigua", lActivo=True))
+            await db.commit()
+
+            existing, seen = {"20000000001"}, set()
+            row = lambda ruc, razon: {"tRucListaBlanca": ruc, "tRazonSocial": razon, "lActivo": True}
+            first = await upsert_proveedores(db, [row("20000000001", "A1"), row("20000000002", "B1")],
+                                             ("tRazonSocial",), existing=existing, seen=seen)
+            second = await upsert_proveedores(db, [row("20000000002", "B2"), row("20000000001", "A2"), row("20000000003", "C")],
+                                              ("tRazonSocial",), existing=existing, seen=seen)
+            await db.commit()
+            names = dict((await db.execute(select(MListaBlanca.tRucListaBlanca, MListaBlanca.tRazonSocial))).all())
+        await engine.dispose()
+        return first, second, names
+
+    first, second, names = asyncio.run(scenario())
+    assert (first["created"], first["updated"], first["repeated"]) == (1, 1, 0)
+    assert (second["created"], second["updated"], second["repeated"]) == (1, 0, 2)
+    assert names == {"20000000001": "A2", "20000000002": "B2", "20000000003": "C"}
+
+
+def test_conflict_on_ruc_missing_from_prefetch_sets_audit_columns(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[MListaBlanca.__table__])
+        session = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with session() as db:
+            # Insertado por otra carga después del prefetch
+            db.add(MListaBlanca(tRucListaBlanca="20000000009", tRazonSocial="Paralela", lActivo=True))
+            await db.commit()
+
+            row = {"tRucListaBlanca": "20000000009", "tRazonSocial": "Nueva", "lActivo": True}
+            await upsert_proveedores(db, [row], ("tRazonSocial",), user_id=7, existing=set())
+            await db.commit()
+            saved = (await db.execute(
+                select(MListaBlanca.tRazonSocial, MListaBlanca.fModificacion, MListaBlanca.iUsuarioModificacion)
+            )).one()
+        await engine.dispose()
+        return saved
+
+    razon, modified_at, modified_by = asyncio.run(scenario())
+    assert razon == "Nueva"
+    assert modified_at is not None
+    assert modified_by == 7
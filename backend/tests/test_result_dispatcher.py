@@ -0,0 +1,43 @@
+import os
+import json
+import time
+import asyncio
+from app.services.result_dispatcher import ResultDispatcher, ORPHAN_RESULT_MAX_AGE_SECONDS, RESULT_SUFFIX
+
+
+def write_result(results_dir, job_id, payload, age: float = 0):
+    path = results_dir / f"{job_id}{RESULT_SUFFIX}"
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    if age:
+        old = time.time() - age
+        os.utime(path, (old, old))
+    return path
+
+
+def test_late_result_of_abandoned_job_is_removed(tmp_path):
+    async def scenario():
+        dispatcher = ResultDispatcher(str(tmp_path), poll_interval=0.05)
+        dispatcher.register("job-late")
+        dispatcher.discard("job-late")  # timeout en _submit_and_wait
+
+        waiting = dispatcher.register("job-ok")
+        late = write_result(tmp_path, "job-late", {"ok": False})
+        write_result(tmp_path, "job-ok", {"ok": True})
+        result = await asyncio.wait_for(waiting, timeout=5)
+        return late, result
+
+    late, result = asyncio.run(scenario())
+    assert result == {"ok": True}
+    assert not late.exists()
+    assert os.listdir(tmp_path) == []
+
+
+def test_unknown_results_are_kept_until_they_expire(tmp_path):
+    dispatcher = ResultDispatcher(str(tmp_path))
+    recent = write_result(tmp_path, "other-process", {"ok": True})
+    stale = write_result(tmp_path, "previous-run", {"ok": True}, age=ORPHAN_RESULT_MAX_AGE_SECONDS + 60)
+
+    dispatcher._resolve([recent.name, stale.name])
+
+    assert recent.exists()
+    assert not stale.exists()
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app.scheduler import ScheduleQueue
+
+TODOS_LOS_DIAS = "Lunes,Martes,Miércoles,Jueves,Viernes,Sábado,Domingo"
+
+
+def test_pop_due_after_gap_fires_only_latest_slot():
+    start = datetime(2026, 3, 2, 8, 0)
+    queue = ScheduleQueue()
+    queue.load([SimpleNamespace(iMProgramacion=1, tHora="09:00", tDias=TODOS_LOS_DIAS)], start)
+
+    # El loop no corrió durante 9 días
+    now = start + timedelta(days=9, hours=2)
+    due = queue.pop_due(now)
+
+    assert due == [(1, datetime(2026, 3, 11, 9, 0))]
+    assert queue.pop_due(now) == []
+    assert queue.next_fire() == datetime(2026, 3, 12, 9, 0)
+
+
+def test_pop_due_on_time_returns_slot_and_schedules_next():
+    start = datetime(2026, 3, 2, 8, 0)
+    queue = ScheduleQueue()
+    queue.load([SimpleNamespace(iMProgramacion=7, tHora="09:00", tDias="Lunes,Miércoles")], start)
+
+    due = queue.pop_due(datetime(2026, 3, 2, 9, 0, 1))
+
+    assert due == [(7, datetime(2026, 3, 2, 9, 0))]
+    assert queue.next_fire() == datetime(2026, 3, 4, 9, 0)
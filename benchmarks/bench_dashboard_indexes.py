@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+# Benchmark de las consultas del dashboard antes y después de los índices secundarios.
+# Crea una base SQLite temporal sin los índices IX_*, la llena con N ejecuciones y N logs,
+# mide las consultas calientes, aplica ensure_indexes() (el mismo paso que corre al
+# arrancar el backend sobre un cosapi.db existente) y vuelve a medir.
+#
+# Uso:
+#   python benchmarks/bench_dashboard_indexes.py --rows 100000
+#   python benchmarks/bench_dashboard_indexes.py --rows 1000000 --repeat 50
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine, ensure_indexes
+from app.models import (DEjecucion, DSeguimiento, MProgramacion, MProgramacionSociedad,
+                        MSap, MSapSociedad, MSociedad, MUsuario)
+
+RUCS = [f"20{n:09d}" for n in range(200)]
+CHUNK = 50000
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def drop_secondary_indexes(engine):
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name.startswith("IX_"):
+                    conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{index.name}"')
+
+
+def seed(engine, rows):
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(MSociedad), [{"tRuc": ruc, "tCodigoSap": f"S{i:04d}", "tRazonSocial": ruc[-6:]} for i, ruc in enumerate(RUCS)])
+        conn.execute(insert(MSap), [{"iMSAP": 1, "tUsuario": "sap", "tClave": "x", "lActivo": True}])
+        conn.execute(insert(MSapSociedad), [{"iMSAP": 1, "tRuc": ruc, "lActivo": i % 3 == 0} for i, ruc in enumerate(RUCS * 5)])
+        conn.execute(insert(MUsuario), [{"tCorreo": f"usuario{n}@cosapi.com.pe", "tClave": "x"} for n in range(5000)])
+        conn.execute(insert(MProgramacion), [{"iMProgramacion": n, "tNombre": f"Prog {n}", "tHora": "08:00", "tDias": "Lun", "lActivo": n % 2 == 0} for n in range(1, 501)])
+        conn.execute(insert(MProgramacionSociedad), [{"iMProgramacion": random.randint(1, 500), "tRuc": random.choice(RUCS)} for _ in range(5000)])
+
+        for offset in range(0, rows, CHUNK):
+            size = min(CHUNK, rows - offset)
+            conn.execute(insert(DEjecucion), [
+                {"tTipo": "A", "tRuc": random.choice(RUCS), "iMSAP": 1, "fRegistro": start + timedelta(minutes=offset + n)}
+                for n in range(size)
+            ])
+            conn.execute(insert(DSeguimiento), [
+                {"iMEjecucion": random.randint(1, rows), "tDescripcion": "log", "fRegistro": start + timedelta(seconds=offset + n)}
+                for n in range(size)
+            ])
+
+
+def queries(db, rows):
+    ruc = random.choice(RUCS)
+    return {
+        "historial sociedad": lambda: db.query(DEjecucion).filter(DEjecucion.tRuc == ruc).order_by(DEjecucion.fRegistro.desc()).limit(10).all(),
+        "logs ejecución": lambda: db.query(DSeguimiento).filter(DSeguimiento.iMEjecucion == random.randint(1, rows)).order_by(DSeguimiento.fRegistro.asc()).all(),
+        "programaciones sociedad": lambda: db.query(MProgramacion).join(MProgramacionSociedad).filter(MProgramacionSociedad.tRuc == ruc, MProgramacion.lActivo == True).all(),
+        "cuenta SAP activa": lambda: db.query(MSapSociedad).filter(MSapSociedad.tRuc == ruc, MSapSociedad.lActivo == True).first(),
+        "login por correo": lambda: db.query(MUsuario).filter(MUsuario.tCorreo == f"usuario{random.randint(0, 4999)}@cosapi.com.pe").first(),
+    }
+
+
+def measure(Session, rows, repeat):
+    db = Session()
+    try:
+        results = {}
+        for name in queries(db, rows):
+            latencies = []
+            for _ in range(repeat):
+                query = queries(db, rows)[name]
+                start = time.perf_counter()
+                query()
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[name] = (statistics.median(latencies), percentile(latencies, 0.95))
+        return results
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de consultas del dashboard con y sin índices secundarios")
+    parser.add_argument("--rows", type=int, default=100000, help="Ejecuciones y logs a generar (cada uno)")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="bench_indexes_")
+    engine = create_db_engine(f"sqlite:///{os.path.join(db_dir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    drop_secondary_indexes(engine)
+
+    print(f"Generando {args.rows} ejecuciones y {args.rows} logs...")
+    seed(engine, args.rows)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    before = measure(Session, args.rows, args.repeat)
+    start = time.perf_counter()
+    created = ensure_indexes(engine)
+    print(f"ensure_indexes: {len(created)} índices en {time.perf_counter() - start:.1f}s")
+    after = measure(Session, args.rows, args.repeat)
+    engine.dispose()
+
+    print(f"{'consulta':<24} {'sin índices p50/p95 ms':>24} {'con índices p50/p95 ms':>24}")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<24} {b[0]:>11.2f} / {b[1]:<10.2f} {a[0]:>11.2f} / {a[1]:<10.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import argparse
+from datetime import datetime
+
+# Benchmark de carga de lista blanca: camino anterior (SELECT + ORM por fila) contra
+# upsert_proveedores (prefetch único + INSERT ... ON CONFLICT DO UPDATE por lotes).
+# Cada camino corre dos veces sobre una base SQLite temporal: carga inicial y recarga
+# con la mitad de RUCs ya existentes.
+#
+# Uso:
+#   python benchmarks/bench_proveedores_upsert.py --rows 20000
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.database import Base, create_db_engine, create_async_db_engine
+from app.models import MListaBlanca
+from app.services.proveedores import upsert_proveedores
+
+
+def make_rows(start, count, prefix):
+    return [{"tRucListaBlanca": f"20{n:09d}", "tRazonSocial": f"{prefix} {n}", "lActivo": True} for n in range(start, start + count)]
+
+
+async def per_row(db, rows):
+    for row in rows:
+        existing = await db.get(MListaBlanca, row["tRucListaBlanca"])
+        if existing:
+            existing.tRazonSocial = row["tRazonSocial"]
+            existing.fModificacion = datetime.now()
+            existing.iUsuarioModificacion = 1
+        else:
+            db.add(MListaBlanca(fRegistro=datetime.now(), iUsuarioRegistro=1, **row))
+    await db.commit()
+
+
+async def bulk(db, rows):
+    summary = await upsert_proveedores(db, rows, update_columns=("tRazonSocial",))
+    await db.commit()
+    return summary
+
+
+async def run(mode, args):
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_upsert_"), "bench.db")
+    Base.metadata.create_all(bind=create_db_engine(f"sqlite:///{path}"))
+    engine = create_async_db_engine(f"sqlite+aiosqlite:///{path}")
+    Session = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    timings = []
+    for rows in (make_rows(0, args.rows, "Inicial"), make_rows(args.rows // 2, args.rows, "Recarga")):
+        async with Session() as db:
+            start = time.perf_counter()
+            await (per_row if mode == "por fila" else bulk)(db, rows)
+            timings.append(time.perf_counter() - start)
+    await engine.dispose()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga de lista blanca: por fila vs upsert por lotes")
+    parser.add_argument("--rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'camino':<10} {'carga inicial s':>16} {'recarga 50% s':>15}")
+    for mode in ("por fila", "por lotes"):
+        first, second = asyncio.run(run(mode, args))
+        print(f"{mode:<10} {first:>16.2f} {second:>15.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+import threading
+import statistics
+from datetime import datetime
+
+# Benchmark de contención lectura/escritura en SQLite con los perfiles de app/database.py.
+# Varios hilos escriben ejecuciones (como execute_sociedad_logic) mientras otros leen
+# el historial de una sociedad (como el dashboard), durante N segundos por perfil.
+#
+# Uso:
+#   python benchmarks/bench_sqlite_contention.py --seconds 10 --writers 4 --readers 8
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, create_db_engine
+from app.models import DEjecucion, MSociedad
+
+RUCS = [f"20{n:09d}" for n in range(50)]
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def seed(Session, rows):
+    db = Session()
+    try:
+        db.add_all([MSociedad(tRuc=ruc, tRazonSocial=ruc[-6:]) for ruc in RUCS])
+        db.bulk_save_objects([
+            DEjecucion(tTipo="A", tRuc=random.choice(RUCS), fRegistro=datetime.utcnow()) for _ in range(rows)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def writer(Session, stop, latencies, errors):
+    while not stop.is_set():
+        db = Session()
+        start = time.perf_counter()
+        try:
+            db.add(DEjecucion(tTipo="A", tRuc=random.choice(RUCS), fRegistro=datetime.utcnow()))
+            db.commit()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            db.rollback()
+            errors.append(1)
+        finally:
+            db.close()
+
+
+def reader(Session, stop, latencies, errors):
+    while not stop.is_set():
+        db = Session()
+        start = time.perf_counter()
+        try:
+            db.query(DEjecucion).filter(DEjecucion.tRuc == random.choice(RUCS)).order_by(DEjecucion.fRegistro.desc()).limit(10).all()
+            db.query(DEjecucion).count()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception:
+            errors.append(1)
+        finally:
+            db.close()
+
+
+def run_profile(profile, args):
+    db_dir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    engine = create_db_engine(f"sqlite:///{os.path.join(db_dir, 'bench.db')}", profile=profile)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(Session, args.rows)
+
+    stop = threading.Event()
+    write_lat, read_lat, write_err, read_err = [], [], [], []
+    threads = [threading.Thread(target=writer, args=(Session, stop, write_lat, write_err)) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(Session, stop, read_lat, read_err)) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    return {
+        "writes/s": len(write_lat) / args.seconds,
+        "write p95 ms": percentile(write_lat, 0.95),
+        "write errors": len(write_err),
+        "reads/s": len(read_lat) / args.seconds,
+        "read p50 ms": statistics.median(read_lat) if read_lat else float("nan"),
+        "read p95 ms": percentile(read_lat, 0.95),
+        "read errors": len(read_err),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contención lectura/escritura en SQLite por perfil")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=20000, help="Ejecuciones precargadas")
+    args = parser.parse_args()
+
+    results = {profile: run_profile(profile, args) for profile in ("default", "production")}
+    print(f"{'métrica':<14} {'default':>12} {'production':>12}")
+    for metric in results["default"]:
+        print(f"{metric:<14} {results['default'][metric]:>12.1f} {results['production'][metric]:>12.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
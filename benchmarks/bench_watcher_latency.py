@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import threading
+import statistics
+import importlib.util
+
+# Benchmark de latencia de recogida de trabajos en los watchers DMZ.
+# Deja N archivos JSON en una carpeta 'pendientes' temporal (escritura atómica tmp + rename)
+# y mide el tiempo hasta que el bucle del watcher los detecta, en modo polling y en modo inotify.
+#
+# Uso:
+#   python benchmarks/bench_watcher_latency.py --jobs 20
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Servicio -> (ruta del módulo dir_watcher, intervalo de polling usado por su watcher)
+SERVICES = {
+    "sunat-sap-service": (os.path.join(ROOT_DIR, "dmz", "sunat-sap-service", "src", "utils", "dir_watcher.py"), 2),
+    "gemini-service": (os.path.join(ROOT_DIR, "dmz", "gemini-service", "src", "utils", "dir_watcher.py"), 1),
+}
+
+
+def load_dir_watcher(name, path):
+    spec = importlib.util.spec_from_file_location(f"dir_watcher_{name.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def consumer_loop(watcher, pending_dir, picked, expected, stop):
+    # Mismo esquema que el main() de los watchers: escanear, procesar, esperar
+    while not stop.is_set() and len(picked) < expected:
+        for filename in [f for f in os.listdir(pending_dir) if f.endswith(".json")]:
+            if filename not in picked:
+                picked[filename] = time.perf_counter()
+                os.remove(os.path.join(pending_dir, filename))
+        watcher.wait(timeout=0.5 if watcher.mode == "inotify" else None)
+
+
+def run_case(module, poll_interval, mode, jobs, max_gap):
+    pending_dir = tempfile.mkdtemp(prefix="bench_pendientes_")
+    watcher = module.DirWatcher(pending_dir, suffix=".json", poll_interval=poll_interval, mode=mode)
+    picked, dropped = {}, {}
+    stop = threading.Event()
+    consumer = threading.Thread(target=consumer_loop, args=(watcher, pending_dir, picked, jobs, stop), daemon=True)
+    consumer.start()
+    try:
+        for i in range(jobs):
+            time.sleep(random.uniform(0, max_gap))
+            filename = f"bench_{i}.json"
+            tmp_path = os.path.join(pending_dir, filename + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"job_id": i}, f)
+            dropped[filename] = time.perf_counter()
+            os.replace(tmp_path, os.path.join(pending_dir, filename))
+        consumer.join(timeout=poll_interval * 3 + 5)
+    finally:
+        stop.set()
+        watcher.close()
+        shutil.rmtree(pending_dir, ignore_errors=True)
+
+    latencies = [(picked[name] - dropped[name]) * 1000 for name in dropped if name in picked]
+    return watcher.mode, latencies, jobs - len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de recogida de trabajos de los watchers DMZ")
+    parser.add_argument("--jobs", type=int, default=20, help="Número de archivos de trabajo a dejar por caso")
+    parser.add_argument("--max-gap", type=float, default=0.5, help="Pausa aleatoria máxima (s) entre archivos")
+    args = parser.parse_args()
+
+    print(f"{'servicio':<20} {'modo':<8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'perdidos':>9}")
+    for name, (path, poll_interval) in SERVICES.items():
+        module = load_dir_watcher(name, path)
+        for mode in ("poll", "inotify"):
+            real_mode, latencies, missed = run_case(module, poll_interval, mode, args.jobs, args.max_gap)
+            if real_mode != mode:
+                print(f"{name:<20} {mode:<8} no disponible en esta plataforma")
+                continue
+            latencies.sort()
+            p50 = statistics.median(latencies) if latencies else float("nan")
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else float("nan")
+            worst = latencies[-1] if latencies else float("nan")
+            print(f"{name:<20} {mode:<8} {p50:>9.1f} {p95:>9.1f} {worst:>9.1f} {missed:>9}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
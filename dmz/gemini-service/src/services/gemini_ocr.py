@@ -2,11 +2,13 @@ import os
 import io
 import json
 import asyncio
+import unicodedata
 import httpx
 from pypdf import PdfReader, PdfWriter
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from src.services.rate_limiter import RateLimiter
 
 load_dotenv()
 
@@ -16,6 +18,9 @@ API_KEY = os.getenv("GOOGLE_API_KEY")
 # Modelo por defecto.
 MODEL_NAME = os.getenv("GEMINI_MODEL")
 
+# Versión de los prompts: incrementar al modificar cualquier prompt para invalidar la caché OCR
+PROMPT_VERSION = "2"
+
 # Cargar configuración desde consumer_config.json
 # Ruta ajustada para DMZ/gemini-service
 CONFIG_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "consumer_config.json")
@@ -44,6 +49,54 @@ API_LOG_EMPRESA = consumer_config.get("empresa", "Empresa S.A. de C.V.")
 API_LOG_IP = consumer_config.get("ip_publica", "127.0.0.1")
 API_LOG_KEY = consumer_config.get("api_key")
 
+# Límites de cuota para las llamadas al modelo (ajustar según el plan de la API Key)
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "5"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+
+# Gemini cuenta aproximadamente 258 tokens por página de PDF
+TOKENS_PER_PDF_PAGE = 258
+
+rate_limiter = RateLimiter(
+    requests_per_minute=GEMINI_RPM,
+    tokens_per_minute=GEMINI_TPM,
+    max_concurrency=GEMINI_MAX_CONCURRENCY,
+    max_retries=GEMINI_MAX_RETRIES
+)
+
+# Cliente Gemini compartido por todo el proceso
+_client = None
+
+def get_client() -> genai.Client:
+    """
+    Devuelve el cliente Gemini del proceso, creándolo en el primer uso.
+    Se reutiliza entre llamadas para aprovechar su pool de conexiones HTTP.
+    """
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=API_KEY)
+    return _client
+
+def estimate_tokens(pages: int, prompt: str) -> int:
+    return pages * TOKENS_PER_PDF_PAGE + len(prompt) // 4
+
+def _usage_tokens(response) -> int:
+    usage = response.usage_metadata
+    return (usage.total_token_count or 0) if usage else 0
+
+async def generate_content(estimated_tokens: int = 0, **kwargs):
+    """
+    Llama al modelo (client.aio) a través del limitador:
+    respeta solicitudes/min y tokens/min, y reintenta ante 429/5xx con backoff.
+    """
+    client = get_client()
+    return await rate_limiter.call(
+        lambda: client.aio.models.generate_content(**kwargs),
+        estimated_tokens=estimated_tokens,
+        usage_tokens=_usage_tokens
+    )
+
 def count_pdf_pages(file_content: bytes) -> int:
     try:
         reader = PdfReader(io.BytesIO(file_content))
@@ -258,8 +311,8 @@ async def validate_ocr_requirements(file_path: str, oc_number: str) -> dict:
         # Leer todo el PDF
         with open(file_path, "rb") as f:
             file_content = f.read()
-            
-        client = genai.Client(api_key=API_KEY)
+
+        total_pages = await asyncio.to_thread(count_pdf_pages, file_content)
         
         prompt = f"""
         Analiza este documento PDF completo.
@@ -279,7 +332,8 @@ async def validate_ocr_requirements(file_path: str, oc_number: str) -> dict:
         NO uses markdown. Solo JSON.
         """
 
-        response = await client.aio.models.generate_content(
+        response = await generate_content(
+            estimated_tokens=estimate_tokens(total_pages, prompt),
             model=MODEL_NAME or "gemini-2.0-flash",
             contents=[
                 types.Content(
@@ -307,27 +361,34 @@ async def validate_ocr_requirements(file_path: str, oc_number: str) -> dict:
         print(f"⚠️ Error en validate_ocr_requirements: {e}")
         return {"validation_status": "error", "error": str(e)}
 
+def extract_first_page(file_path: str) -> tuple[int, bytes]:
+    """
+    Devuelve el total de páginas del PDF y un PDF nuevo con solo la primera página.
+    """
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    if total_pages < 1:
+        return 0, b""
+
+    writer = PdfWriter()
+    writer.add_page(reader.pages[0])
+
+    first_page_stream = io.BytesIO()
+    writer.write(first_page_stream)
+    return total_pages, first_page_stream.getvalue()
+
 async def analyze_first_page_oc(file_path: str) -> dict:
     """
     Analiza solo la primera página del PDF para encontrar el O/C.
     Guarda temporalmente la primera página en memoria y la envía a Gemini.
     """
     try:
-        # 1. Extraer primera página
-        reader = PdfReader(file_path)
-        if len(reader.pages) < 1:
+        # 1. Extraer primera página (en un hilo para no bloquear el event loop con el parseo del PDF)
+        total_pages, first_page_content = await asyncio.to_thread(extract_first_page, file_path)
+        if total_pages < 1:
             return {"error": "El PDF está vacío"}
-            
-        writer = PdfWriter()
-        writer.add_page(reader.pages[0])
-        
-        first_page_stream = io.BytesIO()
-        writer.write(first_page_stream)
-        first_page_content = first_page_stream.getvalue()
-        
-        # 2. Preparar cliente Gemini
-        client = genai.Client(api_key=API_KEY)
         
+        # 2. Preparar prompt
         prompt = """
         Analiza esta imagen/documento (que es la primera página de un archivo).
         Tu ÚNICA tarea es encontrar el número de Orden de Compra, que suele aparecer como:
@@ -349,7 +410,8 @@ async def analyze_first_page_oc(file_path: str) -> dict:
         NO añadas bloques de código markdown (```json), solo el texto JSON puro.
         """
                
-        response = client.models.generate_content(
+        response = await generate_content(
+            estimated_tokens=estimate_tokens(1, prompt),
             model=MODEL_NAME or "gemini-2.0-flash", # Fallback si no hay modelo en env
             contents=[
                 types.Content(
@@ -396,7 +458,7 @@ async def analyze_first_page_oc(file_path: str) -> dict:
             asyncio.create_task(send_log_background(
                 tokens_in=tokens_in,
                 tokens_out=tokens_out,
-                pages=len(reader.pages), # Total páginas del doc original
+                pages=total_pages, # Total páginas del doc original
                 is_image=False,
                 model_used=MODEL_NAME or "gemini-fallback"
             ))
@@ -409,6 +471,195 @@ async def analyze_first_page_oc(file_path: str) -> dict:
         print(f"Error en analyze_first_page_oc: {e}")
         return {"error": str(e)}
 
+# Reglas documentarias por prefijo de O/C (mismas que validate_ocr_requirements),
+# aplicadas en código sobre los documentos que Gemini detecta en analyze_and_validate
+REQUIRED_DOCUMENTS_BY_PREFIX = {
+    "43": {
+        "tipo": "ORDEN DE SERVICIO",
+        "obligatorios": ["Factura", "HES", "Orden de Servicio"],
+        "validar_firma_valorizacion": True
+    },
+    "40": {
+        "tipo": "ORDEN DE COMPRA",
+        "obligatorios": ["Factura", "Guía de remisión", "HEM", "Orden de Compra"],
+        "validar_firma_valorizacion": False
+    },
+    "42": {
+        "tipo": "ORDEN DE SUBCONTRATO",
+        "obligatorios": ["Factura", "Valorización", "HES", "Orden de Subcontrato"],
+        "validar_firma_valorizacion": False
+    }
+}
+
+KNOWN_DOCUMENTS = ["Factura", "Guía de remisión", "HEM", "HES", "Orden de Compra", "Orden de Servicio", "Orden de Subcontrato", "Valorización"]
+
+# Variantes que Gemini devuelve aunque el prompt pida los nombres exactos ("Guias de remision",
+# "factura", "HES (Hoja de Entrada de Servicios)"...). Se comparan ya normalizadas (sin tildes, minúsculas).
+# El orden importa: se usa el primer fragmento que aparezca en el nombre.
+DOCUMENT_ALIASES = [
+    ("orden de subcontrato", "Orden de Subcontrato"),
+    ("orden de servicio", "Orden de Servicio"),
+    ("orden de compra", "Orden de Compra"),
+    ("purchase order", "Orden de Compra"),
+    ("hoja de entrada de material", "HEM"),
+    ("hoja de entrada de servicio", "HES"),
+    ("hem", "HEM"),
+    ("hes", "HES"),
+    ("guia", "Guía de remisión"),
+    ("factura", "Factura"),
+    ("invoice", "Factura"),
+    ("valorizacion", "Valorización"),
+]
+# Siglas: deben aparecer como palabra completa (no como parte de otra palabra)
+DOCUMENT_ACRONYMS = {"hem", "hes"}
+
+def _normalize_text(value: str) -> str:
+    value = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode()
+    return " ".join(value.lower().replace("(", " ").replace(")", " ").split())
+
+def match_document_name(name: str) -> str | None:
+    """Nombre canónico de KNOWN_DOCUMENTS para un documento detectado por Gemini, o None."""
+    normalized = _normalize_text(name)
+    words = normalized.split()
+    for alias, canonical in DOCUMENT_ALIASES:
+        if (alias in words) if alias in DOCUMENT_ACRONYMS else (alias in normalized):
+            return canonical
+    return None
+
+def apply_requirements(oc_number: str, detected: dict) -> dict:
+    """
+    Aplica las reglas del prefijo del O/C (ya limpio) a los documentos detectados.
+    Devuelve el mismo formato que validate_ocr_requirements.
+    """
+    if not oc_number:
+        return {"validation_status": "skipped", "reason": "No O/C number provided"}
+
+    prefix = oc_number[:2]
+    rules = REQUIRED_DOCUMENTS_BY_PREFIX.get(prefix)
+    if not rules:
+        return {"validation_status": "skipped", "reason": "No validation rules for O/C prefix " + prefix}
+
+    present, unmatched = [], []
+    for name in detected.get("present_documents") or []:
+        canonical = match_document_name(name)
+        if canonical is None:
+            unmatched.append(name)
+        elif canonical not in present:
+            present.append(canonical)
+    if unmatched:
+        print(f"⚠️ Documentos no reconocidos en la respuesta de Gemini (O/C {oc_number}): {unmatched}")
+    missing = [d for d in rules["obligatorios"] if d not in present]
+    valorizacion_detected = bool(detected.get("valorizacion_detected")) or "Valorización" in present
+    valorizacion_signed = detected.get("valorizacion_signed") if valorizacion_detected else None
+
+    observations = detected.get("observations") or ""
+    if rules["validar_firma_valorizacion"] and valorizacion_detected and valorizacion_signed is False:
+        observations = (observations + " " if observations else "") + "La valorización no tiene firmas."
+
+    return {
+        "validation_status": "performed",
+        "result": {
+            "present_documents": present,
+            "missing_documents": missing,
+            "valorizacion_detected": valorizacion_detected,
+            "valorizacion_signed": valorizacion_signed,
+            "is_compliant": not missing,
+            "observations": observations,
+            "unrecognized_documents": unmatched
+        }
+    }
+
+def read_file_bytes(file_path: str) -> bytes:
+    with open(file_path, "rb") as f:
+        return f.read()
+
+async def analyze_and_validate(file_path: str) -> dict:
+    """
+    Extrae el O/C y valida los requisitos documentarios en una sola llamada a Gemini.
+    Gemini busca el O/C y lista los documentos presentes en el PDF completo;
+    la clasificación y las reglas por prefijo se aplican aquí, igual que en
+    analyze_first_page_oc + validate_ocr_requirements.
+    """
+    try:
+        file_content = await asyncio.to_thread(read_file_bytes, file_path)
+        total_pages = await asyncio.to_thread(count_pdf_pages, file_content)
+
+        prompt = f"""
+        Analiza este paquete de documentos PDF completo y realiza DOS tareas.
+
+        1. En la PRIMERA página, encuentra el número de Orden de Compra, que suele aparecer como:
+        - "O/C"
+        - "O/C CLIENTE"
+        - "Orden de Compra"
+        - "Purchase Order"
+        - "PO"
+
+        2. Revisa TODAS las páginas e identifica qué documentos contiene el paquete.
+        Usa EXACTAMENTE estos nombres: {", ".join(KNOWN_DOCUMENTS)}.
+        (HEM = Hoja de Entrada de Materiales, HES = Hoja de Entrada de Servicios.)
+        Incluye una orden (de Compra, de Servicio o de Subcontrato) solo si está completa.
+        Si detectas una 'Valorización', verifica si tiene firmas (manuscritas o digitales).
+
+        Devuelve un JSON ESTRICTO con la siguiente estructura:
+        {{
+            "O/C": "valor_encontrado o null",
+            "present_documents": ["Lista", "de", "documentos", "encontrados"],
+            "valorizacion_detected": true/false,
+            "valorizacion_signed": true/false/null, (null si no hay valorización)
+            "observations": "Texto breve describiendo hallazgos o problemas"
+        }}
+        NO uses markdown. Solo JSON.
+        """
+
+        response = await generate_content(
+            estimated_tokens=estimate_tokens(total_pages, prompt),
+            model=MODEL_NAME or "gemini-2.0-flash",
+            contents=[
+                types.Content(
+                    parts=[
+                        types.Part.from_bytes(data=file_content, mime_type="application/pdf"),
+                        types.Part.from_text(text=prompt)
+                    ]
+                )
+            ],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json"
+            )
+        )
+
+        if not response.text:
+            return {"O/C": None, "error": "No response text"}
+
+        try:
+            detected = json.loads(response.text.replace("```json", "").replace("```", "").strip())
+        except json.JSONDecodeError:
+            return {"O/C": None, "error": "Invalid JSON from Gemini"}
+
+        result_json = {"O/C": None, "clase_documento": None, "denominacion": None}
+        raw_oc = detected.get("O/C")
+        if raw_oc:
+            cleaned_oc = clean_oc_value(raw_oc)
+            result_json["O/C"] = cleaned_oc
+            result_json["O/C_Original"] = raw_oc
+            result_json.update(classify_document(cleaned_oc))
+
+        result_json["validation"] = apply_requirements(result_json["O/C"], detected)
+
+        usage = response.usage_metadata
+        asyncio.create_task(send_log_background(
+            tokens_in=usage.prompt_token_count if usage else 0,
+            tokens_out=usage.candidates_token_count if usage else 0,
+            pages=total_pages,
+            is_image=False,
+            model_used=MODEL_NAME or "gemini-fallback"
+        ))
+
+        return result_json
+
+    except Exception as e:
+        print(f"Error en analyze_and_validate: {e}")
+        return {"error": str(e)}
+
 async def analyze_document_content(file_content: bytes, mime_type: str, prompt: str = None) -> dict:
     """
     Analiza un documento (PDF o Imagen) usando Google Gemini (SDK google-genai).
@@ -420,13 +671,14 @@ async def analyze_document_content(file_content: bytes, mime_type: str, prompt:
         return {"error": "GEMINI_MODEL no configurada en el backend (.env)."}
 
     try:
-        # Instanciar cliente
-        client = genai.Client(api_key=API_KEY)
-        
         if not prompt:
             prompt = "Analiza este documento y extrae toda la información relevante en texto plano."
 
-        response = await client.aio.models.generate_content(
+        is_pdf = "pdf" in mime_type.lower()
+        pages = await asyncio.to_thread(count_pdf_pages, file_content) if is_pdf else 1
+
+        response = await generate_content(
+            estimated_tokens=estimate_tokens(pages, prompt),
             model=MODEL_NAME,
             contents=[
                 types.Part.from_bytes(data=file_content, mime_type=mime_type),
@@ -437,9 +689,6 @@ async def analyze_document_content(file_content: bytes, mime_type: str, prompt:
         usage = response.usage_metadata
         t_in = usage.prompt_token_count if usage else 0
         t_out = usage.candidates_token_count if usage else 0
-        
-        is_pdf = "pdf" in mime_type.lower()
-        pages = count_pdf_pages(file_content) if is_pdf else 1
 
         asyncio.create_task(send_log_background(
             tokens_in=t_in,
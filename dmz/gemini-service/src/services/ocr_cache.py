@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Caché persistente de resultados OCR, direccionada por contenido (SHA-256 del archivo)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # dmz/gemini-service
+
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join(BASE_DIR, "cache", "ocr_cache.db"))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "50000"))
+OCR_CACHE_MAX_AGE_DAYS = float(os.getenv("OCR_CACHE_MAX_AGE_DAYS", "90"))
+
+# Cada cuántas escrituras se ejecuta la limpieza por tamaño/antigüedad
+EVICT_EVERY = 100
+
+
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    Guarda el resultado de cada acción OCR indexado por
+    (hash del archivo, acción, versión de prompt, modelo, parámetros de la acción).
+    Expulsa entradas por antigüedad y, si se supera el máximo, las menos usadas recientemente.
+    Los métodos son bloqueantes (sqlite3): el watcher los llama con asyncio.to_thread y un lock
+    serializa el uso de la conexión entre hilos.
+    """
+
+    def __init__(self, db_path: str = OCR_CACHE_PATH, max_entries: int = OCR_CACHE_MAX_ENTRIES, max_age_days: float = OCR_CACHE_MAX_AGE_DAYS):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                cache_key TEXT PRIMARY KEY,
+                file_hash TEXT NOT NULL,
+                action TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_access ON ocr_cache (last_access)")
+        self.conn.commit()
+        # Cantidad de entradas en memoria: stats() no hace COUNT(*) en cada consulta
+        self.entries = self.conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+
+    @staticmethod
+    def build_key(file_hash: str, action: str, prompt_version: str, model_name: str, params: dict = None) -> str:
+        raw = json.dumps([file_hash, action, prompt_version, model_name, params or {}], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key: str):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT result, created_at FROM ocr_cache WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+            now = time.time()
+
+            if row is None or now - row[1] > self.max_age_seconds:
+                if row is not None:
+                    self.entries -= self.conn.execute("DELETE FROM ocr_cache WHERE cache_key = ?", (cache_key,)).rowcount
+                    self.conn.commit()
+                self.misses += 1
+                return None
+
+            self.conn.execute("UPDATE ocr_cache SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, cache_key: str, file_hash: str, action: str, result: dict):
+        now = time.time()
+        values = (file_hash, action, json.dumps(result, ensure_ascii=False), now, now, cache_key)
+        with self._lock:
+            updated = self.conn.execute(
+                "UPDATE ocr_cache SET file_hash = ?, action = ?, result = ?, created_at = ?, last_access = ? WHERE cache_key = ?",
+                values
+            ).rowcount
+            if not updated:
+                self.conn.execute(
+                    "INSERT INTO ocr_cache (file_hash, action, result, created_at, last_access, cache_key) VALUES (?, ?, ?, ?, ?, ?)",
+                    values
+                )
+                self.entries += 1
+            self.conn.commit()
+
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+
+    def evict(self) -> int:
+        """Elimina entradas vencidas y recorta al máximo de entradas. Devuelve cuántas se borraron."""
+        with self._lock:
+            return self._evict()
+
+    def _evict(self) -> int:
+        cutoff = time.time() - self.max_age_seconds
+        deleted = self.conn.execute("DELETE FROM ocr_cache WHERE created_at < ?", (cutoff,)).rowcount
+
+        # Se aprovecha la limpieza periódica para resincronizar el contador en memoria
+        total = self.conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+        if total > self.max_entries:
+            trimmed = self.conn.execute(
+                "DELETE FROM ocr_cache WHERE cache_key IN (SELECT cache_key FROM ocr_cache ORDER BY last_access ASC LIMIT ?)",
+                (total - self.max_entries,)
+            ).rowcount
+            deleted += trimmed
+            total -= trimmed
+        self.conn.commit()
+        self.entries = total
+        return deleted
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": self.entries
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
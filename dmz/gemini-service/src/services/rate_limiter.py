@@ -0,0 +1,150 @@
+import time
+import random
+import asyncio
+
+# Códigos HTTP que justifican reintentar la llamada al modelo
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def error_status(error: Exception):
+    """Obtiene el código HTTP de un error del SDK google-genai (o de httpx) si lo tiene."""
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    if error_status(error) in RETRYABLE_STATUS:
+        return True
+    # Cortes de red y timeouts (httpx, asyncio) no traen código HTTP
+    name = type(error).__name__
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError)) or "Timeout" in name or "ConnectError" in name
+
+
+class TokenBucket:
+    """
+    Cubeta de tokens que se rellena a `rate_per_minute`.
+    Las esperas son FIFO: quien llega primero consume primero.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        """Corrige el saldo con el consumo real (positivo = consumir más, negativo = devolver)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveConcurrency:
+    """
+    Límite de llamadas simultáneas que se reduce a la mitad con cada 429
+    y vuelve a crecer de a uno tras una racha de llamadas exitosas.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, increase_after: int = 20):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def __aexit__(self, *exc):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.increase_after and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttle(self):
+        self.limit = max(self.min_limit, self.limit // 2)
+        self._successes = 0
+
+
+class RateLimiter:
+    """
+    Limitador para las llamadas al modelo: solicitudes/min, tokens/min y concurrencia adaptativa,
+    con reintentos con backoff exponencial y jitter ante errores transitorios.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, max_concurrency: int,
+                 max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.throttled = 0
+        self.retries = 0
+
+    def backoff_delay(self, attempt: int) -> float:
+        # "Full jitter": espera aleatoria entre 0 y base * 2^intento (con tope)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, make_call, estimated_tokens: int = 0, usage_tokens=None):
+        """
+        Ejecuta `make_call()` (una corrutina nueva por intento) respetando los límites.
+        `usage_tokens(respuesta)` devuelve los tokens reales para corregir la estimación.
+        """
+        attempt = 0
+        while True:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            try:
+                async with self.concurrency:
+                    response = await make_call()
+            except Exception as e:
+                # La llamada fallida no consumió la estimación completa
+                self.tokens.adjust(-estimated_tokens)
+                if error_status(e) == 429:
+                    self.throttled += 1
+                    self.concurrency.on_throttle()
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self.backoff_delay(attempt)
+                attempt += 1
+                self.retries += 1
+                print(f"⏳ Gemini respondió {error_status(e) or type(e).__name__}, reintento {attempt}/{self.max_retries} en {delay:.1f}s (concurrencia {self.concurrency.limit})")
+                await asyncio.sleep(delay)
+                continue
+
+            self.concurrency.on_success()
+            if usage_tokens:
+                actual = usage_tokens(response)
+                if actual:
+                    self.tokens.adjust(actual - estimated_tokens)
+            return response
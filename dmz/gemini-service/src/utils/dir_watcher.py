@@ -0,0 +1,159 @@
+# Copia vendorizada: este mismo archivo existe en
+#   backend/app/services/dir_watcher.py
+#   dmz/gemini-service/src/utils/dir_watcher.py
+#   dmz/sunat-sap-service/src/utils/dir_watcher.py
+# El backend y cada servicio de la DMZ se despliegan y ejecutan por separado (máquinas/entornos virtuales
+# propios, sin paquete común instalable), así que cada uno lleva su copia. Cualquier cambio se aplica
+# a las tres; backend/tests/test_dir_watcher_copies.py verifica que sigan idénticas.
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import asyncio
+
+# Modos soportados (variable de entorno WATCHER_MODE):
+# - auto (por defecto): inotify si está disponible (Linux), si no polling.
+# - inotify: fuerza inotify (falla a polling con aviso si no está disponible).
+# - poll: escaneo periódico de la carpeta como antes.
+WATCHER_MODE = os.getenv("WATCHER_MODE", "auto").lower()
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class DirWatcher:
+    """
+    Espera eventos de llegada de archivos en una carpeta.
+    Con inotify despierta en cuanto un archivo se cierra tras escribirse (IN_CLOSE_WRITE)
+    o se renombra dentro de la carpeta (IN_MOVED_TO). Sin inotify hace polling.
+    """
+
+    def __init__(self, path: str, suffix: str = ".json", poll_interval: float = 2.0, mode: str = None, rescan_interval: float = 30.0):
+        self.path = path
+        self.suffix = suffix
+        self.poll_interval = poll_interval
+        # Aun con inotify se re-escanea cada cierto tiempo por seguridad (eventos perdidos, NFS, etc.)
+        self.rescan_interval = rescan_interval
+        self.mode = "poll"
+        self._fd = None
+
+        mode = (mode or WATCHER_MODE).lower()
+        if mode in ("auto", "inotify"):
+            self._fd = self._init_inotify()
+            if self._fd is not None:
+                self.mode = "inotify"
+            elif mode == "inotify":
+                print(f"⚠️ inotify no disponible, usando polling cada {poll_interval}s en {path}")
+
+    def _init_inotify(self):
+        libc = _load_inotify()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        wd = libc.inotify_add_watch(fd, os.fsencode(self.path), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def fileno(self):
+        return self._fd
+
+    def _read_events(self) -> list:
+        """Drena el descriptor inotify y devuelve los nombres de archivo que coinciden con el sufijo."""
+        names = []
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    break
+                raise
+            if not buffer:
+                break
+            offset = 0
+            while offset < len(buffer):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                raw_name = buffer[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # Se perdieron eventos: forzar re-escaneo completo
+                    names.append(None)
+                    continue
+                name = os.fsdecode(raw_name)
+                if name.endswith(self.suffix):
+                    names.append(name)
+        return names
+
+    def wait(self, timeout: float = None) -> list:
+        """
+        Bloquea hasta que llegue un archivo nuevo o venza el timeout.
+        Devuelve los nombres recibidos (lista vacía en polling o timeout):
+        el llamador debe re-escanear la carpeta en cualquier caso.
+        """
+        if self._fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            return []
+
+        timeout = self.rescan_interval if timeout is None else timeout
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if ready:
+            return self._read_events()
+        return []
+
+    async def wait_async(self, timeout: float = None) -> list:
+        """Versión no bloqueante de wait() para usar dentro de un event loop."""
+        if self._fd is None:
+            await asyncio.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            return []
+
+        timeout = self.rescan_interval if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_reader(self._fd, lambda: ready.done() or ready.set_result(True))
+        try:
+            await asyncio.wait_for(ready, timeout)
+        except asyncio.TimeoutError:
+            return []
+        finally:
+            loop.remove_reader(self._fd)
+        return self._read_events()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
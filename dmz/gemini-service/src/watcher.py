@@ -4,7 +4,9 @@ import json
 import shutil
 import asyncio
 from pathlib import Path
-from src.services.gemini_ocr import analyze_first_page_oc, validate_ocr_requirements, analyze_document_content
+from src.services.gemini_ocr import analyze_first_page_oc, validate_ocr_requirements, analyze_document_content, analyze_and_validate, MODEL_NAME, PROMPT_VERSION
+from src.services.ocr_cache import OcrCache, hash_file, OCR_CACHE_ENABLED
+from src.utils.dir_watcher import DirWatcher
 
 # Configuración de carpetas
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # dmz/gemini-service
@@ -15,12 +17,20 @@ PENDING_DIR = os.path.join(EXCHANGE_DIR, "pendientes")
 PROCESSED_DIR = os.path.join(EXCHANGE_DIR, "procesados")
 ERROR_DIR = os.path.join(EXCHANGE_DIR, "errores")
 FILES_DIR = os.path.join(EXCHANGE_DIR, "files")
+PROCESSING_DIR = os.path.join(EXCHANGE_DIR, "procesando")
+# Trabajos ya atendidos. Van aparte para que procesados/ solo tenga los *.result.json que el backend lista.
+HISTORY_DIR = os.path.join(EXCHANGE_DIR, "historial")
+
+# Número de trabajos OCR procesados en paralelo (el backend usa concurrencia 5 por defecto en scan-batch)
+OCR_WORKERS = max(1, int(os.getenv("OCR_WORKERS", "5")))
 
 # Asegurar que existan
 os.makedirs(PENDING_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 os.makedirs(ERROR_DIR, exist_ok=True)
 os.makedirs(FILES_DIR, exist_ok=True)
+os.makedirs(PROCESSING_DIR, exist_ok=True)
+os.makedirs(HISTORY_DIR, exist_ok=True)
 
 class Colors:
     RED = '\033[91m'
@@ -33,6 +43,22 @@ class Colors:
 def log(message, color=Colors.RESET):
     print(f"{color}[GEMINI WATCHER] {message}{Colors.RESET}")
 
+# Caché de resultados por contenido: evita volver a llamar a Gemini por el mismo archivo
+ocr_cache = OcrCache() if OCR_CACHE_ENABLED else None
+
+# Parámetros del trabajo que, además del archivo y la acción, cambian el resultado
+CACHE_PARAM_KEYS = ('oc_number', 'prompt', 'mime_type')
+
+def is_cacheable_result(result: dict) -> bool:
+    """Solo se guardan en caché resultados exitosos (los errores pueden ser transitorios)."""
+    if result.get('error'):
+        return False
+    if result.get('success') is False:
+        return False
+    if result.get('validation_status') == 'error':
+        return False
+    return True
+
 async def process_job(job_file, job_data):
     log(f"🔄 Procesando trabajo OCR: {job_file}", Colors.BLUE)
     
@@ -50,6 +76,20 @@ async def process_job(job_file, job_data):
     result = {}
     
     try:
+        cache_key = None
+        if ocr_cache:
+            file_hash = await asyncio.to_thread(hash_file, file_path)
+            cache_params = {key: job_data.get(key) for key in CACHE_PARAM_KEYS if job_data.get(key) is not None}
+            cache_key = ocr_cache.build_key(file_hash, action, PROMPT_VERSION, MODEL_NAME or "gemini-2.0-flash", cache_params)
+            cached_result = await asyncio.to_thread(ocr_cache.get, cache_key)
+            if cached_result is not None:
+                log(f"⚡ Resultado desde caché: {file_name} ({ocr_cache.stats()})", Colors.GREEN)
+                cached_result['cache_hit'] = True
+                cached_result['job_status'] = 'completed'
+                cached_result['processed_at'] = time.strftime("%Y-%m-%d %H:%M:%S")
+                return cached_result
+            log(f"🔎 Sin resultado en caché: {file_name} ({ocr_cache.stats()})", Colors.CYAN)
+
         if action == 'analyze_first_page_oc':
             log(f"📄 Analizando primera página para O/C: {file_name}", Colors.CYAN)
             result = await analyze_first_page_oc(file_path)
@@ -59,6 +99,10 @@ async def process_job(job_file, job_data):
             log(f"🔍 Validando requisitos para O/C {oc_number}: {file_name}", Colors.CYAN)
             result = await validate_ocr_requirements(file_path, oc_number)
             
+        elif action == 'analyze_and_validate':
+            log(f"📑 Extrayendo O/C y validando requisitos en una sola llamada: {file_name}", Colors.CYAN)
+            result = await analyze_and_validate(file_path)
+
         elif action == 'analyze_document_content':
              prompt = job_data.get('prompt')
              mime_type = job_data.get('mime_type', 'application/pdf')
@@ -72,6 +116,9 @@ async def process_job(job_file, job_data):
              
         else:
             raise Exception(f"Acción desconocida: {action}")
+
+        if cache_key and is_cacheable_result(result):
+            await asyncio.to_thread(ocr_cache.put, cache_key, file_hash, action, result)
             
         # Añadir metadatos de éxito
         result['job_status'] = 'completed'
@@ -83,63 +130,124 @@ async def process_job(job_file, job_data):
         log(f"❌ Error en procesamiento Gemini: {e}", Colors.RED)
         return {"error": str(e), "job_status": "failed"}
 
-def main():
-    log(f"👀 Watcher iniciado. Vigilando: {PENDING_DIR}", Colors.CYAN)
+def claim_job(filename):
+    """
+    Reclama un trabajo moviéndolo atómicamente de pendientes a procesando.
+    Si otro worker (u otra instancia del watcher) ya lo tomó, devuelve None.
+    """
+    claimed_path = os.path.join(PROCESSING_DIR, filename)
+    try:
+        os.rename(os.path.join(PENDING_DIR, filename), claimed_path)
+        return claimed_path
+    except FileNotFoundError:
+        return None
+
+def recover_orphan_jobs():
+    """Devuelve a pendientes los trabajos que quedaron en procesando tras una caída del watcher."""
+    for filename in os.listdir(PROCESSING_DIR):
+        if filename.endswith('.json'):
+            log(f"♻️ Reencolando trabajo interrumpido: {filename}", Colors.YELLOW)
+            os.replace(os.path.join(PROCESSING_DIR, filename), os.path.join(PENDING_DIR, filename))
+
+def list_pending_jobs():
+    """
+    Trabajos JSON en pendientes por orden de llegada. Los nombres son uuid (no ordenan por tiempo);
+    se usa el mtime, que es el momento en que el backend publicó el trabajo (tmp + rename).
+    """
+    jobs = []
+    with os.scandir(PENDING_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                jobs.append((entry.stat().st_mtime, entry.name))
+            except FileNotFoundError:
+                # Otro worker lo reclamó mientras se listaba
+                continue
+    return [name for _, name in sorted(jobs)]
+
+def move_legacy_history():
+    """Saca de procesados los trabajos que versiones anteriores dejaban ahí como historial."""
+    for filename in os.listdir(PROCESSED_DIR):
+        if filename.endswith('.json') and not filename.endswith('.result.json'):
+            os.replace(os.path.join(PROCESSED_DIR, filename), os.path.join(HISTORY_DIR, filename))
+
+async def run_job(filename, claimed_path, semaphore):
+    try:
+        with open(claimed_path, 'r', encoding='utf-8') as f:
+            job_data = json.load(f)
+
+        # Ejecutar trabajo
+        result = await process_job(filename, job_data)
+
+        # Guardar resultado (escritura atómica para que el backend no lea un JSON a medias)
+        result_filename = filename.replace('.json', '.result.json')
+        result_path = os.path.join(PROCESSED_DIR, result_filename)
+        tmp_result_path = result_path + ".tmp"
+
+        with open(tmp_result_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_result_path, result_path)
 
-    while True:
+        # Mover trabajo original al historial
+        shutil.move(claimed_path, os.path.join(HISTORY_DIR, filename))
+
+        if result.get('job_status') == 'completed':
+            log(f"✅ Trabajo completado: {filename}", Colors.GREEN)
+        else:
+            log(f"⚠️ Trabajo completado con error: {filename}", Colors.YELLOW)
+
+    except json.JSONDecodeError:
+        log(f"⚠️ Archivo JSON inválido: {filename}", Colors.RED)
+        shutil.move(claimed_path, os.path.join(ERROR_DIR, filename))
+    except Exception as e:
+        log(f"⚠️ Error procesando archivo {filename}: {e}", Colors.RED)
         try:
-            # Listar archivos JSON en pendientes
-            files = [f for f in os.listdir(PENDING_DIR) if f.endswith('.json')]
-            
-            for filename in files:
-                file_path = os.path.join(PENDING_DIR, filename)
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        job_data = json.load(f)
-                    
-                    # Ejecutar trabajo
-                    result = asyncio.run(process_job(filename, job_data))
-                    
-                    # Guardar resultado
-                    result_filename = filename.replace('.json', '.result.json')
-                    result_path = os.path.join(PROCESSED_DIR, result_filename)
-                    
-                    with open(result_path, 'w', encoding='utf-8') as f:
-                        json.dump(result, f, indent=4, ensure_ascii=False)
-                    
-                    # Mover trabajo original a procesados (o borrarlo?)
-                    # Mejor moverlo para historial
-                    shutil.move(file_path, os.path.join(PROCESSED_DIR, filename))
-                    
-                    if result.get('job_status') == 'completed':
-                        log(f"✅ Trabajo completado: {filename}", Colors.GREEN)
-                    else:
-                        log(f"⚠️ Trabajo completado con error: {filename}", Colors.YELLOW)
-                        
-                    # Opcional: Eliminar archivo PDF de 'files' si ya no se necesita?
-                    # El backend podría necesitarlo o limpiar periódicamente.
-                    # Por seguridad, dejémoslo ahí o movámoslo a 'procesados/files'?
-                    # Dejémoslo en 'files' por ahora.
-
-                except json.JSONDecodeError:
-                    log(f"⚠️ Archivo JSON inválido: {filename}", Colors.RED)
-                    shutil.move(file_path, os.path.join(ERROR_DIR, filename))
-                except Exception as e:
-                    log(f"⚠️ Error procesando archivo {filename}: {e}", Colors.RED)
-                    try:
-                        shutil.move(file_path, os.path.join(ERROR_DIR, filename))
-                    except:
-                        pass
-
-            time.sleep(1) # Polling rápido
-            
-        except KeyboardInterrupt:
-            log("\n👋 Watcher detenido por el usuario.", Colors.YELLOW)
-            break
-        except Exception as e:
-            log(f"💥 Error crítico en el loop principal: {e}", Colors.RED)
-            time.sleep(5)
+            shutil.move(claimed_path, os.path.join(ERROR_DIR, filename))
+        except:
+            pass
+    finally:
+        semaphore.release()
+
+async def run_watcher():
+    dir_watcher = DirWatcher(PENDING_DIR, suffix='.json', poll_interval=1)
+    log(f"👀 Watcher iniciado ({dir_watcher.mode}, {OCR_WORKERS} workers). Vigilando: {PENDING_DIR}", Colors.CYAN)
+
+    recover_orphan_jobs()
+    move_legacy_history()
+
+    # Pool de N consumidores: cada trabajo reclamado corre como tarea mientras haya cupo en el semáforo
+    semaphore = asyncio.Semaphore(OCR_WORKERS)
+    running_tasks = set()
+
+    try:
+        while True:
+            try:
+                for filename in list_pending_jobs():
+                    await semaphore.acquire()
+                    claimed_path = claim_job(filename)
+                    if not claimed_path:
+                        semaphore.release()
+                        continue
+
+                    task = asyncio.create_task(run_job(filename, claimed_path, semaphore))
+                    running_tasks.add(task)
+                    task.add_done_callback(running_tasks.discard)
+
+                # Esperar a que llegue un nuevo trabajo (inotify) o 1 segundo (polling)
+                await dir_watcher.wait_async()
+
+            except Exception as e:
+                log(f"💥 Error crítico en el loop principal: {e}", Colors.RED)
+                await asyncio.sleep(5)
+    finally:
+        dir_watcher.close()
+
+def main():
+    try:
+        asyncio.run(run_watcher())
+    except KeyboardInterrupt:
+        log("\n👋 Watcher detenido por el usuario.", Colors.YELLOW)
 
 if __name__ == "__main__":
     main()
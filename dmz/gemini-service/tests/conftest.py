@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos del servicio se importan como `src.*` (igual que con run_watcher.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
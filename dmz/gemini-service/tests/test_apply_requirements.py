@@ -0,0 +1,26 @@
+import pytest
+from src.services.gemini_ocr import match_document_name, apply_requirements
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Guía de Remisión", "Guía de remisión"),
+    ("Guias de remision", "Guía de remisión"),
+    ("factura", "Factura"),
+    ("HES (Hoja de Entrada de Servicios)", "HES"),
+    ("Hoja de Entrada de Materiales", "HEM"),
+    ("ORDEN DE COMPRA", "Orden de Compra"),
+    ("Valorizacion", "Valorización"),
+    ("Contrato", None),
+])
+def test_match_document_name(name, expected):
+    assert match_document_name(name) == expected
+
+
+def test_variant_names_count_as_present():
+    detected = {"present_documents": ["factura", "Guias de remision", "HEM (Hoja de Entrada de Materiales)", "Orden de compra", "Acta"]}
+
+    result = apply_requirements("4000001", detected)["result"]
+
+    assert result["is_compliant"] is True
+    assert result["missing_documents"] == []
+    assert result["unrecognized_documents"] == ["Acta"]
@@ -0,0 +1,50 @@
+import asyncio
+from src.services.ocr_cache import OcrCache
+
+
+def make_cache(tmp_path, **kwargs):
+    return OcrCache(db_path=str(tmp_path / "ocr_cache.db"), **kwargs)
+
+
+def test_counters_are_kept_in_memory(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("k1", "h1", "analyze_and_validate", {"ok": 1})
+    cache.put("k1", "h1", "analyze_and_validate", {"ok": 2})
+    cache.put("k2", "h2", "analyze_and_validate", {"ok": 3})
+
+    assert cache.get("k1") == {"ok": 2}
+    assert cache.get("missing") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 2}
+    cache.close()
+
+    reopened = make_cache(tmp_path)
+    assert reopened.stats()["entries"] == 2
+    reopened.close()
+
+
+def test_expired_and_evicted_entries_update_count(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    for i in range(3):
+        cache.put(f"k{i}", f"h{i}", "analyze_first_page_oc", {"i": i})
+    assert cache.evict() == 1
+    assert cache.stats()["entries"] == 2
+
+    cache.max_age_seconds = -1
+    assert cache.get("k2") is None
+    assert cache.stats()["entries"] == 1
+    cache.close()
+
+
+def test_get_and_put_from_worker_threads(tmp_path):
+    cache = make_cache(tmp_path)
+
+    async def scenario():
+        await asyncio.gather(*[
+            asyncio.to_thread(cache.put, f"k{i}", f"h{i}", "analyze_and_validate", {"i": i}) for i in range(20)
+        ])
+        return await asyncio.gather(*[asyncio.to_thread(cache.get, f"k{i}") for i in range(20)])
+
+    results = asyncio.run(scenario())
+    assert results == [{"i": i} for i in range(20)]
+    assert cache.stats()["entries"] == 20
+    cache.close()
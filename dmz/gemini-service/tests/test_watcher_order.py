@@ -0,0 +1,13 @@
+import os
+from src import watcher
+
+
+def test_pending_jobs_are_listed_by_arrival_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(watcher, "PENDING_DIR", str(tmp_path))
+    for name, mtime in (("f0a1.json", 300), ("0b2c.json", 100), ("9c3d.json", 200)):
+        path = tmp_path / name
+        path.write_text("{}", encoding="utf-8")
+        os.utime(path, (mtime, mtime))
+    (tmp_path / "0000.json.tmp").write_text("{", encoding="utf-8")
+
+    assert watcher.list_pending_jobs() == ["0b2c.json", "9c3d.json", "f0a1.json"]
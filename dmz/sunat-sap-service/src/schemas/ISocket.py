@@ -6,6 +6,7 @@ class EmitEvent(str, Enum):
     SAP = 'sap:bot'
     SUNAT = 'sunat:bot'
     LOG = 'log:bot'
+    STATUS = 'status:bot'
 
 
 class IDataEmit(TypedDict):
@@ -1,7 +1,13 @@
+from contextvars import ContextVar
 from .ioClient import SocketClient
 from ..logger.colored_logger import ColoredLogger, Colors
 
 
+# Datos del trabajo en curso (p. ej. execution_id) que se agregan a cada evento emitido.
+# Es un ContextVar para que cada trabajo (tarea asyncio) tenga su propio contexto.
+job_context: ContextVar[dict] = ContextVar("job_context", default={})
+
+
 class _SocketManager:
     def __init__(self):
         self.socket_client = None
@@ -26,7 +32,13 @@ class _SocketManager:
         if self.socket_client and self.socket_client.is_connected:
             self.socket_client.disconnect()
 
+    def set_job_context(self, **values):
+        job_context.set({k: v for k, v in values.items() if v is not None})
+
     def emit(self, event, data):
+        context = job_context.get()
+        if context and isinstance(data, dict):
+            data = {**context, **data}
         if self.socket_client and self.socket_client.is_connected:
             self.socket_client.emit(event, data)
         else:
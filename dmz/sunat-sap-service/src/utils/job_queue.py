@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+# Prioridades de los trabajos (menor = primero). El backend las envía en el JSON del trabajo.
+PRIORIDAD_MANUAL = 0
+PRIORIDAD_PROGRAMADA = 1
+PRIORITY_NAMES = {PRIORIDAD_MANUAL: "manual", PRIORIDAD_PROGRAMADA: "programada"}
+
+# Tiempos de espera recientes que se guardan por prioridad para las estadísticas
+WAIT_SAMPLES = 100
+
+
+def job_priority(job_data: dict) -> int:
+    priority = job_data.get('priority')
+    if priority in PRIORITY_NAMES:
+        return priority
+    # Trabajos de versiones anteriores del backend: solo las programaciones traen tipo 'A'
+    return PRIORIDAD_PROGRAMADA if job_data.get('tipo') == 'A' else PRIORIDAD_MANUAL
+
+
+class PriorityLimiter:
+    """
+    Semáforo con prioridad para las sesiones de un portal.
+    Al liberarse un cupo lo toma el que espera con menor clave (prioridad, orden de llegada del trabajo),
+    no el primero que llegó al semáforo como en asyncio.Semaphore.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    async def acquire(self, key):
+        if self.active < self.limit:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (key, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Si el cupo ya se había entregado, se devuelve
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            *_, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # El cupo pasa directo al siguiente (active no cambia)
+                future.set_result(True)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, key):
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class QueuedJob:
+    def __init__(self, filename: str, path: str, data: dict, priority: int, seq: int):
+        self.filename = filename
+        self.path = path
+        self.data = data
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+    @property
+    def key(self):
+        # FIFO dentro de cada prioridad según el orden de llegada a la cola
+        return (self.priority, self.seq)
+
+    @property
+    def wait_seconds(self) -> float:
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+
+class JobQueue:
+    """
+    Cola de trabajos del watcher con límite de sesiones por portal.
+    Cada trabajo pide un cupo del portal antes de abrir su navegador; mientras espera cuenta como en cola.
+    El estado (profundidad por prioridad, cupos por portal y tiempos de espera) se escribe en `status_file`.
+    """
+
+    def __init__(self, limits: dict, status_file: str | None = None):
+        self.limiters = {name: PriorityLimiter(name, limit) for name, limit in limits.items()}
+        self.status_file = status_file
+        self.jobs: dict[int, QueuedJob] = {}
+        self.completed = 0
+        self._seq = itertools.count()
+        self._waits = {priority: deque(maxlen=WAIT_SAMPLES) for priority in PRIORITY_NAMES}
+
+    def add(self, filename: str, path: str, data: dict) -> QueuedJob:
+        job = QueuedJob(filename, path, data, job_priority(data), next(self._seq))
+        self.jobs[job.seq] = job
+        self.write_status()
+        return job
+
+    def done(self, job: QueuedJob):
+        self.jobs.pop(job.seq, None)
+        self.completed += 1
+        self.write_status()
+
+    @asynccontextmanager
+    async def portal(self, job: QueuedJob, name: str):
+        async with self.limiters[name].slot(job.key):
+            if job.started_at is None:
+                job.started_at = time.monotonic()
+                self._waits[job.priority].append(job.wait_seconds)
+            self.write_status()
+            try:
+                yield
+            finally:
+                self.write_status()
+
+    def snapshot(self) -> dict:
+        queued = [job for job in self.jobs.values() if job.started_at is None]
+        waits = {}
+        for priority, name in PRIORITY_NAMES.items():
+            samples = self._waits[priority]
+            waits[name] = {
+                "ultima": round(samples[-1], 1) if samples else None,
+                "promedio": round(sum(samples) / len(samples), 1) if samples else None,
+                "maxima": round(max(samples), 1) if samples else None,
+            }
+
+        return {
+            "actualizado": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "en_cola": {name: sum(1 for job in queued if job.priority == priority) for priority, name in PRIORITY_NAMES.items()},
+            "en_curso": len(self.jobs) - len(queued),
+            "completados": self.completed,
+            "portales": {
+                name: {"limite": limiter.limit, "activas": limiter.active, "esperando": limiter.waiting}
+                for name, limiter in self.limiters.items()
+            },
+            "espera_segundos": waits,
+            "espera_mas_antigua_segundos": round(max((job.wait_seconds for job in queued), default=0), 1),
+            "trabajos": [
+                {
+                    "archivo": job.filename,
+                    "execution_id": job.data.get('execution_id'),
+                    "prioridad": PRIORITY_NAMES.get(job.priority, job.priority),
+                    "estado": "en_cola" if job.started_at is None else "en_curso",
+                    "espera_segundos": round(job.wait_seconds, 1),
+                }
+                for job in sorted(self.jobs.values(), key=lambda j: j.key)
+            ],
+        }
+
+    def write_status(self):
+        if not self.status_file:
+            return
+        try:
+            tmp_path = self.status_file + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.status_file)
+        except OSError:
+            pass
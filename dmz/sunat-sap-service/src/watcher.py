@@ -3,11 +3,16 @@ import os
 import json
 import shutil
 import asyncio
+import contextlib
 from pathlib import Path
 from src.sap import appSap
 from src.sunat import appSunat
 from src.socket_client.manager import socket_manager
+from src.schemas.ISocket import EmitEvent
+from src.utils.date_current import dateCurrent
 from src.logger.colored_logger import ColoredLogger, Colors
+from src.utils.dir_watcher import DirWatcher
+from src.utils.job_queue import JobQueue, PRIORITY_NAMES
 
 logger = ColoredLogger()
 
@@ -19,90 +24,237 @@ EXCHANGE_DIR = os.path.join(DMZ_ROOT, "exchange")
 PENDING_DIR = os.path.join(EXCHANGE_DIR, "pendientes")
 PROCESSED_DIR = os.path.join(EXCHANGE_DIR, "procesados")
 ERROR_DIR = os.path.join(EXCHANGE_DIR, "errores")
+PROCESSING_DIR = os.path.join(EXCHANGE_DIR, "procesando")
+# Estado de la cola (profundidad, cupos por portal, tiempos de espera); el backend lo expone en /api/bot/cola
+QUEUE_STATUS_FILE = os.path.join(EXCHANGE_DIR, "estado_cola.json")
+
+# Sesiones simultáneas por portal (cada una es un Chromium). Manuales antes que programadas, FIFO dentro de cada prioridad.
+SAP_MAX_SESSIONS = max(1, int(os.getenv("SAP_MAX_SESSIONS", "2")))
+SUNAT_MAX_SESSIONS = max(1, int(os.getenv("SUNAT_MAX_SESSIONS", "2")))
 
 # Asegurar que existan
 os.makedirs(PENDING_DIR, exist_ok=True)
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 os.makedirs(ERROR_DIR, exist_ok=True)
+os.makedirs(PROCESSING_DIR, exist_ok=True)
 
-async def process_job(job_file, job_data):
-    logger.log(f"🔄 Procesando trabajo: {job_file}", Colors.BLUE)
-    
-    # Iniciar conexión Socket si es necesario
-    socket_url = job_data.get('socket_url', 'http://localhost:8001')
+job_queue = JobQueue({'sap': SAP_MAX_SESSIONS, 'sunat': SUNAT_MAX_SESSIONS}, status_file=QUEUE_STATUS_FILE)
+
+def report_status(estado, progreso, paso, message, **extra):
+    """Estado/progreso de la ejecución para el dashboard (el backend lo guarda en DEJECUCION_ESTADO)."""
+    socket_manager.emit(EmitEvent.STATUS, {
+        'estado': estado,
+        'progreso': progreso,
+        'paso': paso,
+        'message': message,
+        'date': dateCurrent(),
+        **extra
+    })
+
+def count_files(folder):
+    if not folder or not os.path.isdir(folder):
+        return 0
+    return sum(len(files) for _, _, files in os.walk(folder))
+
+def ensure_socket(socket_url):
+    # Conexión compartida por todos los trabajos en curso: se abre una vez y se reintenta si se cayó
     try:
         socket_manager.initialize(server_url=socket_url)
         socket_manager.connect()
     except Exception as e:
         logger.log(f"⚠️ No se pudo conectar al socket: {e}", Colors.YELLOW)
 
+# SAP y SUNAT en paralelo dentro de cada trabajo (cada fase abre su propio Chromium y usa un cupo de su portal).
+# BOT_PARALLEL_PHASES=false vuelve a ejecutarlas una tras otra. En ambos modos el fallo de una fase no detiene la otra.
+BOT_PARALLEL_PHASES = os.getenv("BOT_PARALLEL_PHASES", "true").lower() == "true"
+
+# portal -> (función, nombre en el dashboard, campo de archivos descargados en el evento de estado)
+PHASES = {
+    'sap': (appSap, 'SAP', 'archivos_sap'),
+    'sunat': (appSunat, 'SUNAT', 'archivos_sunat'),
+}
+
+class JobProgress:
+    """Progreso del trabajo según las fases terminadas (5% al empezar, 100% al cerrar)."""
+
+    def __init__(self, job_file, job, total_phases):
+        self.job_file = job_file
+        self.job = job
+        self.total = max(1, total_phases)
+        self.done = 0
+        self.started = False
+
+    @property
+    def value(self):
+        return 5 + int(90 * self.done / self.total)
+
+    def start(self):
+        if not self.started:
+            self.started = True
+            report_started(self.job_file, self.job)
+
+async def run_phase(portal, job_data, progress):
+    """Ejecuta una fase y devuelve (éxito, mensaje). No propaga errores: cada fase informa su propio resultado."""
+    app, label, files_field = PHASES[portal]
+    folder = job_data[portal].get('folder')
+
+    async with portal_slot(progress.job, portal):
+        progress.start()
+        logger.log(f"⚙️ Iniciando {app.__name__}...", Colors.BLUE)
+        report_status('EN_PROCESO', progress.value, label, f"⚙️ Iniciando descarga {label}")
+        try:
+            result = await app(args=job_data[portal])
+            success = result.get('success', True) if isinstance(result, dict) else True
+            message = result.get('message', '') if isinstance(result, dict) else ''
+        except Exception as e:
+            success, message = False, str(e)
+
+    progress.done += 1
+    if success:
+        logger.log(f"✅ {app.__name__} finalizado", Colors.GREEN)
+        report_status('EN_PROCESO', progress.value, label, f"✅ Descarga {label} finalizada", **{files_field: count_files(folder)})
+    else:
+        logger.log(f"❌ {app.__name__} falló: {message}", Colors.RED)
+        report_status('EN_PROCESO', progress.value, label, f"❌ Descarga {label} fallida: {message}", **{files_field: count_files(folder)})
+    return success, message
+
+async def process_job(job_file, job_data, job=None):
+    logger.log(f"🔄 Procesando trabajo: {job_file}", Colors.BLUE)
+    ensure_socket(job_data.get('socket_url', 'http://localhost:8001'))
+
+    # Todos los eventos de este trabajo (logs y estado) llevan el execution_id
+    socket_manager.set_job_context(execution_id=job_data.get('execution_id'))
+    folder_sap = job_data.get('sap', {}).get('folder')
+    folder_sunat = job_data.get('sunat', {}).get('folder')
+    report_status('PENDIENTE', 0, 'En cola', f"⏳ En cola: {job_file}")
+
+    portals = [portal for portal in PHASES if portal in job_data]
+    progress = JobProgress(job_file, job, len(portals))
+
     try:
-        # Ejecutar SAP
-        if 'sap' in job_data:
-            logger.log("⚙️ Iniciando appSap...", Colors.BLUE)
-            await appSap(args=job_data['sap'])
-            logger.log("✅ appSap finalizado", Colors.GREEN)
-
-        # Ejecutar SUNAT
-        if 'sunat' in job_data:
-            logger.log("⚙️ Iniciando appSunat...", Colors.BLUE)
-            await appSunat(args=job_data['sunat'])
-            logger.log("✅ appSunat finalizado", Colors.GREEN)
+        if BOT_PARALLEL_PHASES:
+            # Las tareas heredan el contexto (execution_id) del trabajo
+            results = await asyncio.gather(*(run_phase(portal, job_data, progress) for portal in portals))
+        else:
+            results = [await run_phase(portal, job_data, progress) for portal in portals]
+
+        failed = [f"{PHASES[portal][1]}: {message}" for portal, (success, message) in zip(portals, results) if not success]
+        files = {'archivos_sap': count_files(folder_sap), 'archivos_sunat': count_files(folder_sunat)}
+        if failed:
+            report_status('ERROR', 100, 'Fin', f"❌ Error en la ejecución ({'; '.join(failed)})"[:250], **files)
+            return False
 
+        report_status('COMPLETADO', 100, 'Fin', "✅ Ejecución completada", **files)
         return True
     except Exception as e:
         logger.log(f"❌ Error en la ejecución: {e}", Colors.RED)
+        report_status('ERROR', 100, 'Fin', f"❌ Error en la ejecución: {e}",
+                      archivos_sap=count_files(folder_sap), archivos_sunat=count_files(folder_sunat))
         return False
+
+def portal_slot(job, portal):
+    if job is None:
+        return contextlib.nullcontext()
+    return job_queue.portal(job, portal)
+
+def report_started(job_file, job):
+    # Al obtener el primer cupo de portal: el dashboard toma esta hora como inicio de la ejecución
+    wait = f" (esperó {job.wait_seconds:.0f}s en cola)" if job is not None else ""
+    report_status('EN_PROCESO', 0, 'Inicio', f"🔄 Procesando trabajo: {job_file}{wait}")
+
+def claim_job(filename):
+    """Mueve el trabajo de pendientes a procesando; None si otra instancia del watcher ya lo tomó."""
+    claimed_path = os.path.join(PROCESSING_DIR, filename)
+    try:
+        os.rename(os.path.join(PENDING_DIR, filename), claimed_path)
+        return claimed_path
+    except FileNotFoundError:
+        return None
+
+def recover_orphan_jobs():
+    """Devuelve a pendientes los trabajos que quedaron en procesando tras una caída del watcher."""
+    for filename in os.listdir(PROCESSING_DIR):
+        if filename.endswith('.json'):
+            logger.log(f"♻️ Reencolando trabajo interrumpido: {filename}", Colors.YELLOW)
+            os.replace(os.path.join(PROCESSING_DIR, filename), os.path.join(PENDING_DIR, filename))
+
+def claim_pending_jobs():
+    """Reclama los trabajos nuevos y los devuelve en orden de creación (FIFO dentro de cada prioridad)."""
+    claimed = []
+    for filename in os.listdir(PENDING_DIR):
+        if not filename.endswith('.json'):
+            continue
+        claimed_path = claim_job(filename)
+        if not claimed_path:
+            continue
+        try:
+            with open(claimed_path, 'r', encoding='utf-8') as f:
+                job_data = json.load(f)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            logger.log(f"⚠️ Archivo JSON inválido: {filename}", Colors.RED)
+            shutil.move(claimed_path, os.path.join(ERROR_DIR, filename))
+            continue
+        claimed.append((str(job_data.get('created_at', '')), filename, claimed_path, job_data))
+
+    claimed.sort(key=lambda item: (item[0], item[1]))
+    return [(filename, claimed_path, job_data) for _, filename, claimed_path, job_data in claimed]
+
+async def run_job(job):
+    try:
+        success = await process_job(job.filename, job.data, job)
+
+        # Mover archivo según resultado
+        if success:
+            shutil.move(job.path, os.path.join(PROCESSED_DIR, job.filename))
+            logger.log(f"✅ Trabajo completado y movido a procesados: {job.filename}", Colors.GREEN)
+        else:
+            shutil.move(job.path, os.path.join(ERROR_DIR, job.filename))
+            logger.log(f"❌ Trabajo fallido y movido a errores: {job.filename}", Colors.RED)
+    except Exception as e:
+        logger.log(f"⚠️ Error procesando archivo {job.filename}: {e}", Colors.RED)
+        # Intentar mover a errores si no está bloqueado
+        try:
+            shutil.move(job.path, os.path.join(ERROR_DIR, job.filename))
+        except:
+            pass
     finally:
-        socket_manager.disconnect()
+        job_queue.done(job)
 
-def main():
-    logger.log(f"👀 Watcher iniciado. Vigilando: {PENDING_DIR}", Colors.CYAN)
+async def run_watcher():
+    dir_watcher = DirWatcher(PENDING_DIR, suffix='.json', poll_interval=2)
+    logger.log(f"👀 Watcher iniciado ({dir_watcher.mode}, sesiones SAP={SAP_MAX_SESSIONS}, SUNAT={SUNAT_MAX_SESSIONS}, fases {'en paralelo' if BOT_PARALLEL_PHASES else 'secuenciales'}). Vigilando: {PENDING_DIR}", Colors.CYAN)
     logger.log("Esperando archivos JSON...", Colors.CYAN)
 
-    while True:
-        try:
-            # Listar archivos JSON en pendientes
-            files = [f for f in os.listdir(PENDING_DIR) if f.endswith('.json')]
-            
-            for filename in files:
-                file_path = os.path.join(PENDING_DIR, filename)
-                
-                # Intentar leer el archivo
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        job_data = json.load(f)
-                    
-                    # Ejecutar trabajo
-                    success = asyncio.run(process_job(filename, job_data))
-                    
-                    # Mover archivo según resultado
-                    if success:
-                        shutil.move(file_path, os.path.join(PROCESSED_DIR, filename))
-                        logger.log(f"✅ Trabajo completado y movido a procesados: {filename}", Colors.GREEN)
-                    else:
-                        shutil.move(file_path, os.path.join(ERROR_DIR, filename))
-                        logger.log(f"❌ Trabajo fallido y movido a errores: {filename}", Colors.RED)
-                        
-                except json.JSONDecodeError:
-                    logger.log(f"⚠️ Archivo JSON inválido: {filename}", Colors.RED)
-                    shutil.move(file_path, os.path.join(ERROR_DIR, filename))
-                except Exception as e:
-                    logger.log(f"⚠️ Error procesando archivo {filename}: {e}", Colors.RED)
-                    # Intentar mover a errores si no está bloqueado
-                    try:
-                        shutil.move(file_path, os.path.join(ERROR_DIR, filename))
-                    except:
-                        pass
-
-            time.sleep(2) # Esperar 2 segundos antes de volver a escanear
-            
-        except KeyboardInterrupt:
-            logger.log("\n👋 Watcher detenido por el usuario.", Colors.YELLOW)
-            break
-        except Exception as e:
-            logger.log(f"💥 Error crítico en el loop principal: {e}", Colors.RED)
-            time.sleep(5)
+    recover_orphan_jobs()
+    job_queue.write_status()
+    running_tasks = set()
+
+    try:
+        while True:
+            try:
+                # Cada trabajo reclamado entra a la cola; los cupos por portal deciden cuándo abre su navegador
+                for filename, claimed_path, job_data in claim_pending_jobs():
+                    job = job_queue.add(filename, claimed_path, job_data)
+                    logger.log(f"📥 Trabajo en cola ({PRIORITY_NAMES.get(job.priority, job.priority)}): {filename}", Colors.BLUE)
+                    task = asyncio.create_task(run_job(job))
+                    running_tasks.add(task)
+                    task.add_done_callback(running_tasks.discard)
+
+                # Esperar a que llegue un nuevo archivo (inotify) o 2 segundos (polling)
+                await dir_watcher.wait_async()
+
+            except Exception as e:
+                logger.log(f"💥 Error crítico en el loop principal: {e}", Colors.RED)
+                await asyncio.sleep(5)
+    finally:
+        dir_watcher.close()
+        socket_manager.disconnect()
+
+def main():
+    try:
+        asyncio.run(run_watcher())
+    except KeyboardInterrupt:
+        logger.log("\n👋 Watcher detenido por el usuario.", Colors.YELLOW)
 
 if __name__ == "__main__":
     main()
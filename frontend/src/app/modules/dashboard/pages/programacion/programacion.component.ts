@@ -1,6 +1,7 @@
 import { Component, OnInit } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { AppConfigService } from '../../../../services/app-config.service';
+import { fetchAllPages } from '../../../../services/pagination';
 
 interface Sociedad {
   id: string; // tCodigoSap or tRuc
@@ -78,7 +79,7 @@ export class ProgramacionComponent implements OnInit {
   }
 
   loadProgramaciones() {
-    this.http.get<any[]>(`${this.configService.apiUrl}/crud/programacion`)
+    fetchAllPages<any>(this.http, `${this.configService.apiUrl}/crud/programacion`)
       .subscribe({
         next: (data) => {
           this.programaciones = data.map(p => ({
@@ -97,7 +98,7 @@ export class ProgramacionComponent implements OnInit {
   }
 
   loadSociedades() {
-    this.http.get<any[]>(`${this.configService.apiUrl}/crud/sociedades`)
+    fetchAllPages<any>(this.http, `${this.configService.apiUrl}/crud/sociedades`)
       .subscribe({
         next: (data) => {
           this.sociedadesList = data.map(s => ({
@@ -0,0 +1,24 @@
+import { HttpClient, HttpParams, HttpResponse } from '@angular/common/http';
+import { EMPTY, Observable } from 'rxjs';
+import { expand, map, reduce } from 'rxjs/operators';
+
+// Cursor de la página siguiente (ver backend/app/api/pagination.py). Sin header = última página.
+export const NEXT_CURSOR_HEADER = 'X-Next-Cursor';
+
+/**
+ * Recorre un listado paginado del CRUD siguiendo el cursor y emite todas las filas juntas.
+ * Cada request trae como máximo una página; el backend ya no devuelve la tabla completa sin `limit`.
+ */
+export function fetchAllPages<T>(http: HttpClient, url: string, params: HttpParams = new HttpParams()): Observable<T[]> {
+  const page = (after: string | null) =>
+    http.get<T[]>(url, { params: after ? params.set('after', after) : params, observe: 'response' });
+
+  return page(null).pipe(
+    expand((res: HttpResponse<T[]>) => {
+      const next = res.headers.get(NEXT_CURSOR_HEADER);
+      return next ? page(next) : EMPTY;
+    }),
+    map((res: HttpResponse<T[]>) => res.body ?? []),
+    reduce((all: T[], rows: T[]) => all.concat(rows), [] as T[])
+  );
+}
@@ -2,6 +2,7 @@ import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
 import { AppConfigService } from './app-config.service';
+import { fetchAllPages } from './pagination';
 
 @Injectable({
   providedIn: 'root'
@@ -18,7 +19,7 @@ export class ProveedorService {
   }
 
   getProveedores(): Observable<any[]> {
-    return this.http.get<any[]>(`${this.baseUrl}/proveedores`);
+    return fetchAllPages<any>(this.http, `${this.baseUrl}/proveedores`);
   }
 
   uploadExcel(file: File): Observable<any> {
@@ -2,6 +2,7 @@ import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
 import { AppConfigService } from './app-config.service';
+import { fetchAllPages } from './pagination';
 
 export interface Sociedad {
   tRuc: string;
@@ -32,7 +33,7 @@ export class SociedadService {
     // Check backend/app/api/utils.py or wherever societies are exposed
     // If not exposed, I might need to create the endpoint too.
     // Let's assume standard REST for now, but I better check backend routes first.
-    return this.http.get<Sociedad[]>(`${this.baseUrl}/sociedades`);
+    return fetchAllPages<Sociedad>(this.http, `${this.baseUrl}/sociedades`);
   }
 
   create(sociedad: any): Observable<Sociedad> {
@@ -49,7 +50,7 @@ export class SociedadService {
 
   // SAP Association Methods
   getAllSapAccounts(): Observable<any[]> {
-    return this.http.get<any[]>(`${this.baseUrl}/sap-accounts`);
+    return fetchAllPages<any>(this.http, `${this.baseUrl}/sap-accounts`);
   }
 
   getSociedadSapAccounts(ruc: string): Observable<any[]> {
@@ -2,6 +2,7 @@ import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
 import { AppConfigService } from './app-config.service';
+import { fetchAllPages } from './pagination';
 
 export interface Usuario {
   iMusuario: number;
@@ -32,7 +33,7 @@ export class UsuarioService {
   }
 
   getAll(): Observable<Usuario[]> {
-    return this.http.get<Usuario[]>(`${this.baseUrl}/usuarios`);
+    return fetchAllPages<Usuario>(this.http, `${this.baseUrl}/usuarios`);
   }
 
   create(usuario: any): Observable<Usuario> {